@@ -1,7 +1,10 @@
+import base64
+import json
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session
 
 from . import models, schemas
 
@@ -143,6 +146,91 @@ def get_records_by_plate(db: Session, plate_number: str) -> List[models.ParkingR
     )
 
 
+def encode_record_cursor(record: models.ParkingRecord) -> str:
+    """(entry_time, id) çiftini URL-güvenli opak bir cursor'a çevirir."""
+    raw = f"{record.entry_time.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_record_cursor(cursor: str) -> Tuple[datetime, int]:
+    """encode_record_cursor'ın tersi; bozuk cursor için ValueError fırlatır."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        entry_time, record_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(entry_time), int(record_id)
+    except Exception as exc:
+        raise ValueError("Geçersiz cursor") from exc
+
+
+def filter_records(
+    db: Session,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    plate_number: Optional[str] = None,
+) -> Query:
+    """
+    Park kayıtları için filtrelenmiş (sıralanmamış) sorgu oluşturur.
+
+    Args:
+        status: "active" (çıkış yapmamış) veya "completed" (çıkış yapmış)
+        date_from: Bu zamandan sonra (dahil) yapılan girişler
+        date_to: Bu zamandan önce (hariç) yapılan girişler
+        plate_number: Tam plaka eşleşmesi
+    """
+    query = db.query(models.ParkingRecord)
+    if status == "active":
+        query = query.filter(models.ParkingRecord.exit_time.is_(None))
+    elif status == "completed":
+        query = query.filter(models.ParkingRecord.exit_time.isnot(None))
+    if date_from is not None:
+        query = query.filter(models.ParkingRecord.entry_time >= date_from)
+    if date_to is not None:
+        query = query.filter(models.ParkingRecord.entry_time < date_to)
+    if plate_number:
+        query = query.filter(models.ParkingRecord.plate_number == plate_number)
+    return query
+
+
+def get_records_page(
+    query: Query,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[models.ParkingRecord], Optional[str]]:
+    """
+    Keyset pagination: (entry_time, id) azalan sırada en fazla `limit` kayıt döndürür.
+    OFFSET kullanılmadığı için her sayfanın maliyeti geçmişin büyüklüğünden bağımsızdır.
+
+    Returns:
+        (kayıtlar, sonraki sayfanın cursor'ı veya None)
+    """
+    if cursor:
+        entry_time, record_id = decode_record_cursor(cursor)
+        query = query.filter(
+            tuple_(models.ParkingRecord.entry_time, models.ParkingRecord.id)
+            < tuple_(entry_time, record_id)
+        )
+    records = (
+        query.order_by(models.ParkingRecord.entry_time.desc(), models.ParkingRecord.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = encode_record_cursor(records[limit - 1]) if len(records) > limit else None
+    return records[:limit], next_cursor
+
+
+def estimate_query_rows(db: Session, query: Query) -> int:
+    """
+    Sorgunun döndüreceği satır sayısını COUNT(*) çalıştırmadan, planner tahmininden okur.
+    """
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    row = db.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    plan = row if isinstance(row, list) else json.loads(row)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 # Payment operations
 def create_payment(
     db: Session,
@@ -151,7 +239,8 @@ def create_payment(
     parking_record_id: Optional[int] = None,
     receiver_name: str = "La Parque A.Ş.",
     iban: Optional[str] = None,
-    merchant_code: str = "LAPARQUE001"
+    merchant_code: str = "LAPARQUE001",
+    commit: bool = True
 ) -> models.Payment:
     """
     Yeni ödeme kaydı oluşturur
@@ -164,6 +253,7 @@ def create_payment(
         receiver_name: Alıcı adı
         iban: IBAN (None ise otomatik üretilir)
         merchant_code: Merchant kodu
+        commit: False ise sadece flush edilir, commit çağırana kalır
     
     Returns:
         Oluşturulan Payment kaydı
@@ -191,6 +281,9 @@ def create_payment(
     )
     
     db.add(payment)
+    if not commit:
+        db.flush()
+        return payment
     db.commit()
     db.refresh(payment)
     return payment
@@ -0,0 +1,111 @@
+"""
+Async CRUD işlemleri - async route'lar ve WebSocket handler'ları için.
+
+Fonksiyonlar crud.py'deki karşılıklarıyla aynı davranır ama AsyncSession
+üzerinde çalışır; event loop veritabanı I/O'su sırasında bloklanmaz.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .crud import decode_record_cursor, encode_record_cursor
+
+
+# ParkingRecord operations
+async def get_records_page(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[models.ParkingRecord], Optional[str]]:
+    """
+    crud.get_records_page'in async karşılığı: (entry_time, id) azalan sırada
+    en fazla `limit` kayıt ve sonraki sayfanın cursor'ı.
+    """
+    stmt = select(models.ParkingRecord)
+    if cursor:
+        entry_time, record_id = decode_record_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(models.ParkingRecord.entry_time, models.ParkingRecord.id)
+            < tuple_(entry_time, record_id)
+        )
+    stmt = stmt.order_by(
+        models.ParkingRecord.entry_time.desc(), models.ParkingRecord.id.desc()
+    ).limit(limit + 1)
+    records = list((await db.scalars(stmt)).all())
+    next_cursor = encode_record_cursor(records[limit - 1]) if len(records) > limit else None
+    return records[:limit], next_cursor
+
+
+# Payment operations
+async def get_payment_by_id(db: AsyncSession, payment_id: int) -> Optional[models.Payment]:
+    """ID'ye göre ödeme kaydı bulur"""
+    return await db.get(models.Payment, payment_id)
+
+
+async def mark_payment_paid(db: AsyncSession, payment_id: int) -> Optional[models.Payment]:
+    """
+    Ödemeyi sadece hâlâ PENDING ise PAID yapar; commit çağıranındır (aynı
+    transaction'a idempotency kaydı eklenebilsin). Eş zamanlı başka bir onay
+    ödemeyi önce aldıysa None döner.
+    """
+    payment = await db.scalar(
+        update(models.Payment)
+        .where(
+            models.Payment.id == payment_id,
+            models.Payment.status == models.PaymentStatus.PENDING,
+        )
+        .values(status=models.PaymentStatus.PAID, paid_at=datetime.utcnow())
+        .returning(models.Payment)
+        .execution_options(populate_existing=True)
+    )
+    return payment
+
+
+async def attach_payment_to_record(db: AsyncSession, record_id: int, payment_id: int) -> bool:
+    """Park kaydına ödeme ID'sini yazar; kayıt yoksa False döner"""
+    result = await db.execute(
+        update(models.ParkingRecord)
+        .where(models.ParkingRecord.id == record_id)
+        .values(payment_id=payment_id)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+# User / password reset operations
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+
+async def replace_password_reset_token(
+    db: AsyncSession,
+    email: str,
+    token: str,
+    expires_at: datetime,
+) -> models.PasswordResetToken:
+    """Email'in kullanılmamış token'larını iptal edip yenisini oluşturur"""
+    await db.execute(
+        update(models.PasswordResetToken)
+        .where(
+            models.PasswordResetToken.email == email,
+            models.PasswordResetToken.used == 0,
+        )
+        .values(used=1)
+    )
+    reset_token = models.PasswordResetToken(
+        email=email,
+        token=token,
+        expires_at=expires_at,
+        used=0
+    )
+    db.add(reset_token)
+    await db.commit()
+    return reset_token
+
+
+async def delete_password_reset_token(db: AsyncSession, reset_token: models.PasswordResetToken):
+    await db.delete(reset_token)
+    await db.commit()
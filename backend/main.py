@@ -7,6 +7,7 @@ from pathlib import Path
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
 # .env dosyasını yükle (eğer varsa)
@@ -95,6 +96,59 @@ app.include_router(user_page_routes.router)
 app.include_router(websocket_routes.router)
 app.include_router(payment_routes.router)
 
+
+# --------------------------------------------------
+# 🔹 Event bus (WebSocket olaylarının worker'lar arası dağıtımı)
+# --------------------------------------------------
+@app.on_event("startup")
+async def start_event_bus():
+    from backend.services.event_bus import event_bus
+
+    await event_bus.start(websocket_routes.handle_bus_event)
+
+
+@app.on_event("shutdown")
+async def stop_event_bus():
+    from backend.services.event_bus import event_bus
+
+    await event_bus.stop()
+
+
+# --------------------------------------------------
+# 🔹 Periyodik bakım görevleri
+# --------------------------------------------------
+@app.on_event("startup")
+async def start_background_tasks():
+    from backend.utils.background import start_periodic
+    from backend.utils.session_manager import SESSION_SWEEP_INTERVAL, sweep_expired_sessions
+    from backend.services.occupancy_service import OCCUPANCY_REBUILD_INTERVAL, occupancy_index
+    from backend.utils.idempotency import IDEMPOTENCY_SWEEP_INTERVAL, purge_expired
+
+    start_periodic(SESSION_SWEEP_INTERVAL, sweep_expired_sessions, "session-sweeper")
+    # İlk çalıştırma indeksi açılışta kurar
+    start_periodic(OCCUPANCY_REBUILD_INTERVAL, occupancy_index.rebuild, "occupancy-rebuild")
+    start_periodic(IDEMPOTENCY_SWEEP_INTERVAL, purge_expired, "idempotency-sweeper")
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    from backend.utils.background import stop_periodic_tasks
+    from backend.services.entry_write_buffer import entry_write_buffer
+
+    await stop_periodic_tasks()
+    if entry_write_buffer is not None:
+        # Sıradaki girişler yazılıp buffer thread'i durdurulur
+        await run_in_threadpool(entry_write_buffer.stop)
+
+
+@app.on_event("shutdown")
+async def dispose_async_engines():
+    from backend.database import async_engine, async_read_engine
+
+    await async_engine.dispose()
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
+
 # --------------------------------------------------
 # 🔹 Frontend dosyalarını sun (React build sonrası)
 # --------------------------------------------------
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Enum as SQLEnum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, Enum as SQLEnum, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -27,6 +27,31 @@ class PasswordResetToken(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class UserSession(Base):
+    """Giriş session'ı - token'ın kendisi değil SHA-256 özeti saklanır"""
+    __tablename__ = "user_sessions"
+
+    token_hash = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    email = Column(String(255), nullable=False)
+    remember_me = Column(Integer, nullable=False, default=0)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class IdempotencyKey(Base):
+    """Idempotency-Key header'ı ile yapılan mutasyonun kaydedilmiş cevabı"""
+    __tablename__ = "idempotency_keys"
+
+    # scope: endpoint grubu (ör. gate_event, payment_create)
+    scope = Column(String(32), primary_key=True)
+    key = Column(String(128), primary_key=True)
+    status_code = Column(Integer, nullable=False, default=200)
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
 class Vehicle(Base):
     """Araç modeli - Plaka bilgisi ile"""
     __tablename__ = "vehicles"
@@ -82,6 +107,18 @@ class ParkingRecord(Base):
     confidence = Column(Float, nullable=True)
     payment_id = Column(Integer, nullable=True, index=True)
 
+    __table_args__ = (
+        # Plaka geçmişi / debounce sorguları (plaka + son girişler)
+        Index("ix_parking_records_plate_entry_time", plate_number, entry_time.desc()),
+        # Aktif kayıt sorgusu (çıkış yapmamış araçlar)
+        Index(
+            "ix_parking_records_active_plate",
+            plate_number,
+            entry_time.desc(),
+            postgresql_where=exit_time.is_(None),
+        ),
+    )
+
     # Relationships
     vehicle = relationship("Vehicle", back_populates="parking_records", foreign_keys=[vehicle_id])
     payment = relationship(
@@ -2,6 +2,7 @@
 Authentication routes - Login, logout, session management
 """
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, Response, Body
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import hashlib
@@ -9,11 +10,12 @@ import secrets
 import logging
 import os
 
-from backend.database import SessionLocal
-from backend import models
+from backend.database import AsyncSessionLocal, SessionLocal
+from backend import models, crud_async
 from backend.utils.session_manager import (
     create_session_token,
     get_session_user,
+    get_user_principal,
     delete_session,
     SESSION_COOKIE_NAME,
 )
@@ -33,6 +35,11 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 
 
 @router.post("/login")
@@ -160,8 +167,8 @@ def check_session(request: Request, db: Session = Depends(get_db)):
     if not session:
         raise HTTPException(status_code=401, detail="Session geçersiz veya süresi dolmuş")
     
-    # Kullanıcıyı veritabanından al
-    user = db.query(models.User).filter(models.User.id == session["user_id"]).first()
+    # Kullanıcı kısa süreli cache'ten, yoksa veritabanından gelir
+    user = get_user_principal(db, session["user_id"])
     if not user:
         raise HTTPException(status_code=401, detail="Kullanıcı bulunamadı")
     
@@ -211,7 +218,7 @@ class ResetPasswordRequest(BaseModel):
 @router.post("/forgot-password")
 async def forgot_password(
     request_data: ForgotPasswordRequest = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Şifre sıfırlama token'ı oluştur ve e-posta gönder"""
     email = request_data.email.strip()
@@ -221,7 +228,7 @@ async def forgot_password(
         raise HTTPException(status_code=400, detail="Geçerli bir e-posta adresi giriniz")
     
     # Kullanıcıyı bul
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await crud_async.get_user_by_email(db, email)
     
     # Güvenlik için: Kullanıcı yoksa bile başarılı mesajı döndür
     if not user:
@@ -230,24 +237,10 @@ async def forgot_password(
             "message": "Eğer bu e-posta adresi kayıtlıysa, şifre sıfırlama bağlantısı gönderildi."
         }
     
-    # Mevcut token'ları iptal et (aynı email için)
-    db.query(models.PasswordResetToken).filter(
-        models.PasswordResetToken.email == email,
-        models.PasswordResetToken.used == 0
-    ).update({"used": 1})
-    
-    # Yeni token oluştur
+    # Mevcut token'ları iptal et ve yeni token oluştur
     token = secrets.token_urlsafe(32)
     expires_at = datetime.utcnow() + timedelta(hours=1)  # 1 saat geçerli
-    
-    reset_token = models.PasswordResetToken(
-        email=email,
-        token=token,
-        expires_at=expires_at,
-        used=0
-    )
-    db.add(reset_token)
-    db.commit()
+    reset_token = await crud_async.replace_password_reset_token(db, email, token, expires_at)
     
     # Development modu kontrolü (email göndermeden önce)
     import os
@@ -273,8 +266,7 @@ async def forgot_password(
             }
         else:
             # Production modunda gerçekten email gönderilemedi
-            db.delete(reset_token)
-            db.commit()
+            await crud_async.delete_password_reset_token(db, reset_token)
             error_detail = (
                 "E-posta gönderilemedi. Lütfen SMTP ayarlarını kontrol edin veya "
                 "sistem yöneticisi ile iletişime geçin. "
@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
-from backend.database import SessionLocal
+from backend.database import SessionLocal, get_pool_stats, read_engine, replica_is_fresh
 
 router = APIRouter(prefix="/api", tags=["health"])
 
@@ -27,3 +27,12 @@ def health_check(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
 
+
+
+@router.get("/health/pool")
+def pool_stats():
+    """Veritabanı bağlantı havuzu doluluğu ve bağlantı bekleme süreleri"""
+    stats = {"primary": get_pool_stats()}
+    if read_engine is not None:
+        stats["replica"] = {**get_pool_stats(read_engine), "fresh": replica_is_fresh()}
+    return stats
@@ -1,20 +1,43 @@
 """
 Parking routes - Parking records CRUD, manual entry, image/video upload
 """
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, BackgroundTasks, Body
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, UploadFile, BackgroundTasks, Body, Query, Request, Response
 from sqlalchemy.orm import Session
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
 import os
 
-from backend.database import SessionLocal
-from backend import models, crud
+from backend.database import SessionLocal, read_engine, read_session
+from backend import models, crud, schemas
 from backend.services.plate_recognition import recognize_plate_from_bytes
+from backend.services.gate_service import (
+    GateEvent,
+    GateEventResult,
+    debounce_guard,
+    normalize_plate,
+    process_gate_batch,
+    process_gate_event,
+)
+from backend.services.occupancy_service import occupancy_index
+from backend.utils import idempotency
+from backend.utils.keyed_lock import LockTimeout
 from fastapi.encoders import jsonable_encoder
 
 router = APIRouter(prefix="/api", tags=["parking"])
 
 MIN_PLATE_CONFIDENCE = float(os.getenv("PLATE_MIN_CONFIDENCE", "0.8"))
 UPLOAD_DIR = "uploads"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# /gate_events/batch isteğinde en fazla olay
+MAX_GATE_BATCH = 1000
+# manual_entry, upload_image ve gate_events/batch aynı anahtar alanını paylaşır
+GATE_EVENT_SCOPE = "gate_event"
+BATCH_IDEMPOTENCY_ATTEMPTS = 3
+# Yazma sonrası bu süre boyunca okumalar ana veritabanından yapılır (read-your-writes)
+RECENT_WRITE_COOKIE = "parking_recent_write"
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
@@ -26,6 +49,27 @@ def get_db():
         db.close()
 
 
+def get_read_db(request: Request):
+    """Listeleme için session; replika varsa ve client yakın zamanda yazmadıysa replikadan"""
+    db = read_session(prefer_primary=RECENT_WRITE_COOKIE in request.cookies)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def mark_recent_write(response: Response):
+    """Client'ın sonraki okumalarını kısa süre ana veritabanına yönlendir"""
+    if read_engine is not None:
+        response.set_cookie(
+            key=RECENT_WRITE_COOKIE,
+            value="1",
+            max_age=READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
+
+
 def serialize_record(record: models.ParkingRecord):
     return jsonable_encoder(
         {
@@ -39,19 +83,60 @@ def serialize_record(record: models.ParkingRecord):
     )
 
 
-def get_serialized_records(db: Session):
-    records = db.query(models.ParkingRecord).order_by(models.ParkingRecord.entry_time.desc()).all()
+def get_serialized_records(db: Session, limit: int = DEFAULT_PAGE_SIZE):
+    records, _ = crud.get_records_page(crud.filter_records(db), limit)
     return [serialize_record(r) for r in records]
 
 
+def serialize_records_page(
+    db: Session,
+    query,
+    limit: int,
+    cursor: Optional[str],
+    include_total: bool,
+):
+    try:
+        records, next_cursor = crud.get_records_page(query, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response = {
+        "items": [serialize_record(r) for r in records],
+        "next_cursor": next_cursor,
+    }
+    if include_total:
+        response["total_estimate"] = crud.estimate_query_rows(db, query)
+    return response
+
+
 @router.get("/parking_records")
-def get_parking_records(db: Session = Depends(get_db)):
-    """Tüm park kayıtlarını listele"""
-    return get_serialized_records(db)
+def get_parking_records(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[Literal["active", "completed"]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    plate: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Park kayıtlarını (entry_time, id) azalan sırada sayfa sayfa listele.
+    Sonraki sayfa için dönen `next_cursor` değeri `cursor` parametresi olarak gönderilir.
+    """
+    plate_number = normalize_plate(plate, validate=False) if plate else None
+    query = crud.filter_records(
+        db,
+        status=status,
+        date_from=date_from,
+        date_to=date_to,
+        plate_number=plate_number,
+    )
+    return serialize_records_page(db, query, limit, cursor, include_total)
 
 
 @router.get("/parking_records/{record_id}")
-def get_parking_record(record_id: int, db: Session = Depends(get_db)):
+def get_parking_record(record_id: int, db: Session = Depends(get_read_db)):
     """Tekil park kaydı getir"""
     record = db.query(models.ParkingRecord).filter(models.ParkingRecord.id == record_id).first()
     if not record:
@@ -61,19 +146,34 @@ def get_parking_record(record_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/parking_records/by_plate/{plate_number}")
-def get_parking_records_by_plate(plate_number: str, db: Session = Depends(get_db)):
-    """Belirli bir plaka için tüm kayıtları getir"""
-    records = crud.get_records_by_plate(db, plate_number)
-    return [serialize_record(r) for r in records]
+def get_parking_records_by_plate(
+    plate_number: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    """Belirli bir plaka için kayıtları sayfa sayfa getir"""
+    query = crud.filter_records(db, plate_number=plate_number)
+    return serialize_records_page(db, query, limit, cursor, include_total)
+
+
+@router.get("/occupancy")
+def get_occupancy():
+    """Anlık doluluk ve günlük sayaçlar (bellekteki indeksten, sorgusuz)"""
+    return jsonable_encoder(occupancy_index.stats())
 
 
 @router.post("/parking_records")
 def create_parking_record(
+    background_tasks: BackgroundTasks,
+    http_response: Response,
     plate_number: str = Form(...),
     confidence: float | None = Form(None),
     db: Session = Depends(get_db)
 ):
     """Yeni park kaydı oluştur"""
+    mark_recent_write(http_response)
     record = models.ParkingRecord(
         plate_number=plate_number,
         entry_time=datetime.utcnow(),
@@ -82,12 +182,21 @@ def create_parking_record(
     db.add(record)
     db.commit()
     db.refresh(record)
-    return serialize_record(record)
+    occupancy_index.record_changed(record)
+    response = serialize_record(record)
+
+    # WebSocket broadcast için background task ekle
+    if background_tasks:
+        from backend.routes.websocket_routes import broadcast_record_event
+        background_tasks.add_task(broadcast_record_event, "record_created", response)
+
+    return response
 
 
 @router.put("/parking_records/{record_id}/exit")
 def complete_parking_record(
     background_tasks: BackgroundTasks,
+    http_response: Response,
     record_id: int, 
     fee: float = None,
     db: Session = Depends(get_db)
@@ -96,6 +205,7 @@ def complete_parking_record(
     Park kaydını tamamla (çıkış işlemi) - Admin paneli için
     Direkt çıkış yapar, payment/QR oluşturmaz
     """
+    mark_recent_write(http_response)
     record = db.query(models.ParkingRecord).filter(models.ParkingRecord.id == record_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Park kaydı bulunamadı")
@@ -119,11 +229,12 @@ def complete_parking_record(
     
     db.commit()
     db.refresh(record)
+    occupancy_index.record_changed(record)
     
     # WebSocket broadcast için background task ekle
     if background_tasks:
-        from backend.routes.websocket_routes import broadcast_latest_records
-        background_tasks.add_task(broadcast_latest_records)
+        from backend.routes.websocket_routes import broadcast_record_event
+        background_tasks.add_task(broadcast_record_event, "record_updated", serialize_record(record))
     
     return serialize_record(record)
 
@@ -131,11 +242,13 @@ def complete_parking_record(
 @router.put("/parking_records/{record_id}/plate")
 def update_parking_record_plate(
     background_tasks: BackgroundTasks,
+    http_response: Response,
     record_id: int,
     plate_data: dict = Body(...),
     db: Session = Depends(get_db)
 ):
     """Park kaydının plaka numarasını güncelle"""
+    mark_recent_write(http_response)
     record = db.query(models.ParkingRecord).filter(models.ParkingRecord.id == record_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Park kaydı bulunamadı")
@@ -147,13 +260,15 @@ def update_parking_record_plate(
     record.plate_number = plate_number
     db.commit()
     db.refresh(record)
+    occupancy_index.record_changed(record)
+    debounce_guard.forget_record(record_id)
     
     response = serialize_record(record)
     
     # WebSocket broadcast için background task ekle
     if background_tasks:
-        from backend.routes.websocket_routes import broadcast_latest_records
-        background_tasks.add_task(broadcast_latest_records)
+        from backend.routes.websocket_routes import broadcast_record_event
+        background_tasks.add_task(broadcast_record_event, "record_updated", serialize_record(record))
     
     return response
 
@@ -161,30 +276,141 @@ def update_parking_record_plate(
 @router.delete("/parking_records/{record_id}")
 def delete_parking_record(
     background_tasks: BackgroundTasks,
+    http_response: Response,
     record_id: int,
     db: Session = Depends(get_db)
 ):
     """Park kaydını sil"""
+    mark_recent_write(http_response)
     record = db.query(models.ParkingRecord).filter(models.ParkingRecord.id == record_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Park kaydı bulunamadı")
     
     db.delete(record)
     db.commit()
+    occupancy_index.record_deleted(record_id)
+    debounce_guard.forget_record(record_id)
     
     # WebSocket broadcast için background task ekle
     if background_tasks:
-        from backend.routes.websocket_routes import broadcast_latest_records
-        background_tasks.add_task(broadcast_latest_records)
+        from backend.routes.websocket_routes import broadcast_record_event
+        background_tasks.add_task(broadcast_record_event, "record_deleted", {"id": record_id})
     
     return {"success": True, "message": "Kayıt silindi"}
 
 
+def gate_event_response(result: GateEventResult) -> dict:
+    """process_gate_event sonucunu manual_entry / upload_image cevabına çevirir"""
+    record = result.record
+    response = {
+        "id": record.id,
+        "plate_number": record.plate_number,
+        "entry_time": record.entry_time,
+        "exit_time": record.exit_time,
+        "fee": record.fee,
+        "confidence": record.confidence,
+    }
+    if result.action == "debounced":
+        # Araç kameranın önünde bekliyor, yeni giriş yapılmadı
+        response["message"] = "Araç kameranın önünde bekliyor, yeni giriş yapılmadı"
+        return response
+
+    response["action"] = result.action
+    if result.payment is not None:
+        # QR içeriğini hazırla
+        from backend.services.qr_service import create_qr_content, create_qr_json
+        payment = result.payment
+        response["payment"] = {
+            "id": payment.id,
+            "reference": payment.reference,
+            "amount": payment.amount,
+            "currency": payment.currency,
+            "status": payment.status.value,
+            "qr_data": create_qr_content(payment),
+            "qr_json": create_qr_json(payment),
+        }
+    return response
+
+
+def broadcast_gate_event(background_tasks: BackgroundTasks, result: GateEventResult):
+    """Giriş/çıkış sonucunu WebSocket client'larına yayınla"""
+    if not background_tasks or result.action == "debounced":
+        return
+    from backend.routes.websocket_routes import (
+        broadcast_payment_event,
+        broadcast_record_event,
+        serialize_payment,
+    )
+    event_type = "record_created" if result.action == "entry" else "record_updated"
+    background_tasks.add_task(broadcast_record_event, event_type, serialize_record(result.record))
+    if result.payment is not None:
+        background_tasks.add_task(broadcast_payment_event, "payment_created", serialize_payment(result.payment))
+
+
+def run_gate_event(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    plate_number: str,
+    confidence: Optional[float],
+    idempotency_key: Optional[str],
+):
+    """
+    process_gate_event'i çalıştırıp cevap gövdesini döner. Idempotency-Key
+    varsa cevap giriş/çıkışla aynı transaction'da (debounce cevabı plaka
+    lock'u tutulurken kısa bir transaction'da) kaydedilir; eş zamanlı aynı
+    anahtarlı istek önce kaydettiyse onun cevabı döner.
+    """
+    saved = {}
+
+    def save_response(session: Session, result: GateEventResult):
+        saved["body"] = jsonable_encoder(gate_event_response(result))
+        idempotency.stage(session, GATE_EVENT_SCOPE, idempotency_key, saved["body"])
+
+    try:
+        result = process_gate_event(
+            db, plate_number, confidence, before_commit=save_response if idempotency_key else None
+        )
+    except idempotency.IdempotencyConflict:
+        return idempotency.replay(idempotency.lookup(db, GATE_EVENT_SCOPE, idempotency_key))
+    except LockTimeout:
+        raise HTTPException(status_code=503, detail="Bu plaka için bekleyen okuma çok fazla, tekrar deneyin")
+
+    body = saved.get("body") or jsonable_encoder(gate_event_response(result))
+    if idempotency_key:
+        idempotency.remember(GATE_EVENT_SCOPE, idempotency_key, body)
+    broadcast_gate_event(background_tasks, result)
+    return body
+
+
+def lookup_gate_response(db: Session, idempotency_key: str):
+    """
+    Kayıtlı gate cevabını arar ve lookup transaction'ını kapatır: istek plaka
+    tanıma ve plaka lock'u beklerken havuzdan bağlantı tutmamalı.
+    """
+    stored = idempotency.lookup(db, GATE_EVENT_SCOPE, idempotency_key)
+    db.rollback()
+    return stored
+
+
+def save_upload(content: bytes, filename: str):
+    """Yüklenen dosyayı diske kaydet (opsiyonel, hata yutulur)"""
+    try:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        safe_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{filename}"
+        path = os.path.join(UPLOAD_DIR, safe_name)
+        with open(path, "wb") as f:
+            f.write(content)
+    except Exception:
+        pass
+
+
 @router.post("/manual_entry")
 def manual_entry(
     background_tasks: BackgroundTasks,
+    http_response: Response,
     plate_number: str = Form(...),
     confidence: float | None = Form(None),
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
@@ -192,113 +418,31 @@ def manual_entry(
     1. Son 10 saniye içinde aynı plaka için giriş yapılmışsa, yeni giriş yapma (araç bekliyor)
     2. Aktif kayıt (exit_time=None) varsa, çıkış yap
     3. Aktif kayıt yoksa, yeni giriş kaydı oluştur
+    Idempotency-Key ile tekrar gönderilen istek kaydedilmiş cevabı alır.
     """
-    import re
-    
-    # Plaka formatı doğrulama (Türkiye standartları)
-    normalized_plate = plate_number.strip().upper()
-    plate_regex = re.compile(r'^(0[1-9]|[1-7][0-9]|8[0-1])\s?[A-Z]{1,3}\s?\d{2,4}$')
-    
-    if not plate_regex.match(normalized_plate):
-        raise HTTPException(
-            status_code=400,
-            detail="Lütfen Türkiye plaka formatına uygun geçerli bir plaka giriniz. Örnek: 34 ABC 1234"
-        )
-    
-    # Plakayı normalize et (boşlukları temizle)
-    plate_number = re.sub(r'\s+', '', normalized_plate)
-    
-    # 1. Son 10 saniye içinde giriş yapılmış mı kontrol et (debounce)
-    recent_entry = crud.get_recent_entry_by_plate(db, plate_number, seconds=10)
-    if recent_entry:
-        # Araç kameranın önünde bekliyor, yeni giriş yapma
-        return {
-            "id": recent_entry.id,
-            "plate_number": recent_entry.plate_number,
-            "entry_time": recent_entry.entry_time,
-            "exit_time": recent_entry.exit_time,
-            "fee": recent_entry.fee,
-            "confidence": recent_entry.confidence,
-            "message": "Araç kameranın önünde bekliyor, yeni giriş yapılmadı"
-        }
-    
-    # 2. Aktif kayıt (çıkış yapılmamış) var mı kontrol et
-    active_record = crud.get_active_record_by_plate(db, plate_number)
-    
-    if active_record:
-        # Aktif kayıt varsa, çıkış yap
-        exit_record = crud.exit_parking_by_plate(db, plate_number)
-        if exit_record:
-            # Ödeme kaydı oluştur
-            payment = crud.create_payment(
-                db=db,
-                amount=exit_record.fee,
-                currency="TRY",
-                parking_record_id=exit_record.id
-            )
-            
-            # Park kaydına payment_id ekle
-            exit_record.payment_id = payment.id
-            db.commit()
-            db.refresh(exit_record)
-            
-            # QR içeriğini hazırla
-            from backend.services.qr_service import create_qr_content, create_qr_json
-            qr_data = create_qr_content(payment)
-            qr_json = create_qr_json(payment)
-            
-            if background_tasks:
-                from backend.routes.websocket_routes import broadcast_latest_records
-                background_tasks.add_task(broadcast_latest_records)
-            
-            return {
-                "id": exit_record.id,
-                "plate_number": exit_record.plate_number,
-                "entry_time": exit_record.entry_time,
-                "exit_time": exit_record.exit_time,
-                "fee": exit_record.fee,
-                "confidence": exit_record.confidence,
-                "action": "exit",
-                "payment": {
-                    "id": payment.id,
-                    "reference": payment.reference,
-                    "amount": payment.amount,
-                    "currency": payment.currency,
-                    "status": payment.status.value,
-                    "qr_data": qr_data,
-                    "qr_json": qr_json
-                }
-            }
-    
-    # 3. Aktif kayıt yoksa, yeni giriş kaydı oluştur
-    record = models.ParkingRecord(
-        plate_number=plate_number,
-        entry_time=datetime.utcnow(),
-        confidence=confidence,
-    )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
+    mark_recent_write(http_response)
+    idempotency_key = idempotency.validate_key(idempotency_key)
+    if idempotency_key:
+        stored = lookup_gate_response(db, idempotency_key)
+        if stored is not None:
+            return idempotency.replay(stored)
+
+    # Plaka formatı doğrulama (Türkiye standartları) ve normalize etme
+    try:
+        plate_number = normalize_plate(plate_number)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if background_tasks:
-        from backend.routes.websocket_routes import broadcast_latest_records
-        background_tasks.add_task(broadcast_latest_records)
-
-    return {
-        "id": record.id,
-        "plate_number": record.plate_number,
-        "entry_time": record.entry_time,
-        "exit_time": record.exit_time,
-        "fee": record.fee,
-        "confidence": record.confidence,
-        "action": "entry"
-    }
+    # Debounce, giriş/çıkış ve ödeme tek transaction'da
+    return run_gate_event(db, background_tasks, plate_number, confidence, idempotency_key)
 
 
 @router.post("/upload/image")
 def upload_image(
     background_tasks: BackgroundTasks,
+    http_response: Response,
     file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
@@ -306,7 +450,15 @@ def upload_image(
     1. Son 10 saniye içinde aynı plaka için giriş yapılmışsa, yeni giriş yapma (araç bekliyor)
     2. Aktif kayıt (exit_time=None) varsa, çıkış yap
     3. Aktif kayıt yoksa, yeni giriş kaydı oluştur
+    Idempotency-Key ile tekrar gönderilen istek plaka tanıma yapılmadan kaydedilmiş cevabı alır.
     """
+    mark_recent_write(http_response)
+    idempotency_key = idempotency.validate_key(idempotency_key)
+    if idempotency_key:
+        stored = lookup_gate_response(db, idempotency_key)
+        if stored is not None:
+            return idempotency.replay(stored)
+
     # 1) Dosya içeriğini oku
     try:
         content = file.file.read()
@@ -323,129 +475,130 @@ def upload_image(
     if conf < MIN_PLATE_CONFIDENCE:
         raise HTTPException(status_code=400, detail="Güven oranı yetersiz")
 
-    # 3) Son 10 saniye içinde giriş yapılmış mı kontrol et (debounce)
-    recent_entry = crud.get_recent_entry_by_plate(db, plate, seconds=10)
-    if recent_entry:
-        # Araç kameranın önünde bekliyor, yeni giriş yapma
-        response = {
-            "id": recent_entry.id,
-            "plate_number": recent_entry.plate_number,
-            "entry_time": recent_entry.entry_time,
-            "exit_time": recent_entry.exit_time,
-            "fee": recent_entry.fee,
-            "confidence": recent_entry.confidence,
-            "message": "Araç kameranın önünde bekliyor, yeni giriş yapılmadı"
-        }
-        # Dosyayı kaydet
-        try:
-            os.makedirs(UPLOAD_DIR, exist_ok=True)
-            safe_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-            path = os.path.join(UPLOAD_DIR, safe_name)
-            with open(path, "wb") as f:
-                f.write(content)
-        except Exception:
-            pass
-        return response
-    
-    # 4) Aktif kayıt (çıkış yapılmamış) var mı kontrol et
-    active_record = crud.get_active_record_by_plate(db, plate)
-    
-    if active_record:
-        # Aktif kayıt varsa, çıkış yap
-        try:
-            exit_record = crud.exit_parking_by_plate(db, plate)
-            if exit_record:
-                # Ödeme kaydı oluştur
-                payment = crud.create_payment(
-                    db=db,
-                    amount=exit_record.fee,
-                    currency="TRY",
-                    parking_record_id=exit_record.id
-                )
-                
-                # Park kaydına payment_id ekle
-                exit_record.payment_id = payment.id
-                db.commit()
-                db.refresh(exit_record)
-                
-                # QR içeriğini hazırla
-                from backend.services.qr_service import create_qr_content, create_qr_json
-                qr_data = create_qr_content(payment)
-                qr_json = create_qr_json(payment)
-                
-                response = {
-                    "id": exit_record.id,
-                    "plate_number": exit_record.plate_number,
-                    "entry_time": exit_record.entry_time,
-                    "exit_time": exit_record.exit_time,
-                    "fee": exit_record.fee,
-                    "confidence": exit_record.confidence,
-                    "action": "exit",
-                    "payment": {
-                        "id": payment.id,
-                        "reference": payment.reference,
-                        "amount": payment.amount,
-                        "currency": payment.currency,
-                        "status": payment.status.value,
-                        "qr_data": qr_data,
-                        "qr_json": qr_json
-                    }
-                }
-                # Dosyayı kaydet
-                try:
-                    os.makedirs(UPLOAD_DIR, exist_ok=True)
-                    safe_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-                    path = os.path.join(UPLOAD_DIR, safe_name)
-                    with open(path, "wb") as f:
-                        f.write(content)
-                except Exception:
-                    pass
-                
-                if background_tasks:
-                    from backend.routes.websocket_routes import broadcast_latest_records
-                    background_tasks.add_task(broadcast_latest_records)
-                return response
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=500, detail=f"Çıkış işlemi hatası: {str(e)}")
-    
-    # 5) Aktif kayıt yoksa, yeni giriş kaydı oluştur
+    # 3) Debounce, giriş/çıkış ve ödeme tek transaction'da
     try:
-        record = models.ParkingRecord(
-            plate_number=plate,
-            entry_time=datetime.utcnow(),
-            confidence=conf,
+        response = run_gate_event(
+            db, background_tasks, normalize_plate(plate, validate=False), conf, idempotency_key
         )
-        db.add(record)
-        db.commit()
-        db.refresh(record)
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Veritabanı hatası: {str(e)}")
 
-    # 6) Opsiyonel: yüklenen dosyayı diske kaydet
-    try:
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        safe_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{file.filename}"
-        path = os.path.join(UPLOAD_DIR, safe_name)
-        with open(path, "wb") as f:
-            f.write(content)
-    except Exception:
-        pass
+    # 4) Opsiyonel: yüklenen dosyayı diske kaydet
+    save_upload(content, file.filename)
 
-    response = {
-        "id": record.id,
-        "plate_number": record.plate_number,
-        "entry_time": record.entry_time,
-        "exit_time": record.exit_time,
-        "fee": record.fee,
-        "confidence": conf,
-        "action": "entry"
-    }
+    return response
 
-    if background_tasks:
-        from backend.routes.websocket_routes import broadcast_latest_records
-        background_tasks.add_task(broadcast_latest_records)
 
-    return response
+def _utc_naive(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """Kayıt zamanları timezone'suz UTC tutulur"""
+    if timestamp is None or timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.post("/gate_events/batch")
+def gate_events_batch(
+    background_tasks: BackgroundTasks,
+    http_response: Response,
+    events: List[schemas.GateEventIn] = Body(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Birikmiş plaka okumalarını toplu işler (tracker kesintisi sonrası, tekrar oynatma).
+    Olaylar zaman sırasıyla tek transaction'da işlenir; manual_entry ile aynı
+    debounce/giriş/çıkış kuralları geçerlidir. Cevapta her olayın sonucu
+    gönderildiği sıradadır; geçersiz plakalı olaylar "error" döner.
+    idempotency_key'i daha önce işlenmiş olaylar (manual_entry'nin
+    Idempotency-Key'i ile aynı alan) tekrar işlenmez, "replayed" ile döner.
+    """
+    if len(events) > MAX_GATE_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Tek istekte en fazla {MAX_GATE_BATCH} olay gönderilebilir"
+        )
+    mark_recent_write(http_response)
+    now = datetime.utcnow()
+
+    outcomes = [
+        {"index": index, "idempotency_key": item.idempotency_key, "camera_id": item.camera_id}
+        for index, item in enumerate(events)
+    ]
+    gate_events: List[GateEvent] = []
+    positions: List[int] = []
+    for index, item in enumerate(events):
+        try:
+            plate_number = normalize_plate(item.plate)
+        except ValueError as e:
+            outcomes[index].update(action="error", detail=str(e))
+            continue
+        gate_events.append(
+            GateEvent(
+                plate_number=plate_number,
+                timestamp=_utc_naive(item.timestamp) or now,
+                confidence=item.confidence,
+                camera_id=item.camera_id,
+                idempotency_key=item.idempotency_key,
+            )
+        )
+        positions.append(index)
 
+    keys = {event.idempotency_key for event in gate_events if event.idempotency_key}
+    for _attempt in range(BATCH_IDEMPOTENCY_ATTEMPTS):
+        # Daha önce işlenmiş anahtarlar tekrar işlenmez, kaydedilmiş sonuçları döner
+        stored = idempotency.lookup_many(db, GATE_EVENT_SCOPE, keys) if keys else {}
+        # Plaka lock'ları beklenirken havuzdan bağlantı tutulmasın
+        db.rollback()
+        pending = [
+            (index, event)
+            for index, event in zip(positions, gate_events)
+            if event.idempotency_key not in stored
+        ]
+        saved = {}
+
+        def save_responses(results: List[GateEventResult]):
+            for (_index, event), result in zip(pending, results):
+                key = event.idempotency_key
+                if key and key not in saved:
+                    saved[key] = jsonable_encoder(gate_event_response(result))
+                    idempotency.stage(db, GATE_EVENT_SCOPE, key, saved[key])
+
+        try:
+            results = process_gate_batch(db, [event for _index, event in pending], now, save_responses)
+            break
+        except idempotency.IdempotencyConflict:
+            # Eş zamanlı bir istek bazı anahtarları kaydetti; tekrar okunup o olaylar atlanır
+            continue
+        except LockTimeout:
+            raise HTTPException(status_code=503, detail="Plakalar için bekleyen okuma çok fazla, tekrar deneyin")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Veritabanı hatası: {str(e)}")
+    else:
+        raise HTTPException(status_code=409, detail="Aynı Idempotency-Key'ler eş zamanlı işleniyor, tekrar deneyin")
+
+    for index, event in zip(positions, gate_events):
+        if event.idempotency_key in stored:
+            body = stored[event.idempotency_key].body
+            outcomes[index].update(
+                action=body.get("action", "debounced"),
+                record_id=body["id"],
+                payment_id=(body.get("payment") or {}).get("id"),
+                replayed=True,
+            )
+    for (index, event), result in zip(pending, results):
+        outcomes[index].update(
+            action=result.action,
+            record_id=result.record.id,
+            payment_id=result.payment.id if result.payment is not None else None,
+        )
+        if event.idempotency_key in saved:
+            idempotency.remember(GATE_EVENT_SCOPE, event.idempotency_key, saved[event.idempotency_key])
+    # Aynı idempotency_key'li tekrarlar aynı sonucu paylaşır, bir kez yayınlanır
+    for result in {id(result): result for result in results}.values():
+        broadcast_gate_event(background_tasks, result)
+
+    return {
+        "results": outcomes,
+        "summary": dict(Counter(outcome["action"] for outcome in outcomes)),
+    }
@@ -1,23 +1,36 @@
 """
 Payment routes - Ödeme işlemleri ve QR kod yönetimi
 """
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Body
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Optional
 import asyncio
 import logging
+import os
 
-from backend.database import SessionLocal
+from backend.database import AsyncSessionLocal, SessionLocal
 from backend import models
 from backend import schemas
-from backend import crud
+from backend import crud, crud_async
 from backend.services.qr_service import create_qr_content, create_qr_json
 from backend.services.barrier_service import BarrierService
+from backend.routes.websocket_routes import broadcast_payment_event, serialize_payment
+from backend.utils import idempotency
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["payments"])
 
+PAYMENT_CREATE_SCOPE = "payment_create"
+PAYMENT_CONFIRM_SCOPE = "payment_confirm"
+# Onaylanmış ama bariyeri açılmamış ödemenin işi bu süreden sonra aynı
+# anahtarlı tekrar denemeye devredilir (sahibi çökmüş sayılır)
+CONFIRM_LEASE_SECONDS = float(os.getenv("PAYMENT_CONFIRM_LEASE_SECONDS", "30"))
+CONFIRM_IN_PROGRESS_DETAIL = "Ödeme onaylandı, bariyer açılıyor"
+
 
 def get_db():
     db = SessionLocal()
@@ -27,25 +40,50 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 @router.post("/payments", response_model=schemas.PaymentResponse)
 def create_payment(
+    background_tasks: BackgroundTasks,
     payment_data: schemas.PaymentCreate = Body(...),
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
     Yeni ödeme kaydı oluşturur (çıkış yaparken)
+    Idempotency-Key ile tekrar gönderilen istek yeni ödeme oluşturmaz, ilk cevabı alır.
     """
+    idempotency_key = idempotency.validate_key(idempotency_key)
+    if idempotency_key:
+        stored = idempotency.lookup(db, PAYMENT_CREATE_SCOPE, idempotency_key)
+        if stored is not None:
+            return idempotency.replay(stored)
+
     try:
         payment = crud.create_payment(
             db=db,
             amount=payment_data.amount,
             currency=payment_data.currency,
-            parking_record_id=payment_data.parking_record_id
+            parking_record_id=payment_data.parking_record_id,
+            commit=not idempotency_key
         )
+        if idempotency_key:
+            # Cevap ödemeyle aynı transaction'da kaydedilir
+            response = jsonable_encoder(schemas.PaymentResponse.model_validate(payment))
+            idempotency.stage(db, PAYMENT_CREATE_SCOPE, idempotency_key, response)
+            db.commit()
+            idempotency.remember(PAYMENT_CREATE_SCOPE, idempotency_key, response)
         
         logger.info(f"Payment created: ID={payment.id}, Reference={payment.reference}, Amount={payment.amount} {payment.currency}")
+        background_tasks.add_task(broadcast_payment_event, "payment_created", serialize_payment(payment))
         
         return payment
+    except idempotency.IdempotencyConflict:
+        db.rollback()
+        return idempotency.replay(idempotency.lookup(db, PAYMENT_CREATE_SCOPE, idempotency_key))
     except Exception as e:
         logger.error(f"Error creating payment: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ödeme kaydı oluşturulamadı: {str(e)}")
@@ -83,13 +121,24 @@ def get_payment_qr(
 @router.post("/payments/{payment_id}/confirm")
 async def confirm_payment(
     payment_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """
     Ödemeyi onaylar (test/simülasyon için)
     Bu endpoint ödeme tamamlandığını simüle eder.
+    Idempotency-Key ile tekrar gönderilen istek ilk onayın cevabını alır;
+    ilk onay bariyeri açamadan kaldıysa tekrar deneme bariyeri açar.
     """
-    payment = crud.get_payment_by_id(db, payment_id)
+    idempotency_key = idempotency.validate_key(idempotency_key)
+    if idempotency_key:
+        stored = await idempotency.lookup_async(db, PAYMENT_CONFIRM_SCOPE, idempotency_key)
+        if stored is not None:
+            if stored.status_code == idempotency.IN_PROGRESS_STATUS:
+                return await resume_confirm(db, payment_id, idempotency_key)
+            return idempotency.replay(stored)
+
+    payment = await crud_async.get_payment_by_id(db, payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Ödeme kaydı bulunamadı")
     
@@ -99,43 +148,94 @@ async def confirm_payment(
     if payment.status == models.PaymentStatus.CANCELLED:
         raise HTTPException(status_code=400, detail="Bu ödeme iptal edilmiş")
     
-    # Ödeme durumunu PAID yap
-    updated_payment = crud.update_payment_status(
-        db=db,
-        payment_id=payment_id,
-        status=models.PaymentStatus.PAID
-    )
+    # Ödeme durumunu PAID yap (sadece hâlâ PENDING ise; eş zamanlı iki onaydan biri kazanır).
+    # Anahtar varsa "işleniyor" kaydı aynı transaction'da yazılır: bariyer
+    # açılamazsa ya da süreç çökerse tekrar deneme işi oradan devralır
+    updated_payment = await crud_async.mark_payment_paid(db, payment_id)
+    if updated_payment is not None and idempotency_key:
+        try:
+            await idempotency.stage_async(
+                db, PAYMENT_CONFIRM_SCOPE, idempotency_key,
+                {"detail": CONFIRM_IN_PROGRESS_DETAIL}, status_code=idempotency.IN_PROGRESS_STATUS
+            )
+        except idempotency.IdempotencyConflict:
+            updated_payment = None
+    if updated_payment is None:
+        await db.rollback()
+        if idempotency_key:
+            # Aynı anahtarlı eş zamanlı istek onayladı; cevabı (ya da "işleniyor" ise 409) döner
+            return idempotency.replay(
+                await idempotency.lookup_async(db, PAYMENT_CONFIRM_SCOPE, idempotency_key)
+            )
+        raise HTTPException(status_code=400, detail="Bu ödeme zaten tamamlanmış")
+    await db.commit()
     
     logger.info(f"Payment confirmed: ID={payment_id}, Reference={updated_payment.reference}")
-    
-    # Bariyeri aç
+    await broadcast_payment_event("payment_updated", serialize_payment(updated_payment))
+    return await open_barrier_for_payment(db, updated_payment, idempotency_key)
+
+
+async def resume_confirm(db: AsyncSession, payment_id: int, idempotency_key: str):
+    """
+    "İşleniyor" kaydı bulunan tekrar deneme: sahibi CONFIRM_LEASE_SECONDS
+    içinde bitirmediyse (bariyer hatası, çökme) bariyer açma işini devralır,
+    aksi halde 409 döner.
+    """
+    claimed = await idempotency.claim_async(
+        db, PAYMENT_CONFIRM_SCOPE, idempotency_key, CONFIRM_LEASE_SECONDS
+    )
+    await db.commit()
+    if not claimed:
+        # Sahibi hâlâ çalışıyor ya da bu arada tamamladı
+        return idempotency.replay(
+            await idempotency.lookup_async(db, PAYMENT_CONFIRM_SCOPE, idempotency_key)
+        )
+
+    payment = await crud_async.get_payment_by_id(db, payment_id)
+    if payment is None or payment.status != models.PaymentStatus.PAID:
+        await idempotency.release_async(db, PAYMENT_CONFIRM_SCOPE, idempotency_key)
+        await db.commit()
+        raise HTTPException(status_code=409, detail="Idempotency-Key başka bir ödeme onayına ait")
+    logger.info(f"Resuming payment confirmation: ID={payment_id}")
+    return await open_barrier_for_payment(db, payment, idempotency_key)
+
+
+async def open_barrier_for_payment(
+    db: AsyncSession, payment: models.Payment, idempotency_key: Optional[str]
+):
+    """PAID ödemenin bariyerini açar, park kaydına bağlar ve onay cevabını kaydeder"""
     try:
-        await BarrierService.open_barrier(updated_payment)
+        await BarrierService.open_barrier(payment)
         
         # Park kaydını güncelle (eğer varsa)
-        if updated_payment.parking_record_id:
-            parking_record = db.query(models.ParkingRecord).filter(
-                models.ParkingRecord.id == updated_payment.parking_record_id
-            ).first()
-            if parking_record:
-                parking_record.payment_id = updated_payment.id
-                db.commit()
-        
-        return {
-            "success": True,
-            "message": "Ödeme tamamlandı ve bariyer açıldı",
-            "payment": {
-                "id": updated_payment.id,
-                "reference": updated_payment.reference,
-                "status": updated_payment.status.value,
-                "amount": updated_payment.amount,
-                "currency": updated_payment.currency
-            }
-        }
+        if payment.parking_record_id:
+            await crud_async.attach_payment_to_record(db, payment.parking_record_id, payment.id)
     except ValueError as e:
         logger.error(f"Barrier error: {str(e)}")
+        if idempotency_key:
+            # Tekrar deneme beklemeden işi devralabilsin
+            await db.rollback()
+            await idempotency.release_async(db, PAYMENT_CONFIRM_SCOPE, idempotency_key)
+            await db.commit()
         raise HTTPException(status_code=500, detail=str(e))
 
+    response = {
+        "success": True,
+        "message": "Ödeme tamamlandı ve bariyer açıldı",
+        "payment": {
+            "id": payment.id,
+            "reference": payment.reference,
+            "status": models.PaymentStatus.PAID.value,
+            "amount": payment.amount,
+            "currency": payment.currency
+        }
+    }
+    if idempotency_key:
+        await idempotency.complete_async(db, PAYMENT_CONFIRM_SCOPE, idempotency_key, response)
+        await db.commit()
+        idempotency.remember(PAYMENT_CONFIRM_SCOPE, idempotency_key, response)
+    return response
+
 
 @router.get("/payments/{payment_id}", response_model=schemas.PaymentResponse)
 def get_payment(
@@ -152,13 +252,13 @@ def get_payment(
 @router.post("/payments/{payment_id}/auto-confirm")
 async def auto_confirm_payment(
     payment_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Otomatik ödeme onayı (30 saniye sonra)
     QR gösterildikten sonra otomatik olarak ödemeyi tamamlar
     """
-    payment = crud.get_payment_by_id(db, payment_id)
+    payment = await crud_async.get_payment_by_id(db, payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Ödeme kaydı bulunamadı")
     
@@ -170,9 +270,12 @@ async def auto_confirm_payment(
     
     logger.info(f"Auto-confirm started for payment {payment_id}. Will confirm in 30 seconds...")
     
+    # Beklerken bağlantıyı havuza geri ver
+    await db.rollback()
+    
     # 30 saniye bekle
     await asyncio.sleep(30)
     
     # Ödemeyi onayla
-    return await confirm_payment(payment_id, db)
+    return await confirm_payment(payment_id, db, idempotency_key=None)
 
@@ -9,7 +9,13 @@ import hashlib
 
 from backend.database import SessionLocal
 from backend import models
-from backend.utils.session_manager import get_session_user, SESSION_COOKIE_NAME
+from backend.utils.session_manager import (
+    get_session_user,
+    get_user_principal,
+    invalidate_user_principal,
+    UserPrincipal,
+    SESSION_COOKIE_NAME,
+)
 
 
 class UpdateMyInfoRequest(BaseModel):
@@ -42,28 +48,17 @@ def get_db():
         db.close()
 
 
-def require_super_admin(request: Request, db: Session = Depends(get_db)):
+def require_super_admin(request: Request, db: Session = Depends(get_db)) -> UserPrincipal:
     """Üst admin kontrolü yapar"""
-    token = request.cookies.get(SESSION_COOKIE_NAME)
-    if not token:
-        raise HTTPException(status_code=401, detail="Session bulunamadı")
-    
-    session = get_session_user(token)
-    if not session:
-        raise HTTPException(status_code=401, detail="Session geçersiz veya süresi dolmuş")
-    
-    user = db.query(models.User).filter(models.User.id == session["user_id"]).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="Kullanıcı bulunamadı")
-    
+    user = require_auth(request, db)
     if user.is_super_admin != 1:
         raise HTTPException(status_code=403, detail="Üst admin yetkisi gerekli")
     
     return user
 
 
-def require_auth(request: Request, db: Session = Depends(get_db)):
-    """Giriş yapmış kullanıcı kontrolü yapar"""
+def require_auth(request: Request, db: Session = Depends(get_db)) -> UserPrincipal:
+    """Giriş yapmış kullanıcı kontrolü yapar (kullanıcı kısa süreli cache'ten gelir)"""
     token = request.cookies.get(SESSION_COOKIE_NAME)
     if not token:
         raise HTTPException(status_code=401, detail="Session bulunamadı")
@@ -72,7 +67,7 @@ def require_auth(request: Request, db: Session = Depends(get_db)):
     if not session:
         raise HTTPException(status_code=401, detail="Session geçersiz veya süresi dolmuş")
     
-    user = db.query(models.User).filter(models.User.id == session["user_id"]).first()
+    user = get_user_principal(db, session["user_id"])
     if not user:
         raise HTTPException(status_code=401, detail="Kullanıcı bulunamadı")
     
@@ -83,7 +78,7 @@ def require_auth(request: Request, db: Session = Depends(get_db)):
 def list_users(
     request: Request,
     db: Session = Depends(get_db),
-    _current_user: models.User = Depends(require_super_admin)
+    _current_user: UserPrincipal = Depends(require_super_admin)
 ):
     """Tüm kullanıcıları listele (sadece üst admin)"""
     users = db.query(models.User).order_by(models.User.created_at.desc()).all()
@@ -103,7 +98,7 @@ def create_user(
     request: Request,
     user_data: UserCreate = Body(...),
     db: Session = Depends(get_db),
-    _current_user: models.User = Depends(require_super_admin)
+    _current_user: UserPrincipal = Depends(require_super_admin)
 ):
     """Yeni kullanıcı oluştur (sadece üst admin)"""
     # Email doğrulama
@@ -142,7 +137,7 @@ def update_user(
     user_id: int,
     user_data: UserUpdate = Body(...),
     db: Session = Depends(get_db),
-    _current_user: models.User = Depends(require_super_admin)
+    _current_user: UserPrincipal = Depends(require_super_admin)
 ):
     """Kullanıcı bilgilerini güncelle (sadece üst admin)"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -170,6 +165,7 @@ def update_user(
     
     db.commit()
     db.refresh(user)
+    invalidate_user_principal(user.id)
     
     return {
         "id": user.id,
@@ -185,7 +181,7 @@ def change_user_password(
     user_id: int,
     password_data: PasswordUpdate = Body(...),
     db: Session = Depends(get_db),
-    _current_user: models.User = Depends(require_super_admin)
+    _current_user: UserPrincipal = Depends(require_super_admin)
 ):
     """Kullanıcı şifresini değiştir (sadece üst admin)"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -197,6 +193,7 @@ def change_user_password(
     user.password = hashed_password
     
     db.commit()
+    invalidate_user_principal(user.id)
     
     return {"success": True, "message": "Şifre güncellendi"}
 
@@ -206,7 +203,7 @@ def delete_user(
     request: Request,
     user_id: int,
     db: Session = Depends(get_db),
-    _current_user: models.User = Depends(require_super_admin)
+    _current_user: UserPrincipal = Depends(require_super_admin)
 ):
     """Kullanıcıyı sil (sadece üst admin)"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -219,6 +216,7 @@ def delete_user(
     
     db.delete(user)
     db.commit()
+    invalidate_user_principal(user_id)
     
     return {"success": True, "message": "Kullanıcı silindi"}
 
@@ -228,7 +226,7 @@ def update_my_info(
     request: Request,
     update_data: UpdateMyInfoRequest = Body(...),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_auth)
+    current_user: UserPrincipal = Depends(require_auth)
 ):
     """Kendi kullanıcı bilgilerini güncelle (email ve şifre)"""
     user = db.query(models.User).filter(models.User.id == current_user.id).first()
@@ -263,6 +261,7 @@ def update_my_info(
     
     db.commit()
     db.refresh(user)
+    invalidate_user_principal(user.id)
     
     return {
         "success": True,
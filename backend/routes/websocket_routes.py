@@ -1,36 +1,203 @@
 """
 WebSocket routes - Real-time updates for parking records
+
+Protokol:
+- Bağlanan client'a önce ilk sayfa gönderilir:
+  {"type": "snapshot", "version": v, "payload": [...], "next_cursor": c}
+- Değişiklikler kısa bir pencerede (COALESCE_WINDOW) biriktirilip tek mesajla
+  gönderilir; aynı kayda ait birden fazla değişiklik tek olaya indirgenir:
+  {"type": "batch", "from_version": v0, "version": v1, "events": [...]}
+  Her olay sadece değişen kaydı taşır:
+  {"type": "record_created" | "record_updated", "version": v, "payload": {...}}
+  {"type": "record_deleted", "version": v, "payload": {"id": ...}}
+  {"type": "payment_created" | "payment_updated", "version": v, "payload": {...}}
+- Olaylar event bus üzerinden gelir; EVENT_BROKER=postgres iken başka bir
+  worker'da oluşan değişiklikler de bu worker'ın client'larına ulaşır.
+  Versiyon numaraları worker'a özeldir.
+- Client -> server:
+  {"type": "snapshot", "cursor": c, "limit": n}  daha eski kayıtların sayfası
+  {"type": "resync", "version": v}  v'den sonra kaçırılan değişiklikler
+    (geçmişte yoksa yeni bir snapshot döner)
+  {"type": "pong"}  sunucunun {"type": "ping"} mesajına cevap
+- Her client'ın kendi sınırlı gönderim kuyruğu vardır; kuyruğu dolan client
+  1013, ping'ine IDLE_TIMEOUT boyunca cevap vermeyen client 1001 koduyla
+  kapatılır (client yeniden bağlanıp yeni snapshot alır).
 """
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Set
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 
-from backend.database import SessionLocal
-from backend import models
+from backend.database import AsyncReadSessionLocal, AsyncSessionLocal, replica_is_fresh
+from backend import models, crud_async
+from backend.services.event_bus import event_bus
+from backend.services.gate_service import debounce_guard
+from backend.services.occupancy_service import occupancy_index
 
 router = APIRouter(tags=["websocket"])
 
+SNAPSHOT_LIMIT = 200
+MAX_SNAPSHOT_LIMIT = 500
+# Resync için hafızada tutulan son değişiklik sayısı
+HISTORY_SIZE = 1000
+# Değişikliklerin tek mesajda toplandığı süre (saniye)
+COALESCE_WINDOW = 0.05
+# Client başına bekleyebilecek en fazla mesaj; aşılırsa bağlantı kapatılır
+SEND_QUEUE_SIZE = 64
+# Tek bir mesajın gönderimi için süre sınırı (saniye)
+SEND_TIMEOUT = 10
+# Sunucunun ping aralığı ve cevapsız client'ın kapatılma süresi (saniye)
+PING_INTERVAL = 20
+IDLE_TIMEOUT = 60
+
+
+class ClientConnection:
+    """Tek bir client; kendi gönderim kuyruğu ve gönderici task'ı vardır.
+
+    Kuyruk sınırlıdır: aynı anahtarlı (key) bekleyen mesaj yenisiyle
+    değiştirilir, kuyruk dolarsa client yavaş sayılıp bağlantısı kapatılır.
+    """
+
+    def __init__(self, websocket: WebSocket, on_close):
+        self.websocket = websocket
+        self.queue: Deque[Tuple[Optional[str], str]] = deque()
+        self.last_seen = time.monotonic()
+        self.closed = False
+        # Ping trafikten bağımsız olarak PING_INTERVAL'da bir gönderilir
+        self._next_ping = self.last_seen + PING_INTERVAL
+        # Cevaplanmamış en eski ping'in zamanı
+        self._ping_sent: Optional[float] = None
+        self._on_close = on_close
+        self._ready = asyncio.Event()
+        self._close_task: Optional[asyncio.Task] = None
+        self._task = asyncio.create_task(self._sender())
+
+    def enqueue(self, text: str, key: Optional[str] = None):
+        if self.closed:
+            return
+        if key is not None:
+            for index, (queued_key, _text) in enumerate(self.queue):
+                if queued_key == key:
+                    self.queue[index] = (key, text)
+                    return
+        if len(self.queue) >= SEND_QUEUE_SIZE:
+            self._close_task = asyncio.create_task(self.close(1013, "Client çok yavaş"))
+            return
+        self.queue.append((key, text))
+        self._ready.set()
+
+    def enqueue_json(self, message: dict, key: Optional[str] = None):
+        self.enqueue(json.dumps(message, separators=(",", ":")), key)
+
+    async def _sender(self):
+        try:
+            while True:
+                now = time.monotonic()
+                if self._ping_sent is not None and self.last_seen >= self._ping_sent:
+                    self._ping_sent = None
+                if self._ping_sent is not None and now - self._ping_sent > IDLE_TIMEOUT:
+                    await self.close(1001, "Zaman aşımı")
+                    return
+                if now >= self._next_ping:
+                    self.enqueue_json({"type": "ping"}, key="ping")
+                    if self._ping_sent is None:
+                        self._ping_sent = now
+                    self._next_ping = now + PING_INTERVAL
+                try:
+                    await asyncio.wait_for(self._ready.wait(), max(self._next_ping - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    continue
+                while self.queue:
+                    _key, text = self.queue.popleft()
+                    await asyncio.wait_for(self.websocket.send_text(text), SEND_TIMEOUT)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await self.close(1011)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self._on_close(self.websocket)
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+        try:
+            await self.websocket.close(code, reason)
+        except Exception:
+            pass
+
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        self.version = 0
+        self.history: Deque[dict] = deque(maxlen=HISTORY_SIZE)
+        # Henüz gönderilmemiş değişiklikler ((tür, id) -> olay)
+        self.pending: Dict[Tuple[str, int], dict] = {}
+        self.pending_from: Optional[int] = None
+        self._flush_task: Optional[asyncio.Task] = None
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> ClientConnection:
         await websocket.accept()
-        self.active_connections.add(websocket)
+        client = ClientConnection(websocket, self.disconnect)
+        self.active_connections[websocket] = client
+        return client
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.discard(websocket)
+        self.active_connections.pop(websocket, None)
 
     async def broadcast(self, message: dict):
-        to_remove = []
-        for connection in list(self.active_connections):
-            try:
-                await connection.send_json(message)
-            except Exception:
-                to_remove.append(connection)
-        for connection in to_remove:
-            self.disconnect(connection)
+        """Mesajı bir kez JSON'a çevirip her client'ın kuyruğuna ekler"""
+        text = json.dumps(message, separators=(",", ":"))
+        for client in list(self.active_connections.values()):
+            client.enqueue(text)
+
+    async def publish(self, event_type: str, payload: dict):
+        """Değişikliğe bir versiyon numarası verip gönderilmek üzere biriktirir"""
+        self.version += 1
+        message = {"type": event_type, "version": self.version, "payload": payload}
+        self.history.append(message)
+
+        kind, _, action = event_type.partition("_")
+        key = (kind, payload["id"])
+        previous = self.pending.get(key)
+        if previous and previous["type"] == f"{kind}_created" and action == "updated":
+            # Client kaydı henüz görmedi; güncel haliyle oluşturulmuş say
+            message = {**message, "type": previous["type"]}
+        self.pending[key] = message
+        if self.pending_from is None:
+            self.pending_from = self.version
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(COALESCE_WINDOW)
+        events = sorted(self.pending.values(), key=lambda m: m["version"])
+        from_version = self.pending_from
+        self.pending = {}
+        self.pending_from = None
+        self._flush_task = None
+        await self.broadcast(
+            {"type": "batch", "from_version": from_version, "version": self.version, "events": events}
+        )
+
+    def changes_since(self, version: int) -> Optional[List[dict]]:
+        """version'dan sonraki değişiklikler; geçmiş yetmiyorsa None"""
+        if version > self.version:
+            return None
+        if version == self.version:
+            return []
+        if not self.history or self.history[0]["version"] > version + 1:
+            return None
+        return [m for m in self.history if m["version"] > version]
 
 
 manager = ConnectionManager()
@@ -49,36 +216,111 @@ def serialize_record(record: models.ParkingRecord):
     )
 
 
-def get_serialized_records():
-    db = SessionLocal()
-    try:
-        records = db.query(models.ParkingRecord).order_by(models.ParkingRecord.entry_time.desc()).all()
-        return [serialize_record(r) for r in records]
-    finally:
-        db.close()
+async def get_serialized_records(limit: int = SNAPSHOT_LIMIT, cursor: Optional[str] = None):
+    """(entry_time, id) azalan sırada bir sayfa kayıt ve sonraki sayfanın cursor'ı"""
+    # İlk sayfa snapshot versiyonuyla tutarlı olmalı (ana veritabanı); eski
+    # sayfalar replikadan okunabilir.
+    use_replica = cursor is not None and await run_in_threadpool(replica_is_fresh)
+    session_factory = AsyncReadSessionLocal if use_replica else AsyncSessionLocal
+    async with session_factory() as db:
+        records, next_cursor = await crud_async.get_records_page(db, limit, cursor)
+        return [serialize_record(r) for r in records], next_cursor
 
 
-async def broadcast_latest_records():
-    """Tüm bağlı client'lara en son kayıtları gönder"""
-    payload = get_serialized_records()
-    await manager.broadcast({"type": "records", "payload": payload})
+def serialize_payment(payment: models.Payment):
+    return jsonable_encoder(
+        {
+            "id": payment.id,
+            "reference": payment.reference,
+            "amount": payment.amount,
+            "currency": payment.currency,
+            "status": payment.status.value,
+            "parking_record_id": payment.parking_record_id,
+            "paid_at": payment.paid_at,
+        }
+    )
+
+
+async def broadcast_record_event(event_type: str, payload: dict):
+    """Tek bir kaydın değişikliğini (record_created/updated/deleted) tüm worker'lara yayınla"""
+    await event_bus.publish(event_type, payload)
+
+
+async def broadcast_payment_event(event_type: str, payload: dict):
+    """Ödeme değişikliğini (payment_created/updated) tüm worker'lara yayınla"""
+    await event_bus.publish(event_type, payload)
+
 
+async def handle_bus_event(event_type: str, payload: dict):
+    """Event bus'tan gelen olayı doluluk indeksine, debounce cache'ine ve bu worker'ın client'larına uygula"""
+    occupancy_index.apply_event(event_type, payload)
+    debounce_guard.apply_event(event_type, payload)
+    await manager.publish(event_type, payload)
 
-async def send_initial_snapshot(websocket: WebSocket):
-    """Yeni bağlanan client'a ilk snapshot'ı gönder"""
-    payload = get_serialized_records()
-    await websocket.send_json({"type": "records", "payload": payload})
+
+async def send_snapshot(client: ClientConnection, limit: int = SNAPSHOT_LIMIT, cursor: Optional[str] = None):
+    """Client'a bir sayfa snapshot gönder"""
+    # Versiyon sorgudan önce alınır; arada gelen değişiklikler client'ta
+    # id bazlı uygulandığı için tekrar gelmeleri sorun olmaz.
+    version = manager.version
+    try:
+        payload, next_cursor = await get_serialized_records(limit, cursor)
+    except ValueError as exc:
+        client.enqueue_json({"type": "error", "detail": str(exc)})
+        return
+    # Aynı sayfanın henüz gönderilmemiş eski hali yenisiyle değiştirilir
+    client.enqueue_json(
+        {
+            "type": "snapshot",
+            "version": version,
+            "cursor": cursor,
+            "payload": payload,
+            "next_cursor": next_cursor,
+        },
+        key=f"snapshot:{cursor or ''}",
+    )
+
+
+async def handle_client_message(client: ClientConnection, message: dict):
+    message_type = message.get("type")
+    if message_type == "snapshot":
+        try:
+            limit = min(max(int(message.get("limit") or SNAPSHOT_LIMIT), 1), MAX_SNAPSHOT_LIMIT)
+        except (TypeError, ValueError):
+            limit = SNAPSHOT_LIMIT
+        await send_snapshot(client, limit, message.get("cursor"))
+    elif message_type == "resync":
+        try:
+            version = int(message.get("version"))
+        except (TypeError, ValueError):
+            version = -1
+        changes = manager.changes_since(version) if version >= 0 else None
+        if changes is None:
+            await send_snapshot(client)
+        else:
+            client.enqueue_json(
+                {"type": "changes", "version": manager.version, "events": changes},
+                key="changes",
+            )
 
 
 @router.websocket("/ws/parking_records")
 async def parking_records_websocket(websocket: WebSocket):
-    await manager.connect(websocket)
+    client = await manager.connect(websocket)
     try:
-        await send_initial_snapshot(websocket)
+        await send_snapshot(client)
         while True:
-            await websocket.receive_text()
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                continue
+            # Her mesaj (pong dahil) client'ın canlı olduğunu gösterir
+            client.last_seen = time.monotonic()
+            if isinstance(message, dict):
+                await handle_client_message(client, message)
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception:
-        manager.disconnect(websocket)
-
+        pass
+    finally:
+        await client.close()
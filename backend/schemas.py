@@ -66,4 +66,11 @@ class PaymentConfirmRequest(BaseModel):
     payment_id: int
 
 
-
+# Gate event schemas
+class GateEventIn(BaseModel):
+    """Toplu gönderilen tek bir plaka okuması"""
+    plate: str = Field(..., min_length=2, max_length=32)
+    confidence: Optional[float] = None
+    timestamp: Optional[datetime] = Field(default=None, description="Okuma zamanı (yoksa sunucu zamanı)")
+    camera_id: Optional[str] = Field(default=None, max_length=64)
+    idempotency_key: Optional[str] = Field(default=None, max_length=128)
@@ -0,0 +1,146 @@
+"""
+Background snapshot writer for the vehicle tracker.
+
+Frames are JPEG-encoded and written by a small thread pool so disk I/O
+never runs on the frame loop. Files are sharded into one directory per
+UTC day and a periodic sweep enforces retention by age and total size.
+"""
+import logging
+import queue
+import shutil
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+LOGGER = logging.getLogger("vehicle-tracker.capture")
+
+DAY_FORMAT = "%Y-%m-%d"
+
+
+class CaptureWriter:
+    def __init__(
+        self,
+        root: str,
+        jpeg_quality: int = 85,
+        crop_only: bool = False,
+        workers: int = 2,
+        queue_size: int = 32,
+        max_age_days: float = 14,
+        max_total_mb: float = 2048,
+        sweep_interval: float = 300,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.jpeg_quality = int(min(max(jpeg_quality, 1), 100))
+        self.crop_only = crop_only
+        self.max_age_days = max_age_days
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024)
+        self.sweep_interval = sweep_interval
+        self.dropped = 0
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"capture-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        self._threads.append(
+            threading.Thread(target=self._sweep_loop, name="capture-retention", daemon=True)
+        )
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, name: str, frame: Optional[np.ndarray], crop: Optional[np.ndarray] = None) -> bool:
+        """Queues an image for writing; drops it (returns False) when the queue is full.
+
+        In crop-only mode the crop is stored when available, otherwise the frame.
+        The caller must not modify the arrays after submitting them.
+        """
+        image = crop if self.crop_only and crop is not None else frame
+        if image is None:
+            return False
+        try:
+            self._queue.put_nowait((datetime.utcnow(), name, image))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            LOGGER.warning("Capture queue full, dropped %s (%d total)", name, self.dropped)
+            return False
+
+    def stop(self, timeout: float = 5.0):
+        """Flushes queued images and stops the workers."""
+        self._stop.set()
+        for _ in range(len(self._threads) - 1):
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            created_at, name, image = item
+            directory = self.root / created_at.strftime(DAY_FORMAT)
+            try:
+                directory.mkdir(parents=True, exist_ok=True)
+                path = directory / f"{name}.jpg"
+                if not cv2.imwrite(str(path), image, params):
+                    raise RuntimeError("cv2.imwrite returned False")
+                LOGGER.info("Saved trigger frame to %s", path)
+            except Exception as exc:  # pylint: disable=broad-except
+                LOGGER.error("Failed to save %s: %s", name, exc)
+
+    def _sweep_loop(self):
+        while True:
+            try:
+                self.enforce_retention()
+            except Exception as exc:  # pylint: disable=broad-except
+                LOGGER.error("Capture retention sweep failed: %s", exc)
+            if self._stop.wait(self.sweep_interval):
+                return
+
+    def enforce_retention(self):
+        """Deletes day directories past max_age_days, then oldest files over the size cap."""
+        if self.max_age_days > 0:
+            cutoff = (datetime.utcnow() - timedelta(days=self.max_age_days)).strftime(DAY_FORMAT)
+            for directory in self.root.iterdir():
+                if directory.is_dir() and directory.name < cutoff:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    LOGGER.info("Removed expired capture directory %s", directory)
+
+        if self.max_total_bytes <= 0:
+            return
+        files = []
+        total = 0
+        for path in self.root.rglob("*.jpg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_total_bytes:
+            return
+
+        files.sort()
+        removed = 0
+        for _mtime, size, path in files:
+            if total <= self.max_total_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        LOGGER.info("Capture size cap reached; removed %d oldest files", removed)
+        for directory in self.root.iterdir():
+            if directory.is_dir() and not any(directory.iterdir()):
+                directory.rmdir()
@@ -0,0 +1,217 @@
+"""
+Detector export and benchmark commands for the vehicle tracker.
+
+    # PyTorch -> ONNX / OpenVINO IR (optionally int8)
+    python -m backend.services.detector_tools export --weights yolov8n.pt --format openvino --int8
+    python -m backend.services.detector_tools export --weights yolov8n.pt --format onnx --dynamic
+
+    # Side-by-side FPS and detection agreement on a replay video
+    python -m backend.services.detector_tools benchmark --video lane1.mp4 \\
+        --weights yolov8n.pt --weights yolov8n_openvino_model/
+
+The first --weights of a benchmark is the reference; agreement is the F1
+score of each model's vehicle boxes against the reference boxes (same
+class, IoU >= --match-iou), averaged over all frames.
+
+Export needs the optional packages in requirements-export.txt (onnx,
+onnxruntime for ONNX int8, openvino and nncf for OpenVINO int8).
+
+Exported files are passed to vehicle_tracker.py unchanged via --weights.
+Add --fixed-imgsz there when a model was exported without --dynamic.
+"""
+import argparse
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from backend.services.vehicle_tracker import DEFAULT_IMGSZ, VehicleTrackerService
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+)
+LOGGER = logging.getLogger("detector-tools")
+
+Detections = List[Tuple[int, np.ndarray]]
+
+
+def export_detector(
+    weights: str,
+    fmt: str,
+    imgsz: int = DEFAULT_IMGSZ,
+    int8: bool = False,
+    dynamic: bool = False,
+    data: str = "coco8.yaml",
+) -> str:
+    """Exports PyTorch weights to ONNX or OpenVINO IR and returns the output path."""
+    model = YOLO(weights, task="detect")
+    if fmt == "openvino":
+        # OpenVINO int8 uses NNCF post-training quantization on `data`
+        return model.export(format="openvino", imgsz=imgsz, int8=int8, dynamic=dynamic, data=data)
+
+    output = model.export(format="onnx", imgsz=imgsz, dynamic=dynamic, simplify=True)
+    if not int8:
+        return output
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as exc:
+        raise RuntimeError("ONNX int8 export needs onnxruntime (pip install -r requirements-export.txt)") from exc
+    quantized = str(Path(output).with_name(Path(output).stem + "_int8.onnx"))
+    quantize_dynamic(output, quantized, weight_type=QuantType.QUInt8)
+    return quantized
+
+
+def _vehicle_detections(result) -> Detections:
+    boxes = result.boxes
+    classes = boxes.cls.int().cpu().tolist()
+    xyxy = boxes.xyxy.cpu().numpy()
+    return [
+        (cls, box)
+        for cls, box in zip(classes, xyxy)
+        if cls in VehicleTrackerService.VEHICLE_CLASS_IDS
+    ]
+
+
+def _iou(a: np.ndarray, b: np.ndarray) -> float:
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x1 - x0) * max(0.0, y1 - y0)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def frame_agreement(reference: Detections, candidate: Detections, match_iou: float) -> float:
+    """Greedy one-to-one matching F1 of candidate boxes against reference boxes."""
+    if not reference and not candidate:
+        return 1.0
+    unmatched = list(candidate)
+    matches = 0
+    for ref_cls, ref_box in reference:
+        best, best_iou = None, match_iou
+        for idx, (cls, box) in enumerate(unmatched):
+            if cls != ref_cls:
+                continue
+            iou = _iou(ref_box, box)
+            if iou >= best_iou:
+                best, best_iou = idx, iou
+        if best is not None:
+            unmatched.pop(best)
+            matches += 1
+    return 2 * matches / (len(reference) + len(candidate))
+
+
+def _run_model(weights: str, video: str, imgsz: int, conf: float, iou: float, max_frames: int):
+    model = YOLO(weights, task="detect")
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise RuntimeError(f"Video could not be opened: {video}")
+    latencies, detections = [], []
+    try:
+        while len(latencies) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            started = time.perf_counter()
+            results = model.predict(frame, conf=conf, iou=iou, imgsz=imgsz, verbose=False)
+            latencies.append(time.perf_counter() - started)
+            detections.append(_vehicle_detections(results[0]))
+    finally:
+        cap.release()
+    return latencies, detections
+
+
+def benchmark(
+    weights: Sequence[str],
+    video: str,
+    imgsz: int = DEFAULT_IMGSZ,
+    conf: float = 0.35,
+    iou: float = 0.45,
+    match_iou: float = 0.5,
+    max_frames: int = 1000,
+    warmup: int = 10,
+):
+    reference = None
+    rows = []
+    for path in weights:
+        LOGGER.info("Benchmarking %s", path)
+        latencies, detections = _run_model(path, video, imgsz, conf, iou, max_frames)
+        if not latencies:
+            raise RuntimeError("Replay video has no frames")
+        if reference is None:
+            reference = detections
+        timed = np.array(latencies[warmup:] or latencies)
+        frames = min(len(reference), len(detections))
+        agreement = float(np.mean([
+            frame_agreement(reference[i], detections[i], match_iou) for i in range(frames)
+        ]))
+        rows.append((
+            path,
+            len(latencies),
+            timed.mean() * 1000,
+            np.percentile(timed, 95) * 1000,
+            1.0 / timed.mean(),
+            agreement,
+            sum(len(d) for d in detections),
+        ))
+
+    print(f"{'weights':<40} {'frames':>6} {'mean ms':>8} {'p95 ms':>8} {'FPS':>7} {'agree':>6} {'boxes':>6}")
+    for path, frames, mean_ms, p95_ms, fps, agreement, boxes in rows:
+        print(f"{path:<40} {frames:>6} {mean_ms:>8.1f} {p95_ms:>8.1f} {fps:>7.1f} {agreement:>6.3f} {boxes:>6}")
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Detector export & benchmark tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Export PyTorch weights for CPU inference")
+    export.add_argument("--weights", type=str, default="yolov8n.pt", help="Source .pt weights")
+    export.add_argument("--format", choices=["onnx", "openvino"], default="openvino", help="Target format")
+    export.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ, help="Export input size")
+    export.add_argument("--int8", action="store_true", help="Quantize to int8")
+    export.add_argument("--dynamic", action="store_true", help="Dynamic input shape (needed for ROI cropping)")
+    export.add_argument("--data", type=str, default="coco8.yaml", help="Calibration dataset for OpenVINO int8")
+    export.add_argument("--output", type=str, default=None, help="Move the exported model here")
+
+    bench = sub.add_parser("benchmark", help="Compare FPS and detections on a replay video")
+    bench.add_argument("--video", type=str, required=True, help="Replay video file")
+    bench.add_argument("--weights", type=str, action="append", required=True, help="Weights to compare (first is the reference)")
+    bench.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ, help="Inference size")
+    bench.add_argument("--conf", type=float, default=0.35, help="YOLO confidence threshold")
+    bench.add_argument("--iou", type=float, default=0.45, help="YOLO IOU threshold")
+    bench.add_argument("--match-iou", type=float, default=0.5, help="IoU for counting two boxes as the same detection")
+    bench.add_argument("--max-frames", type=int, default=1000, help="Frames to read from the video")
+    bench.add_argument("--warmup", type=int, default=10, help="Frames excluded from timing")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == "export":
+        output = export_detector(
+            args.weights, args.format, imgsz=args.imgsz, int8=args.int8, dynamic=args.dynamic, data=args.data
+        )
+        if args.output:
+            output = shutil.move(output, args.output)
+        LOGGER.info("Exported detector to %s", output)
+    else:
+        benchmark(
+            args.weights,
+            args.video,
+            imgsz=args.imgsz,
+            conf=args.conf,
+            iou=args.iou,
+            match_iou=args.match_iou,
+            max_frames=args.max_frames,
+            warmup=args.warmup,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Entry Write Buffer - Giriş kayıtlarının toplu commit'i (group commit)
+
+ENTRY_WRITE_BUFFER açıkken gate_service giriş kaydını kendi transaction'ında
+yazmak yerine buffer'a verir. Buffer thread'i birkaç milisaniye
+(ENTRY_WRITE_BUFFER_WINDOW_MS) içinde gelen girişleri toplar ve hepsini tek
+bir çok satırlı INSERT ... RETURNING ve tek commit ile yazar; bekleyen her
+istek kendi satırıyla devam eder. Yoğun anlarda saniyedeki giriş sayısını
+commit gecikmesi sınırlamaz.
+
+İstek plaka lock'unu giriş commit edilene kadar tutar, bu yüzden aynı
+plakanın sonraki okuması girişi görür. Buffer havuzdan bir bağlantıyı
+kalıcı olarak tutar: lock'u tutan istekler havuzu doldursa bile buffer
+yazmaya devam edebilir.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.database import engine
+
+logger = logging.getLogger(__name__)
+
+ENTRY_WRITE_BUFFER = os.getenv("ENTRY_WRITE_BUFFER", "off").lower() in ("1", "true", "on")
+ENTRY_WRITE_BUFFER_WINDOW_MS = float(os.getenv("ENTRY_WRITE_BUFFER_WINDOW_MS", "5"))
+ENTRY_WRITE_BUFFER_MAX_BATCH = int(os.getenv("ENTRY_WRITE_BUFFER_MAX_BATCH", "200"))
+# İsteğin kendi girişinin yazılmasını en fazla bekleyeceği süre (saniye)
+ENTRY_WRITE_BUFFER_TIMEOUT = float(os.getenv("ENTRY_WRITE_BUFFER_TIMEOUT", "10"))
+
+records = models.ParkingRecord.__table__
+
+# (session, kayıt) -> None; girişle aynı transaction'da çalışır
+EntryHook = Callable[[Session, models.ParkingRecord], None]
+
+
+@dataclass
+class PendingEntry:
+    plate_number: str
+    confidence: Optional[float]
+    entry_time: datetime
+    before_commit: Optional[EntryHook] = None
+    future: Future = field(default_factory=Future)
+
+
+class EntryWriteBuffer:
+    def __init__(
+        self,
+        window: float = ENTRY_WRITE_BUFFER_WINDOW_MS / 1000,
+        max_batch: int = ENTRY_WRITE_BUFFER_MAX_BATCH,
+    ):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[PendingEntry]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._connection = None
+
+    def write(
+        self,
+        plate_number: str,
+        confidence: Optional[float],
+        entry_time: datetime,
+        before_commit: Optional[EntryHook] = None,
+    ) -> models.ParkingRecord:
+        """
+        Girişi sıraya koyar ve commit edilene kadar bekler; yazılan kaydı döner.
+        ENTRY_WRITE_BUFFER_TIMEOUT içinde yazılmaya başlanmazsa giriş iptal
+        edilir (buffer artık yazmaz) ve TimeoutError fırlatılır.
+        """
+        self._ensure_started()
+        item = PendingEntry(plate_number, confidence, entry_time, before_commit)
+        self._queue.put(item)
+        try:
+            return item.future.result(timeout=ENTRY_WRITE_BUFFER_TIMEOUT)
+        except FutureTimeout:
+            if item.future.cancel():
+                raise
+        # Buffer girişi yazmaya başlamış; sonucu lock bırakılmadan beklenir
+        return item.future.result()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="entry-write-buffer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def _next_batch(self) -> List[PendingEntry]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+        # Kapanırken bekleyen girişler de yazılır
+        while not self._queue.empty():
+            self._flush(self._next_batch())
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _session(self) -> Session:
+        if self._connection is None or self._connection.closed or self._connection.invalidated:
+            self._connection = engine.connect()
+        return Session(bind=self._connection, expire_on_commit=False)
+
+    def _flush(self, batch: List[PendingEntry]):
+        # Süresi dolup iptal edilen girişler yazılmaz; kalanlar artık iptal edilemez
+        batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            session = self._session()
+        except Exception as exc:
+            logger.error("Entry write buffer: bağlantı alınamadı: %s", exc)
+            for item in batch:
+                item.future.set_exception(exc)
+            return
+
+        try:
+            written = self._write(session, batch)
+            session.commit()
+        except Exception as exc:
+            session.rollback()
+            logger.error("Entry write buffer: %d giriş yazılamadı: %s", len(batch), exc)
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            if self._connection is not None and self._connection.invalidated:
+                self._connection = None
+            return
+        finally:
+            session.close()
+
+        for item, record in written:
+            item.future.set_result(record)
+        logger.debug("Entry write buffer: %d giriş tek commit ile yazıldı", len(written))
+
+    def _write(self, session: Session, batch: List[PendingEntry]):
+        # ID'ler önceden ayrılır; hook'lar (idempotency) INSERT'ten önce kaydı görebilsin
+        sequence = func.pg_get_serial_sequence(records.name, "id")
+        ids = session.execute(
+            select(func.nextval(sequence)).select_from(func.generate_series(1, len(batch)))
+        ).scalars().all()
+
+        accepted = []
+        for item, record_id in zip(batch, ids):
+            record = models.ParkingRecord(
+                id=record_id,
+                plate_number=item.plate_number,
+                entry_time=item.entry_time,
+                confidence=item.confidence,
+                fee=0.0,
+            )
+            if item.before_commit is not None:
+                try:
+                    item.before_commit(session, record)
+                except Exception as exc:
+                    # Sadece bu giriş düşer (ör. IdempotencyConflict)
+                    item.future.set_exception(exc)
+                    continue
+            accepted.append((item, record))
+        if not accepted:
+            return []
+
+        rows = session.execute(
+            insert(records)
+            .values(
+                [
+                    {
+                        "id": record.id,
+                        "plate_number": record.plate_number,
+                        "entry_time": record.entry_time,
+                        "confidence": record.confidence,
+                        "fee": record.fee,
+                    }
+                    for _item, record in accepted
+                ]
+            )
+            .returning(*records.c)
+        ).all()
+        by_id = {row.id: models.ParkingRecord(**{c.key: row._mapping[c] for c in records.columns}) for row in rows}
+        return [(item, by_id[record.id]) for item, record in accepted]
+
+
+entry_write_buffer: Optional[EntryWriteBuffer] = EntryWriteBuffer() if ENTRY_WRITE_BUFFER else None
@@ -0,0 +1,151 @@
+"""
+Event bus - Worker'lar arası kayıt/ödeme olayı dağıtımı
+
+Her worker kendi WebSocket client'larını tutar. Bir worker'da oluşan olay
+önce o worker'ın handler'ına verilir, sonra broker üzerinden diğer
+worker'lara iletilir.
+
+EVENT_BROKER:
+- "memory" (varsayılan): tek process; olay sadece yerel handler'a gider
+- "postgres": PostgreSQL LISTEN/NOTIFY; uvicorn --workers > 1 için gerekli
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.engine import make_url
+
+from backend.database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[str, dict], Awaitable[None]]
+
+CHANNEL = "parking_events"
+# NOTIFY payload sınırı 8000 byte
+MAX_NOTIFY_BYTES = 7900
+RECONNECT_MAX = 30.0
+
+
+class InMemoryBroker:
+    """Tek process için broker; olayı doğrudan yerel handler'a verir"""
+
+    # Olaylar diğer worker'lara da dağıtılıyor mu
+    shared = False
+
+    def __init__(self):
+        self._handler: Optional[EventHandler] = None
+
+    async def start(self, handler: EventHandler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, event_type: str, payload: dict):
+        if self._handler:
+            await self._handler(event_type, payload)
+
+
+class PostgresBroker(InMemoryBroker):
+    """PostgreSQL LISTEN/NOTIFY ile worker'lar arası broker"""
+
+    shared = True
+
+    def __init__(self, database_url: str = DATABASE_URL, channel: str = CHANNEL):
+        super().__init__()
+        # psycopg SQLAlchemy sürücü ekini (+psycopg) tanımaz
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._publish_conn = None
+        self._publish_lock = asyncio.Lock()
+        self._listen_task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EventHandler):
+        await super().start(handler)
+        self._listen_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        await super().stop()
+        if self._listen_task:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+        if self._publish_conn is not None:
+            await self._publish_conn.close()
+            self._publish_conn = None
+
+    async def publish(self, event_type: str, payload: dict):
+        # Yerel client'lar NOTIFY'ı beklemez
+        await super().publish(event_type, payload)
+
+        message = json.dumps(
+            {"origin": self.origin, "type": event_type, "payload": payload},
+            separators=(",", ":"),
+        )
+        if len(message.encode("utf-8")) > MAX_NOTIFY_BYTES:
+            logger.warning("Event bus: %s olayı NOTIFY için çok büyük, diğer worker'lara gönderilmedi", event_type)
+            return
+        async with self._publish_lock:
+            try:
+                if self._publish_conn is None or self._publish_conn.closed:
+                    self._publish_conn = await self._connect()
+                await self._publish_conn.execute("SELECT pg_notify(%s, %s)", (self.channel, message))
+            except Exception as exc:
+                logger.error("Event bus: NOTIFY başarısız (%s): %s", event_type, exc)
+                self._publish_conn = None
+
+    async def _connect(self):
+        import psycopg
+
+        return await psycopg.AsyncConnection.connect(self.dsn, autocommit=True)
+
+    async def _listen(self):
+        backoff = 1.0
+        while True:
+            try:
+                conn = await self._connect()
+                async with conn:
+                    await conn.execute(f'LISTEN "{self.channel}"')
+                    logger.info("Event bus: %s kanalı dinleniyor", self.channel)
+                    backoff = 1.0
+                    async for notify in conn.notifies():
+                        await self._dispatch(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error("Event bus: LISTEN bağlantısı koptu, %.0fs sonra tekrar denenecek: %s", backoff, exc)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, RECONNECT_MAX)
+
+    async def _dispatch(self, raw: str):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            logger.error("Event bus: geçersiz olay: %r", raw[:200])
+            return
+        if message.get("origin") == self.origin or not self._handler:
+            return
+        try:
+            await self._handler(message["type"], message["payload"])
+        except Exception as exc:
+            logger.error("Event bus: olay işlenemedi: %s", exc)
+
+
+def create_broker(kind: Optional[str] = None) -> InMemoryBroker:
+    kind = (kind or os.getenv("EVENT_BROKER", "memory")).lower()
+    if kind == "postgres":
+        return PostgresBroker()
+    if kind != "memory":
+        logger.warning("Bilinmeyen EVENT_BROKER=%s, memory kullanılıyor", kind)
+    return InMemoryBroker()
+
+
+event_bus = create_broker()
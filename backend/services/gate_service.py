@@ -0,0 +1,590 @@
+"""
+Gate Service - Plaka okumasından giriş/çıkış kaydı üretimi
+
+Bir plaka okuması (kamera, manuel giriş veya resim yükleme) tek bir
+transaction içinde işlenir:
+
+0. Son GATE_DEBOUNCE_SECONDS içinde girişi yapılmış plaka bellekteki
+   debounce_guard'da bulunursa veritabanına hiç gidilmeden "debounced" döner
+   (kamera önünde bekleyen aracın tekrar okumaları).
+1. Plaka için lock alınır (GATE_LOCK_MODE: process içi plaka lock'u ve/veya
+   transaction süreli advisory lock); aynı plakanın eş zamanlı iki okuması
+   sırayla işlenir, çift giriş oluşamaz. Farklı plakalar paralel çalışır.
+2. Plakanın son kayıtları tek sorguyla okunur (debounce + aktif kayıt).
+   Occupancy indeksi yetkiliyse (OCCUPANCY_AUTHORITATIVE, tek worker) bu
+   sorgu atlanır, aktif kayıt indeksten alınır.
+3. Çıkışta ödeme INSERT'i ve kaydın güncellenmesi tek CTE'de yapılır;
+   girişte tek INSERT. Her ikisi de RETURNING ile döner, refresh yapılmaz.
+4. Sonuç commit'ten önce indekse yazılır (lock bırakılmadan), sonra commit.
+
+ENTRY_WRITE_BUFFER açıksa giriş INSERT'i entry_write_buffer'a verilir:
+eş zamanlı girişler birkaç milisaniye toplanıp tek INSERT ve tek commit ile
+yazılır. Okuma, kendi girişi commit edilene kadar plaka lock'unu tutar.
+
+Birikmiş okumalar (tracker kesintisi, tekrar oynatma) process_gate_batch ile
+tek transaction'da işlenir: bütün plakaların lock'ları alınır, aday kayıtlar
+tek sorguda okunur, olaylar zaman sırasıyla bellekte uygulanır ve sonuç
+çok satırlı INSERT'ler ve tek bir UPDATE ... FROM (VALUES ...) ile yazılır.
+"""
+import logging
+import os
+import re
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import DateTime, Float, Integer, String, bindparam, column, func, insert, literal, or_, select, update, values
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.crud import calculate_fee
+from backend.services.entry_write_buffer import entry_write_buffer
+from backend.services.event_bus import event_bus
+from backend.services.occupancy_service import occupancy_index
+from backend.services.qr_service import generate_iban, generate_reference
+from backend.utils.keyed_lock import KeyedLockManager
+from backend.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Aynı plaka bu süre içinde tekrar okunursa araç kameranın önünde bekliyor sayılır
+DEBOUNCE_SECONDS = float(os.getenv("GATE_DEBOUNCE_SECONDS", "10"))
+# Bellekte tutulan en fazla plaka (en eskisi düşer)
+DEBOUNCE_CACHE_SIZE = int(os.getenv("GATE_DEBOUNCE_CACHE_SIZE", "4096"))
+# pg_advisory_xact_lock(namespace, key) - diğer advisory lock kullanıcılarıyla çakışmasın
+GATE_LOCK_NAMESPACE = 4301
+# Aynı plakanın okumalarını sıraya sokan lock:
+# - "local": process içi plaka başına lock (tek worker)
+# - "postgres": transaction süreli advisory lock (worker'lar arası)
+# - "both" (varsayılan): önce process içi lock, sonra advisory lock; açık
+#   transaction'ı olmayan bekleyen okumalar havuzdan bağlantı tutmaz
+GATE_LOCK_MODE = os.getenv("GATE_LOCK_MODE", "both").lower()
+GATE_LOCK_TIMEOUT = float(os.getenv("GATE_LOCK_TIMEOUT", "30"))  # saniye
+# Türkiye plaka formatı: il kodu (01-81), 1-3 harf, 2-4 rakam
+PLATE_PATTERN = re.compile(r'^(0[1-9]|[1-7][0-9]|8[0-1])\s?[A-Z]{1,3}\s?\d{2,4}$')
+
+if GATE_LOCK_MODE not in ("local", "postgres", "both"):
+    logger.warning("Bilinmeyen GATE_LOCK_MODE=%s, both kullanılıyor", GATE_LOCK_MODE)
+    GATE_LOCK_MODE = "both"
+LOCAL_LOCKS = GATE_LOCK_MODE in ("local", "both")
+ADVISORY_LOCKS = GATE_LOCK_MODE in ("postgres", "both")
+if not ADVISORY_LOCKS and event_bus.shared:
+    logger.warning("GATE_LOCK_MODE=local: farklı worker'lardaki aynı plaka okumaları sıraya girmez")
+
+plate_locks = KeyedLockManager()
+
+records = models.ParkingRecord.__table__
+payments = models.Payment.__table__
+
+
+@dataclass
+class GateEventResult:
+    """process_gate_event sonucu; action: entry, exit veya debounced"""
+    action: str
+    record: models.ParkingRecord
+    payment: Optional[models.Payment] = None
+    # Giriş entry_write_buffer tarafından yazılıp commit edildi
+    committed: bool = False
+
+
+# (session, sonuç) -> None; sonucu yazan transaction içinde çağrılır
+GateHook = Callable[[Session, GateEventResult], None]
+
+
+@dataclass
+class GateEvent:
+    """Toplu işlenecek tek bir plaka okuması (plaka normalize edilmiş olmalı)"""
+    plate_number: str
+    timestamp: datetime
+    confidence: Optional[float] = None
+    camera_id: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
+
+class DebounceGuard:
+    """
+    Son girişi debounce penceresi içinde olan plakalar -> giriş kaydı.
+
+    Sadece veritabanı kontrolünün önünde duran bir kısayoldur: plaka burada
+    yoksa karar her zaman veritabanından verilir. Bu yüzden yalnızca
+    olmayan bir girişe bakarak yanlış "debounced" dönmemesi gerekir; silinen
+    ya da plakası değişen kayıtlar düşürülür. Event bus olayları da
+    uygulandığı için EVENT_BROKER=postgres iken diğer worker'ların girişleri
+    de paylaşılır.
+    """
+
+    def __init__(self, window: float = DEBOUNCE_SECONDS, maxsize: int = DEBOUNCE_CACHE_SIZE):
+        self.window = window
+        self._cache = TTLCache(window, maxsize)
+
+    def recent_entry(self, plate_number: str, now: datetime) -> Optional[models.ParkingRecord]:
+        record = self._cache.get(plate_number)
+        if record is None or record.entry_time < now - timedelta(seconds=self.window):
+            return None
+        return record
+
+    def remember(self, record: models.ParkingRecord, now: datetime):
+        """Kaydı giriş zamanından itibaren pencere dolana kadar tutar"""
+        remaining = (record.entry_time - now).total_seconds() + self.window
+        if remaining > 0:
+            self._cache.put(record.plate_number, record, ttl=remaining)
+
+    def forget_record(self, record_id: int):
+        self._cache.drop_where(lambda record: record.id == record_id)
+
+    def apply_event(self, event_type: str, payload: dict):
+        """Event bus'tan gelen kayıt olayını uygular (serialize_record biçimi)"""
+        if event_type == "record_deleted":
+            self.forget_record(payload["id"])
+        elif event_type in ("record_created", "record_updated"):
+            self.forget_record(payload["id"])
+            record = models.ParkingRecord(
+                id=payload["id"],
+                plate_number=payload["plate_number"],
+                entry_time=datetime.fromisoformat(payload["entry_time"]),
+                exit_time=datetime.fromisoformat(payload["exit_time"]) if payload["exit_time"] else None,
+                fee=payload["fee"],
+                confidence=payload["confidence"],
+            )
+            self.remember(record, datetime.utcnow())
+
+
+debounce_guard = DebounceGuard()
+
+
+def normalize_plate(plate_number: str, validate: bool = True) -> str:
+    """
+    Plakayı büyük harfe çevirip boşluklarını temizler.
+    validate=True ise Türkiye plaka formatına uymayan plaka için ValueError fırlatır.
+    """
+    plate = plate_number.strip().upper()
+    if validate and not PLATE_PATTERN.match(plate):
+        raise ValueError(
+            "Lütfen Türkiye plaka formatına uygun geçerli bir plaka giriniz. Örnek: 34 ABC 1234"
+        )
+    return re.sub(r'\s+', '', plate)
+
+
+def hold_plates(plate_numbers: List[str]):
+    """
+    GATE_LOCK_MODE local/both ise plakaların process içi lock'larını tutan
+    context manager; commit/rollback bitene kadar tutulmalıdır.
+    GATE_LOCK_TIMEOUT içinde alınamazsa LockTimeout fırlatır.
+    """
+    if not LOCAL_LOCKS:
+        return nullcontext()
+    return plate_locks.hold(plate_numbers, timeout=GATE_LOCK_TIMEOUT)
+
+
+def lock_plate(db: Session, plate_number: str):
+    """Plaka için transaction sonuna kadar sürecek advisory lock alır"""
+    db.execute(
+        select(func.pg_advisory_xact_lock(GATE_LOCK_NAMESPACE, func.hashtext(plate_number)))
+    )
+
+
+def gate_candidates_query(plate_number: str, threshold: datetime):
+    """Plakanın aktif kayıtları ve threshold'dan sonraki girişleri (yeniden eskiye)"""
+    return (
+        select(*records.c)
+        .where(
+            records.c.plate_number == plate_number,
+            or_(records.c.exit_time.is_(None), records.c.entry_time >= threshold),
+        )
+        .order_by(records.c.entry_time.desc())
+    )
+
+
+def _record_from_row(row) -> models.ParkingRecord:
+    return models.ParkingRecord(**{c.key: row._mapping[c] for c in records.columns})
+
+
+def _new_payment_values(amount: float, record_id: int) -> dict:
+    # crud.create_payment ile aynı varsayılanlar
+    return {
+        "reference": generate_reference(),
+        "amount": amount,
+        "currency": "TRY",
+        "status": models.PaymentStatus.PENDING,
+        "parking_record_id": record_id,
+        "receiver_name": "La Parque A.Ş.",
+        "iban": generate_iban(),
+        "merchant_code": "LAPARQUE001",
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _exit(db: Session, record_id: int, entry_time: datetime, now: datetime) -> Optional[GateEventResult]:
+    """Aktif kaydı kapatıp ödemesini oluşturur; kayıt artık aktif değilse None"""
+    fee = calculate_fee(entry_time, now)
+    payment_values = _new_payment_values(fee, record_id)
+    del payment_values["parking_record_id"]
+    # Ödeme sadece kayıt hâlâ aktifse eklenir (INSERT ... SELECT)
+    source = select(
+        *(literal(value, payments.c[key].type) for key, value in payment_values.items()),
+        records.c.id,
+    ).where(records.c.id == record_id, records.c.exit_time.is_(None))
+    pay = (
+        insert(payments)
+        .from_select([*payment_values, "parking_record_id"], source)
+        .returning(*payments.c)
+        .cte("pay")
+    )
+    stmt = (
+        update(records)
+        .where(records.c.id == pay.c.parking_record_id)
+        .values(exit_time=now, fee=fee, payment_id=pay.c.id)
+        .returning(*records.c, *pay.c)
+    )
+    row = db.execute(stmt).one_or_none()
+    if row is None:
+        return None
+    record = _record_from_row(row)
+    payment = models.Payment(**{c.name: row._mapping[pay.c[c.name]] for c in payments.columns})
+    return GateEventResult("exit", record, payment)
+
+
+def _entry(
+    db: Session,
+    plate_number: str,
+    confidence: Optional[float],
+    now: datetime,
+    before_commit: Optional[GateHook] = None,
+) -> GateEventResult:
+    if entry_write_buffer is not None:
+        # Hook, girişle birlikte buffer'ın transaction'ında çalışır
+        hook = None
+        if before_commit is not None:
+            def hook(session: Session, record: models.ParkingRecord):
+                before_commit(session, GateEventResult("entry", record))
+        record = entry_write_buffer.write(plate_number, confidence, now, hook)
+        return GateEventResult("entry", record, committed=True)
+    row = db.execute(
+        insert(records)
+        .values(plate_number=plate_number, entry_time=now, confidence=confidence, fee=0.0)
+        .returning(*records.c)
+    ).one()
+    return GateEventResult("entry", _record_from_row(row))
+
+
+def _process_from_index(
+    db: Session,
+    plate_number: str,
+    confidence: Optional[float],
+    now: datetime,
+    threshold: datetime,
+    before_commit: Optional[GateHook] = None,
+) -> Optional[GateEventResult]:
+    """
+    İndeks yetkiliyse aday sorgusu yapmadan giriş/çıkış yapar.
+    İndeks kullanılamıyorsa veya debounce ihtimali varsa None döner.
+    """
+    if not occupancy_index.authoritative:
+        return None
+    hint = occupancy_index.gate_hint(plate_number)
+    if hint.last_entry_time is not None and hint.last_entry_time >= threshold:
+        # Debounce cevabı kaydın tamamını ister, veritabanından okunur
+        return None
+    if hint.active is None:
+        return _entry(db, plate_number, confidence, now, before_commit)
+    result = _exit(db, *hint.active, now)
+    if result is None:
+        # İndeksteki aktif kayıt veritabanında kapanmış
+        occupancy_index.invalidate()
+    return result
+
+
+def _process_from_db(
+    db: Session,
+    plate_number: str,
+    confidence: Optional[float],
+    now: datetime,
+    threshold: datetime,
+    before_commit: Optional[GateHook] = None,
+) -> GateEventResult:
+    # Debounce ve aktif kayıt kontrolü tek sorguda
+    rows = db.execute(gate_candidates_query(plate_number, threshold)).all()
+    candidates = [_record_from_row(r) for r in rows]
+
+    recent = next((r for r in candidates if r.entry_time >= threshold), None)
+    if recent is not None:
+        return GateEventResult("debounced", recent)
+
+    active = next((r for r in candidates if r.exit_time is None), None)
+    if active is not None:
+        # Kayıt plaka lock'u altında okundu, bu arada kapanamaz
+        return _exit(db, active.id, active.entry_time, now)
+    return _entry(db, plate_number, confidence, now, before_commit)
+
+
+def process_gate_event(
+    db: Session,
+    plate_number: str,
+    confidence: Optional[float] = None,
+    now: Optional[datetime] = None,
+    before_commit: Optional[GateHook] = None,
+) -> GateEventResult:
+    """
+    Normalize edilmiş bir plaka okumasını tek transaction'da işler:
+    - Son DEBOUNCE_SECONDS içinde girişi olan plaka -> "debounced" (değişiklik yok)
+    - Aktif (çıkış yapmamış) kaydı olan plaka -> çıkış + ödeme kaydı ("exit")
+    - Diğer durumlar -> yeni giriş kaydı ("entry")
+
+    before_commit(session, sonuç) giriş/çıkışı yazan transaction'da commit'ten
+    önce çağrılır (ör. idempotency cevabını kaydetmek için); hata fırlatırsa
+    işlem geri alınır. Giriş write buffer'dan geçiyorsa session buffer'ınkidir.
+    "debounced" sonuçlar için de plaka lock'u tutulurken kısa bir transaction'da
+    çağrılır.
+    db'nin açık transaction'ı olmamalı; yoksa lock beklenirken bağlantı tutulur.
+    """
+    now = now or datetime.utcnow()
+    recent = debounce_guard.recent_entry(plate_number, now)
+    if recent is not None:
+        result = GateEventResult("debounced", recent)
+        if before_commit is not None:
+            with hold_plates([plate_number]):
+                _commit_debounced(db, plate_number, result, before_commit)
+        return result
+
+    threshold = now - timedelta(seconds=DEBOUNCE_SECONDS)
+    indexed = False
+    with hold_plates([plate_number]):
+        try:
+            if ADVISORY_LOCKS:
+                lock_plate(db, plate_number)
+            result = _process_from_index(db, plate_number, confidence, now, threshold, before_commit)
+            if result is None:
+                result = _process_from_db(db, plate_number, confidence, now, threshold, before_commit)
+            if result.action == "debounced":
+                debounce_guard.remember(result.record, now)
+                if before_commit is not None:
+                    before_commit(db, result)
+                    db.commit()
+                else:
+                    db.rollback()
+                return result
+
+            if before_commit is not None and not result.committed:
+                before_commit(db, result)
+            # Lock commit ile bırakılır; sıradaki okuma indeksi güncel görmeli
+            indexed = True
+            occupancy_index.record_changed(result.record)
+            if result.payment is not None:
+                occupancy_index.payment_changed(result.payment)
+            db.commit()
+        except Exception:
+            db.rollback()
+            if indexed and not result.committed:
+                # İndekse yazılmış ama commit edilememiş bir sonuç
+                occupancy_index.invalidate()
+            raise
+
+    if result.action == "entry":
+        debounce_guard.remember(result.record, now)
+    logger.info("Gate event %s: plate=%s record=%s", result.action, plate_number, result.record.id)
+    return result
+
+
+def _commit_debounced(db: Session, plate_number: str, result: GateEventResult, before_commit: GateHook):
+    """Bellekten verilen debounce sonucunu before_commit ile kendi transaction'ında yazar"""
+    try:
+        if ADVISORY_LOCKS:
+            lock_plate(db, plate_number)
+        before_commit(db, result)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def lock_plates(db: Session, plate_numbers: List[str]):
+    """
+    Birden fazla plaka için advisory lock alır. Lock'lar anahtar sırasıyla
+    alındığı için eş zamanlı iki batch birbirini kilitleyemez (deadlock).
+    """
+    plate = func.unnest(bindparam("plates", plate_numbers, type_=ARRAY(String))).column_valued("plate")
+    keys = select(func.hashtext(plate).label("key")).distinct().order_by("key").subquery()
+    db.execute(select(func.pg_advisory_xact_lock(GATE_LOCK_NAMESPACE, keys.c.key)))
+
+
+def batch_candidates_query(plate_numbers: List[str], threshold: datetime):
+    """gate_candidates_query'nin çok plakalı hali (plaka, yeniden eskiye)"""
+    return (
+        select(*records.c)
+        .where(
+            records.c.plate_number.in_(plate_numbers),
+            or_(records.c.exit_time.is_(None), records.c.entry_time >= threshold),
+        )
+        .order_by(records.c.plate_number, records.c.entry_time.desc())
+    )
+
+
+def _allocate_ids(db: Session, table, count: int) -> List[int]:
+    """Tablonun sequence'ından tek sorguda `count` adet ID ayırır"""
+    if not count:
+        return []
+    sequence = func.pg_get_serial_sequence(table.name, "id")
+    return list(
+        db.execute(select(func.nextval(sequence)).select_from(func.generate_series(1, count))).scalars()
+    )
+
+
+def _simulate_batch(
+    events: List[GateEvent],
+    candidates: List[models.ParkingRecord],
+    now: datetime,
+) -> List[Optional[GateEventResult]]:
+    """
+    Olayları zaman sırasıyla process_gate_event kurallarına göre bellekte
+    uygular. Aynı idempotency_key ile gelen tekrarlar ilk olayın sonucunu alır.
+    """
+    latest: Dict[str, models.ParkingRecord] = {}
+    active: Dict[str, models.ParkingRecord] = {}
+    for record in candidates:
+        latest.setdefault(record.plate_number, record)
+        if record.exit_time is None:
+            active.setdefault(record.plate_number, record)
+
+    results: List[Optional[GateEventResult]] = [None] * len(events)
+    first_by_key: Dict[str, int] = {}
+    duplicates = []
+    for index in sorted(range(len(events)), key=lambda i: events[i].timestamp):
+        event = events[index]
+        if event.idempotency_key is not None:
+            if event.idempotency_key in first_by_key:
+                duplicates.append((index, first_by_key[event.idempotency_key]))
+                continue
+            first_by_key[event.idempotency_key] = index
+
+        plate_number = event.plate_number
+        # Gelecek zamanlı (saati ileri) okumalar şimdiki zamana çekilir
+        timestamp = min(event.timestamp, now)
+        recent = latest.get(plate_number)
+        if recent is not None and recent.entry_time >= timestamp - timedelta(seconds=DEBOUNCE_SECONDS):
+            results[index] = GateEventResult("debounced", recent)
+            continue
+
+        current = active.pop(plate_number, None)
+        if current is not None:
+            fee = calculate_fee(current.entry_time, timestamp)
+            payment = models.Payment(**{**_new_payment_values(fee, current.id), "created_at": timestamp})
+            current.exit_time = timestamp
+            current.fee = fee
+            results[index] = GateEventResult("exit", current, payment)
+        else:
+            record = models.ParkingRecord(
+                plate_number=plate_number,
+                entry_time=timestamp,
+                confidence=event.confidence,
+                fee=0.0,
+            )
+            active[plate_number] = latest[plate_number] = record
+            results[index] = GateEventResult("entry", record)
+
+    for index, first in duplicates:
+        results[index] = results[first]
+    return results
+
+
+def _write_batch(db: Session, results: List[GateEventResult]):
+    """Simülasyon sonucunu çok satırlı INSERT'ler ve tek UPDATE ile yazar"""
+    unique = list({id(result): result for result in results if result.action != "debounced"}.values())
+    # ID'ler zaman sırasıyla verilir
+    new_records = sorted((r.record for r in unique if r.action == "entry"), key=lambda r: r.entry_time)
+    exits = sorted((r for r in unique if r.action == "exit"), key=lambda r: r.record.exit_time)
+
+    for record, record_id in zip(new_records, _allocate_ids(db, records, len(new_records))):
+        record.id = record_id
+    for result, payment_id in zip(exits, _allocate_ids(db, payments, len(exits))):
+        result.payment.id = payment_id
+        result.payment.parking_record_id = result.record.id
+        result.record.payment_id = payment_id
+
+    if new_records:
+        # Batch içinde girip çıkan kayıtlar son halleriyle eklenir
+        db.execute(
+            insert(records).values(
+                [
+                    {
+                        "id": r.id,
+                        "plate_number": r.plate_number,
+                        "entry_time": r.entry_time,
+                        "exit_time": r.exit_time,
+                        "fee": r.fee,
+                        "confidence": r.confidence,
+                        "payment_id": r.payment_id,
+                    }
+                    for r in new_records
+                ]
+            )
+        )
+    if exits:
+        db.execute(
+            insert(payments).values(
+                [{c.name: getattr(r.payment, c.name) for c in payments.columns} for r in exits]
+            )
+        )
+    new_ids = {r.id for r in new_records}
+    updates = [r.record for r in exits if r.record.id not in new_ids]
+    if updates:
+        exit_values = values(
+            column("id", Integer),
+            column("exit_time", DateTime),
+            column("fee", Float),
+            column("payment_id", Integer),
+            name="exits",
+        ).data([(r.id, r.exit_time, r.fee, r.payment_id) for r in updates])
+        db.execute(
+            update(records)
+            .where(records.c.id == exit_values.c.id)
+            .values(exit_time=exit_values.c.exit_time, fee=exit_values.c.fee, payment_id=exit_values.c.payment_id)
+        )
+    return unique
+
+
+def process_gate_batch(
+    db: Session,
+    events: List[GateEvent],
+    now: Optional[datetime] = None,
+    before_commit: Optional[Callable[[List[GateEventResult]], None]] = None,
+) -> List[GateEventResult]:
+    """
+    Plaka okumalarını zaman sırasıyla tek transaction'da işler; sonuçlar
+    events ile aynı sıradadır. Kurallar process_gate_event ile aynıdır,
+    giriş/çıkış zamanı olarak okumanın kendi zamanı kullanılır.
+    before_commit bütün sonuçlarla commit'ten önce çağrılır.
+    """
+    if not events:
+        return []
+    now = now or datetime.utcnow()
+    plate_numbers = sorted({event.plate_number for event in events})
+    earliest = min(event.timestamp for event in events) - timedelta(seconds=DEBOUNCE_SECONDS)
+    indexed = False
+    with hold_plates(plate_numbers):
+        try:
+            if ADVISORY_LOCKS:
+                lock_plates(db, plate_numbers)
+            rows = db.execute(batch_candidates_query(plate_numbers, earliest)).all()
+            results = _simulate_batch(events, [_record_from_row(r) for r in rows], now)
+            written = _write_batch(db, results)
+            if before_commit is not None:
+                before_commit(results)
+            indexed = True
+            for result in written:
+                occupancy_index.record_changed(result.record)
+                if result.payment is not None:
+                    occupancy_index.payment_changed(result.payment)
+            db.commit()
+        except Exception:
+            db.rollback()
+            if indexed:
+                occupancy_index.invalidate()
+            raise
+
+    for result in written:
+        if result.action == "entry":
+            debounce_guard.remember(result.record, now)
+    logger.info("Gate batch: %d olay, %d değişiklik", len(events), len(written))
+    return results
@@ -0,0 +1,337 @@
+"""
+Occupancy Service - Otoparkın canlı doluluk indeksi ve gün içi sayaçları
+
+İndeks bellekte tutulur:
+- plaka -> aktif (çıkış yapmamış) kaydın ID'si ve giriş zamanı
+- doluluk, bugünkü giriş/çıkış sayısı, bekleyen ödeme toplamı ve bugün
+  tahsil edilen tutar
+
+Uygulama açılışında veritabanından kurulur (rebuild), sonra her kayıt/ödeme
+değişikliğiyle güncellenir; /api/occupancy cevabı sorgu atmadan döner.
+Güncellemeler kaydın/ödemenin son halini taşır ve idempotent'tir: aynı olayın
+hem route'tan hem event bus'tan gelmesi sayaçları bozmaz, geç gelen eski bir
+olay çıkış yapmış kaydı tekrar aktif yapamaz. "Bugün" UTC gündür (kayıt
+zamanları UTC tutulur).
+
+OCCUPANCY_AUTHORITATIVE=1 ile indeks gate kararları için de yetkili olur
+(authoritative): gate_service aktif kayıt kontrolünü veritabanına gitmeden
+yapar. Bu sadece bütün yazmalar tek bir process'ten geçiyorsa doğrudur
+(tek worker); birden fazla worker'da diğer worker'ların girişleri indekste
+olmadığı için çift aktif kayıt açılabilir. Varsayılan kapalıdır ve indeks
+sadece sayaçlar için kullanılır, gate kararları veritabanından verilir.
+
+İndeks OCCUPANCY_REBUILD_INTERVAL'da bir veritabanından yeniden kurulur;
+beklenmeyen bir hata sonrası invalidate ile yetkisi bir sonraki kuruluma
+kadar düşürülür.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, time as dt_time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_
+
+from backend import models
+from backend.database import SessionLocal
+from backend.services.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+OCCUPANCY_REBUILD_INTERVAL = float(os.getenv("OCCUPANCY_REBUILD_INTERVAL", "300"))  # saniye
+# Sadece tek process (tek worker) kurulumlarında açılmalıdır
+OCCUPANCY_AUTHORITATIVE = os.getenv("OCCUPANCY_AUTHORITATIVE", "0").lower() in ("1", "true", "on")
+
+if OCCUPANCY_AUTHORITATIVE and event_bus.shared:
+    logger.warning("OCCUPANCY_AUTHORITATIVE birden fazla worker ile kullanılamaz, kapatıldı")
+    OCCUPANCY_AUTHORITATIVE = False
+
+
+class RecordState(NamedTuple):
+    plate_number: str
+    entry_time: datetime
+    exit_time: Optional[datetime]
+
+
+class PaymentState(NamedTuple):
+    status: str
+    amount: float
+    paid_at: Optional[datetime]
+
+
+class GateHint(NamedTuple):
+    """Plakanın indeksteki durumu; active: (kayıt ID, giriş zamanı)"""
+    active: Optional[Tuple[int, datetime]]
+    last_entry_time: Optional[datetime]
+
+
+def _day_start(now: datetime) -> datetime:
+    return datetime.combine(now.date(), dt_time.min)
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+class OccupancyIndex:
+    """Thread-safe canlı doluluk indeksi"""
+
+    def __init__(self, exclusive: bool = False):
+        # exclusive: bütün yazmalar bu process'ten geçiyor (tek worker)
+        self.exclusive = exclusive
+        self.ready = False
+        self.built_at: Optional[datetime] = None
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()
+        # Kurulum sırasında gelen değişiklikler; kurulum bitince tekrar uygulanır
+        self._replay: Optional[List[Tuple[Callable, tuple]]] = None
+        self._reset(datetime.utcnow())
+
+    def _reset(self, now: datetime):
+        self._day = _day_start(now)
+        # Aktif ya da bugün giriş/çıkış yapmış kayıtlar
+        self._records: Dict[int, RecordState] = {}
+        self._active_by_plate: Dict[str, int] = {}
+        self._last_entry: Dict[str, datetime] = {}
+        # Bekleyen ya da bugün ödenmiş ödemeler
+        self._payments: Dict[int, PaymentState] = {}
+        self._deleted: Set[int] = set()
+        self.occupancy = 0
+        self.entries_today = 0
+        self.exits_today = 0
+        self.pending_amount = 0.0
+        self.paid_amount_today = 0.0
+
+    @property
+    def authoritative(self) -> bool:
+        """İndeks gate kararları için veritabanı yerine kullanılabilir mi"""
+        return self.exclusive and self.ready
+
+    # --- kayıtlar ---
+    def _relevant_record(self, state: RecordState) -> bool:
+        return (
+            state.exit_time is None
+            or state.entry_time >= self._day
+            or state.exit_time >= self._day
+        )
+
+    def _count_record(self, record_id: int, state: RecordState, sign: int):
+        if state.exit_time is None:
+            self.occupancy += sign
+            if sign > 0:
+                self._active_by_plate[state.plate_number] = record_id
+            elif self._active_by_plate.get(state.plate_number) == record_id:
+                del self._active_by_plate[state.plate_number]
+        if state.entry_time >= self._day:
+            self.entries_today += sign
+        if state.exit_time is not None and state.exit_time >= self._day:
+            self.exits_today += sign
+
+    def _set_record(self, record_id: int, state: Optional[RecordState]):
+        old = self._records.pop(record_id, None)
+        if old is not None:
+            self._count_record(record_id, old, -1)
+        if state is None or not self._relevant_record(state):
+            return
+        self._records[record_id] = state
+        self._count_record(record_id, state, +1)
+        last = self._last_entry.get(state.plate_number)
+        if last is None or state.entry_time > last:
+            self._last_entry[state.plate_number] = state.entry_time
+
+    def _apply_record(
+        self,
+        record_id: int,
+        plate_number: str,
+        entry_time: datetime,
+        exit_time: Optional[datetime],
+    ):
+        if record_id in self._deleted:
+            return
+        old = self._records.get(record_id)
+        if old is not None and old.exit_time is not None and exit_time is None:
+            # Çıkış yapmış kaydın eski (aktif) hali geç geldi
+            return
+        self._set_record(record_id, RecordState(plate_number, entry_time, exit_time))
+
+    def _apply_record_deleted(self, record_id: int):
+        self._set_record(record_id, None)
+        self._deleted.add(record_id)
+
+    # --- ödemeler ---
+    def _count_payment(self, state: PaymentState, sign: int):
+        if state.status == models.PaymentStatus.PENDING.value:
+            self.pending_amount += sign * state.amount
+        elif (
+            state.status == models.PaymentStatus.PAID.value
+            and state.paid_at is not None
+            and state.paid_at >= self._day
+        ):
+            self.paid_amount_today += sign * state.amount
+
+    def _set_payment(self, payment_id: int, state: PaymentState):
+        old = self._payments.pop(payment_id, None)
+        if old is not None:
+            self._count_payment(old, -1)
+        if state.status == models.PaymentStatus.PENDING.value or (
+            state.paid_at is not None and state.paid_at >= self._day
+        ):
+            self._payments[payment_id] = state
+            self._count_payment(state, +1)
+
+    def _apply_payment(self, payment_id: int, status: str, amount: float, paid_at: Optional[datetime]):
+        old = self._payments.get(payment_id)
+        if (
+            old is not None
+            and old.status != models.PaymentStatus.PENDING.value
+            and status == models.PaymentStatus.PENDING.value
+        ):
+            # Tamamlanmış ödemenin eski (bekleyen) hali geç geldi
+            return
+        self._set_payment(payment_id, PaymentState(status, amount, paid_at))
+
+    # --- gün değişimi ---
+    def _roll_day(self, now: datetime):
+        day = _day_start(now)
+        if day == self._day:
+            return
+        records, payments = self._records, self._payments
+        self._reset(now)
+        for record_id, state in records.items():
+            self._set_record(record_id, state)
+        for payment_id, state in payments.items():
+            self._set_payment(payment_id, state)
+
+    def _mutate(self, func: Callable, *args):
+        with self._lock:
+            self._roll_day(datetime.utcnow())
+            func(*args)
+            if self._replay is not None:
+                self._replay.append((func.__name__, args))
+
+    # --- public API ---
+    def record_changed(self, record: models.ParkingRecord):
+        self._mutate(self._apply_record, record.id, record.plate_number, record.entry_time, record.exit_time)
+
+    def record_deleted(self, record_id: int):
+        self._mutate(self._apply_record_deleted, record_id)
+
+    def payment_changed(self, payment: models.Payment):
+        self._mutate(
+            self._apply_payment, payment.id, payment.status.value, payment.amount, payment.paid_at
+        )
+
+    def apply_event(self, event_type: str, payload: dict):
+        """Event bus olayını (serialize_record / serialize_payment) indekse uygular"""
+        if event_type in ("record_created", "record_updated"):
+            self._mutate(
+                self._apply_record,
+                payload["id"],
+                payload["plate_number"],
+                _parse_time(payload["entry_time"]),
+                _parse_time(payload["exit_time"]),
+            )
+        elif event_type == "record_deleted":
+            self._mutate(self._apply_record_deleted, payload["id"])
+        elif event_type in ("payment_created", "payment_updated"):
+            self._mutate(
+                self._apply_payment,
+                payload["id"],
+                payload["status"],
+                payload["amount"],
+                _parse_time(payload["paid_at"]),
+            )
+
+    def gate_hint(self, plate_number: str) -> GateHint:
+        """Plakanın aktif kaydı ve bugünkü son giriş zamanı"""
+        with self._lock:
+            self._roll_day(datetime.utcnow())
+            record_id = self._active_by_plate.get(plate_number)
+            active = (record_id, self._records[record_id].entry_time) if record_id is not None else None
+            return GateHint(active, self._last_entry.get(plate_number))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._roll_day(datetime.utcnow())
+            return {
+                "occupancy": self.occupancy,
+                "entries_today": self.entries_today,
+                "exits_today": self.exits_today,
+                "pending_amount": round(self.pending_amount, 2),
+                "paid_amount_today": round(self.paid_amount_today, 2),
+                "day": self._day.date().isoformat(),
+                "ready": self.ready,
+                "authoritative": self.authoritative,
+                "built_at": self.built_at,
+            }
+
+    def invalidate(self):
+        """İndeks veritabanıyla uyuşmayabilir; sonraki kuruluma kadar gate kararlarında kullanılmaz"""
+        with self._lock:
+            if self.ready:
+                logger.warning("Occupancy indeksi geçersiz sayıldı, yeniden kurulana kadar kullanılmayacak")
+            self.ready = False
+
+    def rebuild(self):
+        """İndeksi veritabanından yeniden kurar"""
+        with self._rebuild_lock:
+            with self._lock:
+                self._replay = []
+            try:
+                now = datetime.utcnow()
+                records, payments = _load_state(_day_start(now))
+            except Exception:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                replay, self._replay = self._replay, None
+                self._reset(now)
+                for record in records:
+                    self._set_record(record.id, RecordState(record.plate_number, record.entry_time, record.exit_time))
+                for payment in payments:
+                    self._set_payment(payment.id, PaymentState(payment.status.value, payment.amount, payment.paid_at))
+                # Sorgu sırasında uygulanan değişiklikler snapshot'tan yeni olabilir
+                for name, args in replay:
+                    getattr(self, name)(*args)
+                self._roll_day(datetime.utcnow())
+                self.ready = True
+                self.built_at = now
+        logger.info("Occupancy indeksi kuruldu: %d araç içeride", self.occupancy)
+
+
+def _load_state(day_start: datetime):
+    db = SessionLocal()
+    try:
+        record = models.ParkingRecord
+        records = (
+            db.query(record.id, record.plate_number, record.entry_time, record.exit_time)
+            .filter(
+                or_(
+                    record.exit_time.is_(None),
+                    record.entry_time >= day_start,
+                    record.exit_time >= day_start,
+                )
+            )
+            .order_by(record.entry_time)
+            .all()
+        )
+        payment = models.Payment
+        payments = (
+            db.query(payment.id, payment.status, payment.amount, payment.paid_at)
+            .filter(
+                or_(
+                    payment.status == models.PaymentStatus.PENDING,
+                    and_(payment.status == models.PaymentStatus.PAID, payment.paid_at >= day_start),
+                )
+            )
+            .all()
+        )
+        return records, payments
+    finally:
+        db.close()
+
+
+occupancy_index = OccupancyIndex(exclusive=OCCUPANCY_AUTHORITATIVE)
@@ -0,0 +1,280 @@
+"""
+Durable outbox for tracker -> API plate events.
+
+Events are appended to a JSON-lines file and a single background thread
+posts them to the API in order over a pooled keep-alive session. The byte
+offset of the first unsent event is kept next to the spool, so events
+written while the API is down survive restarts and are flushed in batches
+once it comes back: a backlog of more than one event is posted to
+/api/gate_events/batch in a single request, with the event_id as the
+idempotency key.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+LOGGER = logging.getLogger("vehicle-tracker.spool")
+
+SPOOL_FILE = "events.jsonl"
+OFFSET_FILE = "events.offset"
+BATCH_SIZE = 100
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+REQUEST_TIMEOUT = (3.05, 10)
+# 4xx responses that are worth retrying; anything else in 4xx is dropped
+RETRYABLE_STATUS = {408, 425, 429}
+
+
+class PlateEventSpool:
+    """Append-only on-disk queue with a committed read offset."""
+
+    def __init__(self, spool_dir: str):
+        self.dir = Path(spool_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.dir / SPOOL_FILE
+        self.offset_path = self.dir / OFFSET_FILE
+        self._lock = threading.Lock()
+        self._repair_tail()
+        self.offset = self._load_offset()
+        self.pending = self._count_pending()
+
+    def _repair_tail(self):
+        """Drops a half-written last line left behind by a crash."""
+        if not self.path.exists():
+            self.path.touch()
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _load_offset(self) -> int:
+        try:
+            offset = int(self.offset_path.read_text().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            offset = 0
+        return min(offset, self.path.stat().st_size)
+
+    def _count_pending(self) -> int:
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            return sum(1 for _ in f)
+
+    def append(self, event: dict):
+        line = json.dumps(event, separators=(",", ":")) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending += 1
+
+    def read_batch(self, limit: int = BATCH_SIZE) -> List[Tuple[int, dict]]:
+        """Returns up to `limit` unsent (end_offset, event) pairs in order."""
+        batch = []
+        with self._lock:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                position = self.offset
+                for raw in f:
+                    position += len(raw)
+                    try:
+                        batch.append((position, json.loads(raw)))
+                    except ValueError:
+                        LOGGER.error("Dropping corrupt spool line at %d", position)
+                        batch.append((position, None))
+                    if len(batch) >= limit:
+                        break
+        return batch
+
+    def commit(self, end_offset: int, count: int = 1):
+        """Marks everything before end_offset as sent; truncates a drained spool."""
+        with self._lock:
+            self.offset = end_offset
+            self.pending = max(0, self.pending - count)
+            if self.offset >= self.path.stat().st_size:
+                with open(self.path, "w", encoding="utf-8"):
+                    pass
+                self.offset = 0
+                self.pending = 0
+            tmp = self.offset_path.with_suffix(".tmp")
+            tmp.write_text(str(self.offset))
+            os.replace(tmp, self.offset_path)
+
+
+class PlateEventSender:
+    """Background thread that drains a PlateEventSpool into the API."""
+
+    def __init__(
+        self,
+        spool: PlateEventSpool,
+        api_base: str,
+        camera_id: Optional[str] = None,
+        metrics=None,
+    ):
+        self.spool = spool
+        self.metrics = metrics
+        self.url = f"{api_base.rstrip('/')}/api/manual_entry"
+        # Set to None when the API has no batch endpoint (older server)
+        self.batch_url: Optional[str] = f"{api_base.rstrip('/')}/api/gate_events/batch"
+        self.camera_id = camera_id
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="plate-sender", daemon=True)
+
+    def start(self):
+        if self.spool.pending:
+            LOGGER.info("Resuming %d spooled plate events", self.spool.pending)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self.session.close()
+
+    def submit(self, plate: str, confidence: float):
+        """Queues a plate event; never blocks on the network."""
+        self.spool.append(
+            {
+                "event_id": uuid.uuid4().hex,
+                "plate": plate,
+                "confidence": confidence,
+                "timestamp": datetime.utcnow().isoformat(),
+                "camera_id": self.camera_id,
+            }
+        )
+        self._wakeup.set()
+
+    def _run(self):
+        backoff = BACKOFF_INITIAL
+        while not self._stop.is_set():
+            batch = self.spool.read_batch()
+            if not batch:
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                continue
+
+            events = [event for _offset, event in batch if event is not None]
+            if self.batch_url and len(events) > 1:
+                sent = self._send_batch(events)
+                if sent is False:
+                    delay = backoff * random.uniform(0.8, 1.2)
+                    LOGGER.warning("API unavailable, retrying in %.1fs (%d pending)", delay, self.spool.pending)
+                    self._stop.wait(delay)
+                    backoff = min(backoff * 2, BACKOFF_MAX)
+                    continue
+                if sent:
+                    backoff = BACKOFF_INITIAL
+                    self.spool.commit(batch[-1][0], len(batch))
+                    continue
+                # None: batch rejected as a whole, fall back to one request per event
+
+            for end_offset, event in batch:
+                if self._stop.is_set():
+                    return
+                if event is not None and not self._send(event):
+                    # Keep order: retry the same event after a backoff
+                    delay = backoff * random.uniform(0.8, 1.2)
+                    LOGGER.warning("API unavailable, retrying in %.1fs (%d pending)", delay, self.spool.pending)
+                    self._stop.wait(delay)
+                    backoff = min(backoff * 2, BACKOFF_MAX)
+                    break
+                backoff = BACKOFF_INITIAL
+                self.spool.commit(end_offset)
+
+    def _send(self, event: dict) -> bool:
+        """Posts one event. False means retry later; True means done (sent or rejected)."""
+        plate = event["plate"]
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                self.url,
+                data={"plate_number": plate, "confidence": event["confidence"]},
+                # A retry after a timeout gets the first response instead of a second entry/exit
+                headers={"Idempotency-Key": event["event_id"]} if event.get("event_id") else None,
+                timeout=REQUEST_TIMEOUT,
+            )
+        except requests.RequestException as exc:
+            LOGGER.error("Failed to POST plate %s: %s", plate, exc)
+            self._record(started, failed=True)
+            return False
+
+        if response.status_code >= 500 or response.status_code in RETRYABLE_STATUS:
+            LOGGER.error("FastAPI error for plate %s: %s", plate, response.status_code)
+            self._record(started, failed=True)
+            return False
+        self._record(started)
+        if response.status_code >= 400:
+            LOGGER.error("FastAPI rejected plate %s: %s", plate, response.text)
+            if self.metrics:
+                self.metrics.post_rejected.inc()
+        else:
+            LOGGER.info("FastAPI accepted plate %s", plate)
+        return True
+
+    def _send_batch(self, events: List[dict]) -> Optional[bool]:
+        """
+        Posts a backlog in one request. True: done, False: retry later,
+        None: the batch was rejected and events should be sent one by one.
+        """
+        started = time.perf_counter()
+        body = [
+            {
+                "plate": event["plate"],
+                "confidence": event["confidence"],
+                "timestamp": event["timestamp"],
+                "camera_id": event.get("camera_id"),
+                "idempotency_key": event.get("event_id"),
+            }
+            for event in events
+        ]
+        try:
+            response = self.session.post(self.batch_url, json=body, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as exc:
+            LOGGER.error("Failed to POST %d plate events: %s", len(events), exc)
+            self._record(started, failed=True)
+            return False
+
+        if response.status_code >= 500 or response.status_code in RETRYABLE_STATUS:
+            LOGGER.error("FastAPI error for batch of %d: %s", len(events), response.status_code)
+            self._record(started, failed=True)
+            return False
+        self._record(started)
+        if response.status_code in (404, 405):
+            LOGGER.warning("API has no batch endpoint, sending events one by one")
+            self.batch_url = None
+            return None
+        if response.status_code >= 400:
+            LOGGER.error("FastAPI rejected batch of %d: %s", len(events), response.text)
+            return None
+
+        results = response.json().get("results", [])
+        rejected = [r for r in results if r.get("action") == "error"]
+        for result in rejected:
+            LOGGER.error("FastAPI rejected plate %s: %s", body[result["index"]]["plate"], result.get("detail"))
+        if rejected and self.metrics:
+            self.metrics.post_rejected.inc(len(rejected))
+        LOGGER.info("FastAPI accepted %d plate events", len(events) - len(rejected))
+        return True
+
+    def _record(self, started: float, failed: bool = False):
+        if not self.metrics:
+            return
+        self.metrics.post_seconds.observe(time.perf_counter() - started)
+        if failed:
+            self.metrics.post_failures.inc()
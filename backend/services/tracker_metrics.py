@@ -0,0 +1,163 @@
+"""
+Prometheus text-format metrics for the vehicle tracker.
+
+A tiny dependency-free registry (counters, gauges, histograms) plus a
+local HTTP server that serves it at /metrics. Every sample carries a
+`camera` label so several lane trackers can be scraped side by side.
+"""
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Sequence
+
+LOGGER = logging.getLogger("vehicle-tracker.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OCR_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def samples(self, labels: str) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, labels: str) -> List[str]:
+        return [f"{self.name}{{{labels}}} {self.value}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text)
+        self.value = 0.0
+        self.fn = fn
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, labels: str) -> List[str]:
+        value = self.fn() if self.fn else self.value
+        return [f"{self.name}{{{labels}}} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def samples(self, labels: str) -> List[str]:
+        with self._lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{self.name}_sum{{{labels}}} {total_sum}")
+        lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class TrackerMetrics:
+    """All metrics exported by one tracker process."""
+
+    def __init__(self, camera: str):
+        self.labels = f'camera="{camera}"'
+        self._metrics: List[_Metric] = []
+
+        self.frames = self._add(Counter("tracker_frames_total", "Frames processed"))
+        self.frames_dropped = self._add(Counter(
+            "tracker_frames_dropped_total",
+            "Camera frames estimated to be missed because processing was slower than the camera",
+        ))
+        self.capture_fps = self._add(Gauge("tracker_capture_fps", "Processed frames per second (EWMA)"))
+        self.inference_seconds = self._add(Histogram("tracker_inference_seconds", "YOLO track() latency"))
+        self.ocr_seconds = self._add(Histogram("tracker_ocr_seconds", "OCR latency per crop", OCR_BUCKETS))
+        self.ocr_calls = self._add(Counter("tracker_ocr_calls_total", "OCR calls"))
+        self.triggers = self._add(Counter("tracker_triggers_total", "Line crossings that triggered OCR"))
+        self.plates_accepted = self._add(Counter("tracker_plates_submitted_total", "Plates queued for posting"))
+        self.plates_low_confidence = self._add(Counter(
+            "tracker_plates_low_confidence_total", "Triggers skipped for missing or low-confidence plates"
+        ))
+        self.post_seconds = self._add(Histogram("tracker_post_seconds", "API post latency"))
+        self.post_failures = self._add(Counter("tracker_post_failures_total", "API posts that will be retried"))
+        self.post_rejected = self._add(Counter("tracker_post_rejected_total", "Plate events rejected by the API"))
+        self.snapshots_dropped = self._add(Counter(
+            "tracker_snapshots_dropped_total", "Snapshots dropped because the writer queue was full"
+        ))
+        self.live_tracks = self._add(Gauge("tracker_live_tracks", "Tracks currently held in memory"))
+        self.spool_pending = self._add(Gauge("tracker_spool_pending", "Plate events waiting in the spool"))
+        self.capture_queue_depth = self._add(Gauge("tracker_capture_queue_depth", "Snapshots waiting to be written"))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(self.labels))
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics: TrackerMetrics, host: str, port: int) -> Optional[ThreadingHTTPServer]:
+    """Serves metrics.render() at http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802 (http.server API)
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as exc:
+        LOGGER.error("Metrics server could not bind %s:%s: %s", host, port, exc)
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    LOGGER.info("Metrics available at http://%s:%s/metrics", host, port)
+    return server
@@ -1,17 +1,21 @@
 import argparse
 import logging
+import math
 import os
+import time
 from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
-from pathlib import Path
-from typing import Deque, Dict, Optional, Tuple
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
 
 import cv2
 import numpy as np
-import requests
 from ultralytics import YOLO
 
+from backend.services.capture_writer import CaptureWriter
 from backend.services.plate_recognition import recognize_plate_from_bytes
+from backend.services.plate_spool import PlateEventSender, PlateEventSpool
+from backend.services.tracker_metrics import TrackerMetrics, start_metrics_server
 
 
 logging.basicConfig(
@@ -26,7 +30,81 @@ DEFAULT_LINE_Y = int(os.getenv("VIRTUAL_LINE_Y", "400"))
 DEFAULT_MOVEMENT_THRESHOLD = float(os.getenv("MOVEMENT_THRESHOLD", "30.0"))
 DEFAULT_DEBOUNCE_SECONDS = float(os.getenv("DEBOUNCE_SECONDS", "10"))
 DEFAULT_CAPTURE_DIR = os.getenv("CAPTURE_DIR", "uploads/triggers")
+DEFAULT_SPOOL_DIR = os.getenv("TRACKER_SPOOL_DIR", "uploads/spool")
+DEFAULT_JPEG_QUALITY = int(os.getenv("CAPTURE_JPEG_QUALITY", "85"))
+DEFAULT_CAPTURE_CROP_ONLY = os.getenv("CAPTURE_CROP_ONLY", "false").lower() == "true"
+DEFAULT_CAPTURE_MAX_AGE_DAYS = float(os.getenv("CAPTURE_MAX_AGE_DAYS", "14"))
+DEFAULT_CAPTURE_MAX_MB = float(os.getenv("CAPTURE_MAX_MB", "2048"))
+DEFAULT_METRICS_HOST = os.getenv("TRACKER_METRICS_HOST", "127.0.0.1")
+DEFAULT_METRICS_PORT = int(os.getenv("TRACKER_METRICS_PORT", "9101"))
+FPS_SMOOTHING = 0.1
 MIN_CONFIDENCE = float(os.getenv("PLATE_MIN_CONFIDENCE", "0.8"))
+DEFAULT_ROI_BAND = int(os.getenv("ROI_BAND", "0"))
+# A band narrower than half a vehicle clips most boxes on both sides, which
+# pins their centroid to the line; smaller --roi-band values are raised to this.
+MIN_ROI_BAND = int(os.getenv("ROI_MIN_BAND", "120"))
+DEFAULT_ROI_POLYGON = os.getenv("ROI_POLYGON", "")
+DEFAULT_IMGSZ = int(os.getenv("DETECT_IMGSZ", "960"))
+# ByteTrack drops lost tracks after track_buffer (30) frames; keep ours longer.
+DEFAULT_TRACK_TTL_FRAMES = int(os.getenv("TRACK_TTL_FRAMES", "90"))
+DEFAULT_TRACK_TTL_SECONDS = float(os.getenv("TRACK_TTL_SECONDS", "10"))
+TRACK_HISTORY_LEN = 8
+DEFAULT_CROP_RING_SIZE = int(os.getenv("CROP_RING_SIZE", "6"))
+DEFAULT_OCR_TOP_K = int(os.getenv("OCR_TOP_K", "2"))
+DEFAULT_OCR_POST_FRAMES = int(os.getenv("OCR_POST_FRAMES", "3"))
+CROP_MARGIN = 0.05
+# Crops are scored on a grayscale copy downscaled to at most this width
+SCORE_WIDTH = 160
+
+
+def parse_polygon(spec: str) -> Optional[np.ndarray]:
+    """Parses an "x1,y1;x2,y2;..." string into an int32 point array."""
+    if not spec or not spec.strip():
+        return None
+    points = []
+    for pair in spec.split(";"):
+        if not pair.strip():
+            continue
+        x, y = pair.split(",")
+        points.append((int(float(x)), int(float(y))))
+    if len(points) < 3:
+        raise ValueError("ROI polygon needs at least 3 points")
+    return np.array(points, dtype=np.int32)
+
+
+def extend_clipped_boxes(
+    xyxy: np.ndarray,
+    roi_bounds: Tuple[int, int, int, int],
+    frame_shape: Tuple[int, ...],
+    tolerance: float = 2.0,
+) -> np.ndarray:
+    """Extends full-frame boxes that the detector cut off at a ROI edge.
+
+    A side touching a ROI edge that lies inside the frame is pushed past it
+    by the box's other dimension (a rough guess at the hidden part, e.g. the
+    vehicle's height from its width), clamped to the frame. Centroids and OCR
+    crops then follow the vehicle instead of the ROI edge. A box clipped on
+    both sides of a band keeps its centre, so the band must stay wider than
+    half the tallest vehicle (see MIN_ROI_BAND).
+    """
+    x0, y0, x1, y1 = roi_bounds
+    height, width = frame_shape[:2]
+    boxes = xyxy.astype(np.float32, copy=True)
+    box_w = boxes[:, 2] - boxes[:, 0]
+    box_h = boxes[:, 3] - boxes[:, 1]
+    if y0 > 0:
+        cut = boxes[:, 1] <= y0 + tolerance
+        boxes[cut, 1] = np.maximum(0, boxes[cut, 1] - box_w[cut])
+    if y1 < height:
+        cut = boxes[:, 3] >= y1 - tolerance
+        boxes[cut, 3] = np.minimum(height, boxes[cut, 3] + box_w[cut])
+    if x0 > 0:
+        cut = boxes[:, 0] <= x0 + tolerance
+        boxes[cut, 0] = np.maximum(0, boxes[cut, 0] - box_h[cut])
+    if x1 < width:
+        cut = boxes[:, 2] >= x1 - tolerance
+        boxes[cut, 2] = np.minimum(width, boxes[cut, 2] + box_h[cut])
+    return boxes
 
 
 def perform_ocr(frame: np.ndarray) -> Tuple[Optional[str], float]:
@@ -46,6 +124,76 @@ def perform_ocr(frame: np.ndarray) -> Tuple[Optional[str], float]:
     return None, 0.0
 
 
+def score_crop(crop: np.ndarray) -> float:
+    """Cheap OCR-suitability score: Laplacian variance (sharpness) x crop width.
+
+    The vehicle box width stands in for plate size, which scales with it.
+    Sharpness is measured at SCORE_WIDTH so the cost per track stays flat
+    however close the vehicle gets.
+    """
+    if crop.size == 0:
+        return 0.0
+    height, width = crop.shape[:2]
+    if width > SCORE_WIDTH:
+        small = (SCORE_WIDTH, max(1, round(height * SCORE_WIDTH / width)))
+        crop = cv2.resize(crop, small, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    sharpness = cv2.Laplacian(gray, cv2.CV_32F).var()
+    return float(sharpness) * width
+
+
+def fuse_plate_readings(readings: Iterable[Tuple[Optional[str], float]]) -> Tuple[Optional[str], float]:
+    """Confidence-weighted vote over several OCR readings of the same vehicle.
+
+    The plate with the highest summed confidence wins. Its confidence is the
+    noisy-OR of the agreeing readings, scaled by the share of the total vote
+    it received, so agreement raises confidence and disagreement lowers it.
+    """
+    votes: Dict[str, List[float]] = {}
+    for plate, confidence in readings:
+        if plate:
+            votes.setdefault(plate, []).append(confidence)
+    if not votes:
+        return None, 0.0
+
+    total = sum(sum(confs) for confs in votes.values())
+    plate, confs = max(votes.items(), key=lambda item: sum(item[1]))
+    miss = 1.0
+    for confidence in confs:
+        miss *= 1.0 - min(max(confidence, 0.0), 1.0)
+    share = sum(confs) / total if total > 0 else 0.0
+    return plate, (1.0 - miss) * share
+
+
+@dataclass(slots=True)
+class TrackState:
+    """Everything the tracker remembers about one ByteTrack ID."""
+
+    history: Deque[Tuple[int, int]] = field(
+        default_factory=lambda: deque(maxlen=TRACK_HISTORY_LEN)
+    )
+    last_seen_frame: int = 0
+    last_seen_at: float = 0.0
+    last_trigger_at: float = 0.0
+    triggered: bool = False
+    # Best-scoring (score, crop) pairs so far; OCR runs on these after a crossing
+    crops: List[Tuple[float, np.ndarray]] = field(default_factory=list)
+    # Frame index at which a pending crossing is resolved (0 = none pending)
+    pending_until: int = 0
+
+    def offer_crop(self, crop: np.ndarray, ring_size: int = DEFAULT_CROP_RING_SIZE) -> bool:
+        """Keeps a copy of `crop` only if it beats the worst crop of a full ring."""
+        score = score_crop(crop)
+        if len(self.crops) < ring_size:
+            self.crops.append((score, crop.copy()))
+            return True
+        worst = min(range(len(self.crops)), key=lambda i: self.crops[i][0])
+        if score <= self.crops[worst][0]:
+            return False
+        self.crops[worst] = (score, crop.copy())
+        return True
+
+
 class VehicleTrackerService:
     VEHICLE_CLASS_IDS = {2, 3, 5, 7}  # car, motorcycle, bus, truck (COCO IDs)
 
@@ -61,41 +209,117 @@ class VehicleTrackerService:
         tracker_config: str = "bytetrack.yaml",
         conf: float = 0.35,
         iou: float = 0.45,
+        imgsz: int = DEFAULT_IMGSZ,
+        fixed_imgsz: bool = False,
+        roi_band: int = DEFAULT_ROI_BAND,
+        roi_polygon: Optional[str] = DEFAULT_ROI_POLYGON,
+        track_ttl_frames: int = DEFAULT_TRACK_TTL_FRAMES,
+        track_ttl_seconds: float = DEFAULT_TRACK_TTL_SECONDS,
+        ocr_top_k: int = DEFAULT_OCR_TOP_K,
+        ocr_post_frames: int = DEFAULT_OCR_POST_FRAMES,
+        spool_dir: str = DEFAULT_SPOOL_DIR,
+        jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+        capture_crop_only: bool = DEFAULT_CAPTURE_CROP_ONLY,
+        capture_max_age_days: float = DEFAULT_CAPTURE_MAX_AGE_DAYS,
+        capture_max_mb: float = DEFAULT_CAPTURE_MAX_MB,
+        metrics_host: str = DEFAULT_METRICS_HOST,
+        metrics_port: int = DEFAULT_METRICS_PORT,
     ):
         self.camera_index = camera_index
+        self.metrics = TrackerMetrics(camera=str(camera_index))
         self.api_base = api_base.rstrip("/")
         self.virtual_line_y = virtual_line_y
         self.movement_threshold = movement_threshold
         self.debounce_seconds = debounce_seconds
-        self.capture_dir = Path(capture_dir)
-        self.capture_dir.mkdir(parents=True, exist_ok=True)
+        self.capture_writer = CaptureWriter(
+            capture_dir,
+            jpeg_quality=jpeg_quality,
+            crop_only=capture_crop_only,
+            max_age_days=capture_max_age_days,
+            max_total_mb=capture_max_mb,
+        )
         self.tracker_config = tracker_config
         self.conf = conf
         self.iou = iou
-
+        self.imgsz = imgsz
+        # Exported models without dynamic axes only accept their export size
+        self.fixed_imgsz = fixed_imgsz
+
+        # Detection ROI: a polygon wins over a band; neither means full frame.
+        self.roi_band = max(0, roi_band)
+        if 0 < self.roi_band < MIN_ROI_BAND:
+            LOGGER.warning("ROI band %spx is below %spx; using %spx", self.roi_band, MIN_ROI_BAND, MIN_ROI_BAND)
+            self.roi_band = MIN_ROI_BAND
+        self.roi_polygon = parse_polygon(roi_polygon) if roi_polygon else None
+        self._roi_cache_shape: Optional[Tuple[int, int]] = None
+        self._roi_bounds: Tuple[int, int, int, int] = (0, 0, 0, 0)
+        self._roi_mask: Optional[np.ndarray] = None
+        self._roi_imgsz: Tuple[int, int] = (imgsz, imgsz)
+
+        # .pt, .onnx and *_openvino_model/ directories all load through YOLO();
+        # see backend/services/detector_tools.py for export and benchmarking.
         LOGGER.info("Loading YOLO weights %s", weights_path)
-        self.model = YOLO(weights_path)
+        self.model = YOLO(weights_path, task="detect")
 
         self.cap = cv2.VideoCapture(self.camera_index)
         if not self.cap.isOpened():
             raise RuntimeError("Camera could not be opened")
+        self.camera_fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+        self.sender = PlateEventSender(
+            PlateEventSpool(spool_dir),
+            self.api_base,
+            camera_id=f"camera-{camera_index}",
+            metrics=self.metrics,
+        )
+
+        self.track_ttl_frames = track_ttl_frames
+        self.track_ttl_seconds = track_ttl_seconds
+        self.tracks: Dict[int, TrackState] = {}
+        self.ocr_top_k = max(1, ocr_top_k)
+        self.ocr_post_frames = max(0, ocr_post_frames)
+        self.frame_index = 0
+
+        # Started last: a scrape may call the gauge callbacks immediately
+        self.metrics.live_tracks.fn = lambda: len(self.tracks)
+        self.metrics.spool_pending.fn = lambda: self.sender.spool.pending
+        self.metrics.capture_queue_depth.fn = lambda: self.capture_writer.queue_depth
+        self.metrics_server = (
+            start_metrics_server(self.metrics, metrics_host, metrics_port) if metrics_port else None
+        )
 
-        self.track_history: Dict[int, Deque[Tuple[int, int]]] = {}
-        self.last_positions: Dict[int, Tuple[int, int]] = {}
-        self.last_trigger_at: Dict[int, float] = {}
-        self.triggered_ids: set[int] = set()
+    @property
+    def live_track_count(self) -> int:
+        return len(self.tracks)
 
     def run(self):
         LOGGER.info("Vehicle tracker started (camera %s)", self.camera_index)
+        self.sender.start()
+        last_frame_at = time.perf_counter()
         try:
             while True:
                 ret, frame = self.cap.read()
                 if not ret:
                     LOGGER.warning("Frame grab failed, exiting")
                     break
+                last_frame_at = self._record_frame_timing(last_frame_at)
 
                 frame = cv2.flip(frame, 1)
+                self.frame_index += 1
                 self._process_frame(frame)
+                self._resolve_pending_triggers()
+                self._evict_stale_tracks()
+                self._draw_roi(frame)
+                cv2.putText(
+                    frame,
+                    f"tracks: {self.live_track_count}",
+                    (10, 20),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5,
+                    (0, 255, 255),
+                    1,
+                    cv2.LINE_AA,
+                )
 
                 # Draw virtual line
                 cv2.line(
@@ -113,17 +337,95 @@ class VehicleTrackerService:
         finally:
             self.cap.release()
             cv2.destroyAllWindows()
+            self.sender.stop()
+            self.capture_writer.stop()
+            if self.metrics_server:
+                self.metrics_server.shutdown()
+
+    def _record_frame_timing(self, last_frame_at: float) -> float:
+        now = time.perf_counter()
+        elapsed = now - last_frame_at
+        self.metrics.frames.inc()
+        if elapsed > 0:
+            fps = self.metrics.capture_fps.value
+            instant = 1.0 / elapsed
+            self.metrics.capture_fps.set(
+                instant if fps == 0 else fps + FPS_SMOOTHING * (instant - fps)
+            )
+            if self.camera_fps > 0:
+                missed = int(elapsed * self.camera_fps) - 1
+                if missed > 0:
+                    self.metrics.frames_dropped.inc(missed)
+        return now
+
+    def _update_roi(self, frame_shape: Tuple[int, ...]):
+        """Recomputes the ROI crop bounds, mask and inference size for a frame size."""
+        height, width = frame_shape[:2]
+        if self._roi_cache_shape == (height, width):
+            return
+        self._roi_cache_shape = (height, width)
+        self._roi_mask = None
+
+        if self.roi_polygon is not None:
+            x, y, w, h = cv2.boundingRect(self.roi_polygon)
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(width, x + w), min(height, y + h)
+            mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            cv2.fillPoly(mask, [self.roi_polygon - np.array([x0, y0], dtype=np.int32)], 255)
+            self._roi_mask = mask
+        elif self.roi_band > 0:
+            x0, x1 = 0, width
+            y0 = max(0, self.virtual_line_y - self.roi_band)
+            y1 = min(height, self.virtual_line_y + self.roi_band)
+        else:
+            x0, y0, x1, y1 = 0, 0, width, height
+
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError("Detection ROI does not intersect the frame")
+        self._roi_bounds = (x0, y0, x1, y1)
+
+        # Keep the full-frame scale factor so the crop is not upsampled back
+        # to imgsz; the letterboxed (h, w) input then shrinks with the crop area.
+        if self.fixed_imgsz:
+            self._roi_imgsz = (self.imgsz, self.imgsz)
+        else:
+            scale = self.imgsz / max(height, width)
+            self._roi_imgsz = (
+                max(32, int(math.ceil((y1 - y0) * scale / 32)) * 32),
+                max(32, int(math.ceil((x1 - x0) * scale / 32)) * 32),
+            )
+        LOGGER.info(
+            "Detection ROI x=%s..%s y=%s..%s (imgsz=%s)", x0, x1, y0, y1, self._roi_imgsz
+        )
+
+    def _crop_roi(self, frame: np.ndarray) -> np.ndarray:
+        self._update_roi(frame.shape)
+        x0, y0, x1, y1 = self._roi_bounds
+        roi = frame[y0:y1, x0:x1]
+        if self._roi_mask is not None:
+            roi = cv2.bitwise_and(roi, roi, mask=self._roi_mask)
+        return roi
+
+    def _draw_roi(self, frame: np.ndarray):
+        if self.roi_polygon is not None:
+            cv2.polylines(frame, [self.roi_polygon], True, (255, 128, 0), 1)
+        elif self.roi_band > 0:
+            x0, y0, x1, y1 = self._roi_bounds
+            cv2.rectangle(frame, (x0, y0), (x1 - 1, y1 - 1), (255, 128, 0), 1)
 
     def _process_frame(self, frame: np.ndarray):
+        roi = self._crop_roi(frame)
+        started = time.perf_counter()
         results = self.model.track(
-            frame,
+            roi,
             conf=self.conf,
             iou=self.iou,
-            imgsz=960,
+            imgsz=self._roi_imgsz,
             tracker=self.tracker_config,
             persist=True,
             verbose=False,
         )
+        self.metrics.inference_seconds.observe(time.perf_counter() - started)
         if not results:
             return
 
@@ -134,7 +436,17 @@ class VehicleTrackerService:
         ids = boxes.id.int().cpu().tolist()
         classes = boxes.cls.int().cpu().tolist()
         xyxy = boxes.xyxy.cpu().numpy()
-
+        # Map ROI coordinates back to the full frame for tracking/line logic
+        x0, y0 = self._roi_bounds[:2]
+        if x0 or y0:
+            xyxy = xyxy + np.array([x0, y0, x0, y0], dtype=xyxy.dtype)
+
+        now = time.monotonic()
+        height, width = frame.shape[:2]
+        if self._roi_bounds != (0, 0, width, height):
+            # Centroids and crops (taken from the full frame) cover the whole vehicle
+            xyxy = extend_clipped_boxes(xyxy, self._roi_bounds, frame.shape)
+        overlays = []
         for idx, track_id in enumerate(ids):
             if classes[idx] not in self.VEHICLE_CLASS_IDS:
                 continue
@@ -143,19 +455,38 @@ class VehicleTrackerService:
             cx = int((box[0] + box[2]) / 2)
             cy = int((box[1] + box[3]) / 2)
 
-            self.track_history.setdefault(track_id, deque(maxlen=8)).append((cx, cy))
-            movement_ok = self._has_sufficient_movement(track_id)
+            state = self.tracks.get(track_id)
+            if state is None:
+                state = self.tracks[track_id] = TrackState()
+            state.last_seen_frame = self.frame_index
+            state.last_seen_at = now
 
-            prev_pos = self.last_positions.get(track_id)
-            self.last_positions[track_id] = (cx, cy)
+            prev_pos = state.history[-1] if state.history else None
+            state.history.append((cx, cy))
+            movement_ok = self._has_sufficient_movement(state)
             crossed = self._has_crossed_line(prev_pos, (cx, cy))
 
-            self._draw_track(frame, box, track_id, movement_ok, crossed)
+            # Crops are taken before any overlay is drawn on the frame, and
+            # only while the track can still produce a trigger
+            crop = None
+            if state.pending_until or self._can_trigger(state):
+                mx = (box[2] - box[0]) * CROP_MARGIN
+                my = (box[3] - box[1]) * CROP_MARGIN
+                crop = frame[
+                    max(0, int(box[1] - my)):min(height, int(box[3] + my)),
+                    max(0, int(box[0] - mx)):min(width, int(box[2] + mx)),
+                ]
+                if crop.size:
+                    state.offer_crop(crop)
+                else:
+                    crop = None
+
+            overlays.append((box, track_id, state, movement_ok, crossed))
 
             if (
                 crossed
                 and movement_ok
-                and self._can_trigger(track_id)
+                and self._can_trigger(state)
             ):
                 LOGGER.info(
                     "Triggering car_id=%s at (%s, %s); movement_ok=%s",
@@ -164,10 +495,37 @@ class VehicleTrackerService:
                     cy,
                     movement_ok,
                 )
-                self._handle_trigger(frame.copy(), track_id)
-
-    def _draw_track(self, frame, box, track_id, movement_ok, crossed):
-        color = (0, 200, 0) if track_id in self.triggered_ids else (255, 0, 0)
+                self.metrics.triggers.inc()
+                self._save_snapshot(frame, track_id, crop)
+                # OCR waits a few frames so crops after the crossing compete too
+                state.pending_until = self.frame_index + self.ocr_post_frames
+
+        for overlay in overlays:
+            self._draw_track(frame, *overlay)
+
+    def _resolve_pending_triggers(self):
+        for track_id, state in self.tracks.items():
+            if state.pending_until and self.frame_index >= state.pending_until:
+                self._handle_trigger(track_id, state)
+
+    def _evict_stale_tracks(self):
+        """Drops tracks unseen for track_ttl_frames frames or track_ttl_seconds."""
+        now = time.monotonic()
+        stale = [
+            track_id
+            for track_id, state in self.tracks.items()
+            if self.frame_index - state.last_seen_frame > self.track_ttl_frames
+            or now - state.last_seen_at > self.track_ttl_seconds
+        ]
+        for track_id in stale:
+            state = self.tracks.pop(track_id)
+            if state.pending_until:
+                self._handle_trigger(track_id, state)
+        if stale:
+            LOGGER.debug("Evicted %d stale tracks; live=%d", len(stale), len(self.tracks))
+
+    def _draw_track(self, frame, box, track_id, state, movement_ok, crossed):
+        color = (0, 200, 0) if state.triggered else (255, 0, 0)
         cv2.rectangle(
             frame,
             (int(box[0]), int(box[1])),
@@ -201,31 +559,56 @@ class VehicleTrackerService:
         curr_side = current_pos[1] < self.virtual_line_y
         return prev_side != curr_side
 
-    def _has_sufficient_movement(self, track_id: int) -> bool:
-        history = self.track_history.get(track_id)
-        if not history or len(history) < 2:
+    def _has_sufficient_movement(self, state: TrackState) -> bool:
+        history = state.history
+        if len(history) < 2:
             return False
         (x0, y0) = history[0]
         (x1, y1) = history[-1]
         distance = ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5
         return distance >= self.movement_threshold
 
-    def _can_trigger(self, track_id: int) -> bool:
-        last_time = self.last_trigger_at.get(track_id, 0)
-        now = datetime.utcnow().timestamp()
-        if track_id in self.triggered_ids and (now - last_time) < self.debounce_seconds:
+    def _can_trigger(self, state: TrackState) -> bool:
+        if state.pending_until:
+            return False
+        now = time.monotonic()
+        if state.triggered and (now - state.last_trigger_at) < self.debounce_seconds:
             return False
         return True
 
-    def _handle_trigger(self, frame: np.ndarray, track_id: int):
-        now = datetime.utcnow()
-        timestamp = now.strftime("%Y%m%d_%H%M%S_%f")
-        filename = self.capture_dir / f"car_{track_id}_{timestamp}.jpg"
-        cv2.imwrite(str(filename), frame)
-        LOGGER.info("Saved trigger frame to %s", filename)
-
-        plate, confidence = perform_ocr(frame)
+    def _save_snapshot(self, frame: np.ndarray, track_id: int, crop: Optional[np.ndarray]):
+        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+        name = f"car_{track_id}_{timestamp}"
+        # The crop is a view of the frame, which is drawn on after this call
+        crop = crop.copy() if crop is not None else None
+        if self.capture_writer.crop_only and crop is not None:
+            queued = self.capture_writer.submit(name, None, crop)
+        else:
+            # The frame is drawn on after this call, so the writer gets a copy
+            queued = self.capture_writer.submit(name, frame.copy(), crop)
+        if not queued:
+            self.metrics.snapshots_dropped.inc()
+
+    def _read_best_crops(self, state: TrackState) -> Tuple[Optional[str], float]:
+        """OCRs the sharpest crops in the ring, stopping early on a confident read."""
+        ranked = sorted(state.crops, key=lambda item: item[0], reverse=True)
+        readings = []
+        for _score, crop in ranked[: self.ocr_top_k]:
+            started = time.perf_counter()
+            readings.append(perform_ocr(crop))
+            self.metrics.ocr_seconds.observe(time.perf_counter() - started)
+            self.metrics.ocr_calls.inc()
+            plate, confidence = fuse_plate_readings(readings)
+            if plate and confidence >= MIN_CONFIDENCE:
+                break
+        return fuse_plate_readings(readings)
+
+    def _handle_trigger(self, track_id: int, state: TrackState):
+        state.pending_until = 0
+        plate, confidence = self._read_best_crops(state)
+        state.crops.clear()
         if not plate or confidence < MIN_CONFIDENCE:
+            self.metrics.plates_low_confidence.inc()
             LOGGER.info(
                 "Skipped posting for car_id=%s; plate=%s confidence=%.2f",
                 track_id,
@@ -234,42 +617,45 @@ class VehicleTrackerService:
             )
             return
 
-        self._post_plate(plate, confidence)
-        self.triggered_ids.add(track_id)
-        self.last_trigger_at[track_id] = now.timestamp()
+        self.sender.submit(plate, confidence)
+        self.metrics.plates_accepted.inc()
+        state.triggered = True
+        state.last_trigger_at = time.monotonic()
         LOGGER.info(
             "Trigger complete car_id=%s plate=%s (conf=%.2f)",
             track_id,
             plate,
             confidence,
         )
- 
-    def _post_plate(self, plate: str, confidence: float):
-        url = f"{self.api_base}/api/manual_entry"
-        try:
-            response = requests.post(
-                url, data={"plate_number": plate, "confidence": confidence}, timeout=5
-            )
-            if response.status_code >= 400:
-                LOGGER.error("FastAPI rejected plate %s: %s", plate, response.text)
-            else:
-                LOGGER.info("FastAPI accepted plate %s", plate)
-        except requests.RequestException as exc:
-            LOGGER.error("Failed to POST plate %s: %s", plate, exc)
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Vehicle tracking & plate trigger service")
     parser.add_argument("--camera", type=int, default=0, help="Camera index")
-    parser.add_argument("--weights", type=str, default="yolov8n.pt", help="YOLO weights path")
+    parser.add_argument("--weights", type=str, default="yolov8n.pt", help="YOLO weights (.pt, .onnx or *_openvino_model dir)")
     parser.add_argument("--api-base", type=str, default=DEFAULT_API_BASE, help="FastAPI base URL")
     parser.add_argument("--line-y", type=int, default=DEFAULT_LINE_Y, help="Virtual line Y")
     parser.add_argument("--movement", type=float, default=DEFAULT_MOVEMENT_THRESHOLD, help="Movement threshold px")
     parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE_SECONDS, help="Per car debounce seconds")
     parser.add_argument("--tracker-config", type=str, default="bytetrack.yaml", help="Tracker config file")
     parser.add_argument("--capture-dir", type=str, default=DEFAULT_CAPTURE_DIR, help="Capture directory")
+    parser.add_argument("--jpeg-quality", type=int, default=DEFAULT_JPEG_QUALITY, help="Snapshot JPEG quality (1-100)")
+    parser.add_argument("--capture-crop-only", action="store_true", default=DEFAULT_CAPTURE_CROP_ONLY, help="Store only the vehicle crop")
+    parser.add_argument("--capture-max-age-days", type=float, default=DEFAULT_CAPTURE_MAX_AGE_DAYS, help="Delete snapshots older than this (0 = keep)")
+    parser.add_argument("--capture-max-mb", type=float, default=DEFAULT_CAPTURE_MAX_MB, help="Cap on total snapshot size (0 = unlimited)")
+    parser.add_argument("--metrics-host", type=str, default=DEFAULT_METRICS_HOST, help="Metrics HTTP bind address")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_METRICS_PORT, help="Metrics HTTP port (0 = disabled)")
+    parser.add_argument("--spool-dir", type=str, default=DEFAULT_SPOOL_DIR, help="Durable outbox for plate events")
     parser.add_argument("--conf", type=float, default=0.35, help="YOLO confidence threshold")
     parser.add_argument("--iou", type=float, default=0.45, help="YOLO IOU threshold")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ, help="Inference size for the full frame")
+    parser.add_argument("--fixed-imgsz", action="store_true", help="Always infer at --imgsz (exported models without --dynamic)")
+    parser.add_argument("--roi-band", type=int, default=DEFAULT_ROI_BAND, help=f"Detect only within +/- px of the line (0 = full frame, min {MIN_ROI_BAND})")
+    parser.add_argument("--roi-polygon", type=str, default=DEFAULT_ROI_POLYGON, help='Detection polygon "x1,y1;x2,y2;..." (overrides --roi-band)')
+    parser.add_argument("--track-ttl-frames", type=int, default=DEFAULT_TRACK_TTL_FRAMES, help="Evict tracks unseen for this many frames")
+    parser.add_argument("--track-ttl-seconds", type=float, default=DEFAULT_TRACK_TTL_SECONDS, help="Evict tracks unseen for this many seconds")
+    parser.add_argument("--ocr-top-k", type=int, default=DEFAULT_OCR_TOP_K, help="Max crops OCR'd per crossing")
+    parser.add_argument("--ocr-post-frames", type=int, default=DEFAULT_OCR_POST_FRAMES, help="Frames collected after a crossing before OCR")
     return parser.parse_args()
 
 
@@ -284,8 +670,23 @@ def main():
         debounce_seconds=args.debounce,
         tracker_config=args.tracker_config,
         capture_dir=args.capture_dir,
+        spool_dir=args.spool_dir,
+        jpeg_quality=args.jpeg_quality,
+        capture_crop_only=args.capture_crop_only,
+        capture_max_age_days=args.capture_max_age_days,
+        capture_max_mb=args.capture_max_mb,
+        metrics_host=args.metrics_host,
+        metrics_port=args.metrics_port,
         conf=args.conf,
         iou=args.iou,
+        imgsz=args.imgsz,
+        fixed_imgsz=args.fixed_imgsz,
+        roi_band=args.roi_band,
+        roi_polygon=args.roi_polygon,
+        track_ttl_frames=args.track_ttl_frames,
+        track_ttl_seconds=args.track_ttl_seconds,
+        ocr_top_k=args.ocr_top_k,
+        ocr_post_frames=args.ocr_post_frames,
     )
     service.run()
 
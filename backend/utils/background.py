@@ -0,0 +1,36 @@
+"""
+Background task utilities
+"""
+import asyncio
+import logging
+from typing import Callable, List
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Uygulama kapanırken iptal edilecek periyodik task'lar
+periodic_tasks: List[asyncio.Task] = []
+
+
+async def run_periodic(interval: float, func: Callable, name: str):
+    """func'ı her interval saniyede bir threadpool'da çalıştırır; hatalar loglanır"""
+    while True:
+        try:
+            await run_in_threadpool(func)
+        except Exception as exc:
+            logger.error("Periyodik görev %s başarısız: %s", name, exc)
+        await asyncio.sleep(interval)
+
+
+def start_periodic(interval: float, func: Callable, name: str) -> asyncio.Task:
+    task = asyncio.create_task(run_periodic(interval, func, name), name=name)
+    periodic_tasks.append(task)
+    return task
+
+
+async def stop_periodic_tasks():
+    for task in periodic_tasks:
+        task.cancel()
+    await asyncio.gather(*periodic_tasks, return_exceptions=True)
+    periodic_tasks.clear()
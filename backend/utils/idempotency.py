@@ -0,0 +1,223 @@
+"""
+Idempotency utilities
+
+Mutasyon yapan endpoint'ler Idempotency-Key header'ı kabul eder. Anahtarla
+gelen isteğin başarılı cevabı idempotency_keys tablosuna, mutasyonla aynı
+transaction içinde yazılır (stage); aynı anahtarla tekrar gelen istek işi
+tekrar yapmadan kaydedilmiş cevabı alır (replay).
+
+Aynı anahtarla eş zamanlı iki istek gelirse ikinci isteğin INSERT'i ilkinin
+commit'ini bekler ve IdempotencyConflict fırlatır; route transaction'ı geri
+alıp ilk isteğin cevabını döner, böylece iş iki kez yapılamaz.
+
+Mutasyonu bir yan etki (ör. bariyer) izliyorsa mutasyonla birlikte
+IN_PROGRESS_STATUS'lu bir kayıt yazılır ve yan etkiden sonra complete_async
+ile asıl cevaba çevrilir. Bu kayıt replay'de 409 döner; yan etki yarıda
+kaldıysa (hata, çökme) tekrar deneme claim_async ile işi devralır.
+
+Cevaplar ayrıca IDEMPOTENCY_CACHE_TTL süreyle bellekte tutulur. Kayıtlar
+IDEMPOTENCY_TTL_HOURS sonra geçersizdir ve purge_expired ile toplu silinir.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+import logging
+import os
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.database import SessionLocal
+from backend.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 128
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", "600"))  # saniye
+IDEMPOTENCY_CACHE_SIZE = 4096
+IDEMPOTENCY_SWEEP_INTERVAL = float(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL", "3600"))  # saniye
+# İşi henüz bitmemiş isteğin kaydı; bellekte tutulmaz, replay'de 409 döner
+IN_PROGRESS_STATUS = 202
+# release_async ile bırakılan kaydın created_at'i; claim_async hemen alabilir
+RELEASED_AT = datetime(1970, 1, 1)
+
+table = models.IdempotencyKey.__table__
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    body: Any
+
+
+class IdempotencyConflict(Exception):
+    """Aynı anahtarla başka bir istek cevabını bu arada kaydetti"""
+
+
+_cache = TTLCache(IDEMPOTENCY_CACHE_TTL, IDEMPOTENCY_CACHE_SIZE)
+
+
+def validate_key(key: Optional[str]) -> Optional[str]:
+    """Header değerini kontrol eder; boşsa None döner"""
+    if key is None or not key.strip():
+        return None
+    key = key.strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{IDEMPOTENCY_HEADER} en fazla {MAX_KEY_LENGTH} karakter olabilir"
+        )
+    return key
+
+
+def _lookup_query(scope: str, keys: Iterable[str]):
+    return select(table.c.key, table.c.status_code, table.c.response).where(
+        table.c.scope == scope,
+        table.c.key.in_(list(keys)),
+        table.c.expires_at > datetime.utcnow(),
+    )
+
+
+def _insert_query(scope: str, key: str, body: Any, status_code: int):
+    now = datetime.utcnow()
+    stmt = pg_insert(table).values(
+        scope=scope,
+        key=key,
+        status_code=status_code,
+        response=body,
+        created_at=now,
+        expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+    )
+    # Süresi dolmuş ama henüz silinmemiş kayıt lookup'ta görünmez; üzerine yazılır
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.scope, table.c.key],
+        set_={
+            "status_code": stmt.excluded.status_code,
+            "response": stmt.excluded.response,
+            "created_at": stmt.excluded.created_at,
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=table.c.expires_at <= now,
+    ).returning(table.c.key)
+
+
+def lookup_many(db: Session, scope: str, keys: Iterable[str]) -> Dict[str, StoredResponse]:
+    """Kaydedilmiş cevapları önce bellekten, kalanları tek sorguyla veritabanından getirir"""
+    found: Dict[str, StoredResponse] = {}
+    missing = []
+    for key in keys:
+        stored = _cache.get((scope, key))
+        if stored is not None:
+            found[key] = stored
+        else:
+            missing.append(key)
+    if missing:
+        for row in db.execute(_lookup_query(scope, missing)):
+            found[row.key] = _from_row(scope, row)
+    return found
+
+
+def lookup(db: Session, scope: str, key: str) -> Optional[StoredResponse]:
+    return lookup_many(db, scope, [key]).get(key)
+
+
+async def lookup_async(db, scope: str, key: str) -> Optional[StoredResponse]:
+    stored = _cache.get((scope, key))
+    if stored is not None:
+        return stored
+    row = (await db.execute(_lookup_query(scope, [key]))).first()
+    if row is None:
+        return None
+    return _from_row(scope, row)
+
+
+def _from_row(scope: str, row) -> StoredResponse:
+    if row.status_code == IN_PROGRESS_STATUS:
+        # Başka bir worker tamamlayabilir; bellekte tutulursa eskir
+        return StoredResponse(row.status_code, row.response)
+    return remember(scope, row.key, row.response, row.status_code)
+
+
+def _in_progress(scope: str, key: str):
+    return update(table).where(
+        table.c.scope == scope,
+        table.c.key == key,
+        table.c.status_code == IN_PROGRESS_STATUS,
+    )
+
+
+async def claim_async(db, scope: str, key: str, lease: float) -> bool:
+    """
+    IN_PROGRESS_STATUS'lu kayda lease saniyedir dokunulmadıysa (sahibi hata
+    aldı ya da çöktü) işi bu isteğe alır; commit çağıranındır.
+    """
+    now = datetime.utcnow()
+    stmt = (
+        _in_progress(scope, key)
+        .where(table.c.created_at <= now - timedelta(seconds=lease))
+        .values(created_at=now)
+        .returning(table.c.key)
+    )
+    return (await db.execute(stmt)).first() is not None
+
+
+async def release_async(db, scope: str, key: str):
+    """İşi yarıda bırakır; kayıt bir sonraki claim_async'e hemen verilir"""
+    await db.execute(_in_progress(scope, key).values(created_at=RELEASED_AT))
+
+
+async def complete_async(db, scope: str, key: str, body: Any, status_code: int = 200):
+    """IN_PROGRESS_STATUS'lu kaydı asıl cevapla değiştirir; commit'ten sonra remember çağrılmalıdır"""
+    await db.execute(_in_progress(scope, key).values(status_code=status_code, response=body))
+
+
+def stage(db: Session, scope: str, key: str, body: Any, status_code: int = 200):
+    """Cevabı çağıranın transaction'ına ekler; commit'ten sonra remember çağrılmalıdır"""
+    if db.execute(_insert_query(scope, key, body, status_code)).first() is None:
+        raise IdempotencyConflict(key)
+
+
+async def stage_async(db, scope: str, key: str, body: Any, status_code: int = 200):
+    if (await db.execute(_insert_query(scope, key, body, status_code))).first() is None:
+        raise IdempotencyConflict(key)
+
+
+def remember(scope: str, key: str, body: Any, status_code: int = 200) -> StoredResponse:
+    """Cevabı sadece bellekte tutar (commit edilmiş ya da veritabanına yazılmayan cevaplar)"""
+    stored = StoredResponse(status_code, body)
+    _cache.put((scope, key), stored)
+    return stored
+
+
+def replay(stored: Optional[StoredResponse]) -> JSONResponse:
+    """Kaydedilmiş cevabı döner; eş zamanlı istek cevabını henüz kaydetmediyse 409"""
+    if stored is None or stored.status_code == IN_PROGRESS_STATUS:
+        raise HTTPException(
+            status_code=409,
+            detail="Bu Idempotency-Key ile yapılan istek henüz tamamlanmadı"
+        )
+    return JSONResponse(stored.body, status_code=stored.status_code, headers={REPLAYED_HEADER: "true"})
+
+
+def purge_expired() -> int:
+    """Süresi dolmuş kayıtları siler, silinen sayıyı döner"""
+    db = SessionLocal()
+    try:
+        deleted = (
+            db.query(models.IdempotencyKey)
+            .filter(models.IdempotencyKey.expires_at < datetime.utcnow())
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+    if deleted:
+        logger.info("%d süresi dolmuş idempotency kaydı silindi", deleted)
+    return deleted
@@ -0,0 +1,76 @@
+"""
+Keyed lock utilities
+
+Aynı anahtar (ör. plaka) için işlemleri sıraya sokar, farklı anahtarlar
+paralel çalışır. Her anahtarın kendi lock'u vardır ve sadece tutulduğu ya da
+beklendiği sürece bellekte kalır; bellek o anda işlenen anahtar sayısıyla
+sınırlıdır. Çok anahtarlı bir çağrı (ör. toplu okuma) sadece kendi
+anahtarlarını bekletir.
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List
+import threading
+import time
+
+
+class LockTimeout(TimeoutError):
+    """Lock süre sınırı içinde alınamadı"""
+
+
+class _Entry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Lock'u tutan ya da bekleyen çağrı sayısı; 0 olunca kayıt silinir
+        self.users = 0
+
+
+class KeyedLockManager:
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+
+    def _checkout(self, key: str) -> _Entry:
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            entry.users += 1
+            return entry
+
+    def _checkin(self, key: str, entry: _Entry):
+        with self._mutex:
+            entry.users -= 1
+            if entry.users == 0:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._mutex:
+            return len(self._entries)
+
+    @contextmanager
+    def hold(self, keys: Iterable[str], timeout: float = -1) -> Iterator[None]:
+        """
+        Anahtarların lock'larını sırayla alır (sıralı alındığı için birden
+        fazla anahtar tutan çağrılar birbirini kilitlemez). Hepsi timeout
+        saniye içinde alınamazsa LockTimeout fırlatır; -1 süresiz bekler.
+        """
+        deadline = None if timeout < 0 else time.monotonic() + timeout
+        acquired: List[str] = []
+        waiting = []
+        try:
+            for key in sorted(set(keys)):
+                entry = self._checkout(key)
+                waiting.append((key, entry))
+                remaining = -1 if deadline is None else max(deadline - time.monotonic(), 0)
+                if not entry.lock.acquire(timeout=remaining):
+                    raise LockTimeout(f"Lock {timeout} saniyede alınamadı")
+                acquired.append(key)
+            yield
+        finally:
+            for key, entry in reversed(waiting):
+                if acquired and acquired[-1] == key:
+                    acquired.pop()
+                    entry.lock.release()
+                self._checkin(key, entry)
@@ -1,49 +1,237 @@
 """
 Session management utilities
+
+Session'lar bir SessionStore'da tutulur:
+- "database" (varsayılan): user_sessions tablosu; worker'lar ve restart'lar
+  arasında paylaşılır
+- "memory": process içi dict (tek worker / geliştirme)
+SESSION_STORE environment variable'ı ile seçilir.
+
+get_session_user önünde kısa ömürlü (SESSION_CACHE_TTL) yerel bir cache
+vardır; başka bir worker'da silinen session bu süre kadar geçerli
+görünebilir. Session'ın sahibi olan kullanıcı (UserPrincipal) da
+PRINCIPAL_CACHE_TTL süreyle cache'lenir; kullanıcı güncellenince veya
+silinince invalidate_user_principal çağrılmalıdır.
+
+Süresi dolan session'lar sweep_expired_sessions ile toplu silinir
+(uygulama açılışında periyodik olarak çalıştırılır).
 """
 from datetime import datetime, timedelta
-from typing import Optional, Dict
+from dataclasses import dataclass
+from typing import Dict, Optional
+import hashlib
+import logging
+import os
 import secrets
+import threading
+
+from backend.database import SessionLocal
+from backend import models
+from backend.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
-# Session yönetimi için in-memory storage (production'da Redis kullanılabilir)
-active_sessions: Dict[str, dict] = {}
 SESSION_COOKIE_NAME = "parking_session_token"
 SESSION_DURATION_DAYS = 7  # "Beni hatırla" için
 SESSION_DURATION_HOURS = 24  # Normal session için
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "30"))  # saniye
+SESSION_CACHE_SIZE = 1024
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))  # saniye
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "300"))  # saniye
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class SessionStore:
+    """Session saklama arayüzü; anahtar token'ın SHA-256 özetidir"""
+
+    def save(self, token_hash: str, session: dict):
+        raise NotImplementedError
+
+    def load(self, token_hash: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def delete(self, token_hash: str):
+        raise NotImplementedError
+
+    def purge_expired(self, now: datetime) -> int:
+        """Süresi dolmuş session'ları siler, silinen sayıyı döner"""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self):
+        self.sessions: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def save(self, token_hash: str, session: dict):
+        with self._lock:
+            self.sessions[token_hash] = session
+
+    def load(self, token_hash: str) -> Optional[dict]:
+        return self.sessions.get(token_hash)
+
+    def delete(self, token_hash: str):
+        with self._lock:
+            self.sessions.pop(token_hash, None)
+
+    def purge_expired(self, now: datetime) -> int:
+        with self._lock:
+            expired = [h for h, s in self.sessions.items() if s["expires_at"] < now]
+            for token_hash in expired:
+                del self.sessions[token_hash]
+        return len(expired)
+
+
+class DatabaseSessionStore(SessionStore):
+    def save(self, token_hash: str, session: dict):
+        db = SessionLocal()
+        try:
+            db.add(
+                models.UserSession(
+                    token_hash=token_hash,
+                    user_id=session["user_id"],
+                    email=session["email"],
+                    remember_me=1 if session["remember_me"] else 0,
+                    expires_at=session["expires_at"],
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def load(self, token_hash: str) -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            row = db.get(models.UserSession, token_hash)
+            if row is None:
+                return None
+            return {
+                "user_id": row.user_id,
+                "email": row.email,
+                "expires_at": row.expires_at,
+                "remember_me": bool(row.remember_me),
+            }
+        finally:
+            db.close()
+
+    def delete(self, token_hash: str):
+        db = SessionLocal()
+        try:
+            db.query(models.UserSession).filter(models.UserSession.token_hash == token_hash).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_expired(self, now: datetime) -> int:
+        db = SessionLocal()
+        try:
+            deleted = (
+                db.query(models.UserSession)
+                .filter(models.UserSession.expires_at < now)
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+
+def create_session_store(kind: Optional[str] = None) -> SessionStore:
+    kind = (kind or os.getenv("SESSION_STORE", "database")).lower()
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind != "database":
+        logger.warning("Bilinmeyen SESSION_STORE=%s, database kullanılıyor", kind)
+    return DatabaseSessionStore()
+
+
+session_store: SessionStore = create_session_store()
+
+
+_session_cache = TTLCache(SESSION_CACHE_TTL, SESSION_CACHE_SIZE)
 
 
 def create_session_token(user_id: int, email: str, remember_me: bool = False) -> str:
     """Yeni session token oluşturur"""
     token = secrets.token_urlsafe(32)
     expires_at = datetime.utcnow() + (
-        timedelta(days=SESSION_DURATION_DAYS) if remember_me 
+        timedelta(days=SESSION_DURATION_DAYS) if remember_me
         else timedelta(hours=SESSION_DURATION_HOURS)
     )
-    active_sessions[token] = {
+    session = {
         "user_id": user_id,
         "email": email,
         "expires_at": expires_at,
         "remember_me": remember_me
     }
+    token_hash = _hash_token(token)
+    session_store.save(token_hash, session)
+    _session_cache.put(token_hash, session)
     return token
 
 
 def get_session_user(token: str) -> Optional[dict]:
     """Session token'dan kullanıcı bilgisini alır"""
-    if token not in active_sessions:
-        return None
-    
-    session = active_sessions[token]
+    token_hash = _hash_token(token)
+    session = _session_cache.get(token_hash)
+    if session is None:
+        session = session_store.load(token_hash)
+        if session is None:
+            return None
+        _session_cache.put(token_hash, session)
+
     if datetime.utcnow() > session["expires_at"]:
         # Süresi dolmuş session'ı temizle
-        del active_sessions[token]
+        delete_session(token)
         return None
-    
+
     return session
 
 
 def delete_session(token: str):
     """Session'ı siler"""
-    if token in active_sessions:
-        del active_sessions[token]
+    token_hash = _hash_token(token)
+    _session_cache.drop(token_hash)
+    session_store.delete(token_hash)
+
+
+def sweep_expired_sessions() -> int:
+    """Süresi dolmuş tüm session'ları store'dan ve cache'ten toplu siler"""
+    now = datetime.utcnow()
+    _session_cache.drop_where(lambda session: session["expires_at"] < now)
+    deleted = session_store.purge_expired(now)
+    if deleted:
+        logger.info("%d süresi dolmuş session silindi", deleted)
+    return deleted
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Yetki kontrolleri için kullanıcının cache'lenen özeti"""
+    id: int
+    email: str
+    is_super_admin: int
+
+
+_principal_cache = TTLCache(PRINCIPAL_CACHE_TTL, SESSION_CACHE_SIZE)
+
+
+def get_user_principal(db, user_id: int) -> Optional[UserPrincipal]:
+    """Kullanıcıyı cache'ten, yoksa veritabanından getirir"""
+    principal = _principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        return None
+    principal = UserPrincipal(id=user.id, email=user.email, is_super_admin=user.is_super_admin)
+    _principal_cache.put(user_id, principal)
+    return principal
+
 
+def invalidate_user_principal(user_id: int):
+    """Kullanıcı değiştiğinde cache'teki özetini düşürür"""
+    _principal_cache.drop(user_id)
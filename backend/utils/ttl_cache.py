@@ -0,0 +1,51 @@
+"""
+TTL cache utilities
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+import threading
+import time
+
+
+class TTLCache:
+    """Boyutu ve ömrü sınırlı, thread-safe LRU cache"""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # key -> (değer, cache'ten düşeceği monotonic zaman)
+        self._items: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            value, cached_until = entry
+            if time.monotonic() > cached_until:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """ttl verilmezse cache'in varsayılan ömrü kullanılır"""
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def drop(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def drop_where(self, predicate: Callable[[Any], bool]):
+        with self._lock:
+            for key in [k for k, (v, _until) in self._items.items() if predicate(v)]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
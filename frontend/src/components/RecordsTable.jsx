@@ -10,7 +10,10 @@ export default function RecordsTable({ forceRefreshKey = 0 }) {
   const [completing, setCompleting] = useState(new Set());
   const reconnectTimer = useRef();
   const [currentPage, setCurrentPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const itemsPerPage = 20;
+  const pageSize = 200;
 
   const wsUrl = useMemo(() => {
     const base = API.wsBase || API.base.replace(/^http/, "ws");
@@ -20,8 +23,9 @@ export default function RecordsTable({ forceRefreshKey = 0 }) {
   const fetchLatest = useCallback(async () => {
     try {
       setLoading(true);
-      const data = await fetchJSON(API.base + API.getRecords);
-      setRows(data);
+      const data = await fetchJSON(`${API.base}${API.getRecords}?limit=${pageSize}`);
+      setRows(data.items);
+      setNextCursor(data.next_cursor);
       setError("");
     } catch (err) {
       setError(err.message);
@@ -32,6 +36,31 @@ export default function RecordsTable({ forceRefreshKey = 0 }) {
 
   useEffect(() => {
     let ws;
+    // Son uygulanan değişikliğin versiyonu; atlama olursa resync istenir
+    let lastVersion = null;
+
+    const applyEvent = (message) => {
+      if (!message.type.startsWith("record_")) return;
+      if (message.type === "record_deleted") {
+        setRows((prev) => prev.filter((r) => r.id !== message.payload.id));
+        return;
+      }
+      const record = message.payload;
+      setRows((prev) => {
+        const next = prev.filter((r) => r.id !== record.id);
+        if (message.type === "record_updated" && next.length === prev.length) {
+          // Listede olmayan eski bir kayıt güncellendi
+          return prev;
+        }
+        next.push(record);
+        next.sort((a, b) =>
+          a.entry_time === b.entry_time
+            ? b.id - a.id
+            : a.entry_time < b.entry_time ? 1 : -1
+        );
+        return next;
+      });
+    };
 
     const connect = () => {
       setSocketState("connecting");
@@ -39,16 +68,39 @@ export default function RecordsTable({ forceRefreshKey = 0 }) {
 
       ws.onopen = () => {
         setSocketState("connected");
-        fetchLatest();
       };
 
       ws.onmessage = (event) => {
         try {
-          const payload = JSON.parse(event.data);
-          if (payload?.type === "records" && Array.isArray(payload.payload)) {
-            setRows(payload.payload);
+          const message = JSON.parse(event.data);
+          if (message?.type === "ping") {
+            ws.send(JSON.stringify({ type: "pong" }));
+          } else if (message?.type === "snapshot" && Array.isArray(message.payload)) {
+            if (message.cursor) {
+              setRows((prev) => {
+                const seen = new Set(prev.map((r) => r.id));
+                return [...prev, ...message.payload.filter((r) => !seen.has(r.id))];
+              });
+            } else {
+              setRows(message.payload);
+              lastVersion = message.version;
+            }
+            setNextCursor(message.next_cursor);
             setLoading(false);
             setError("");
+          } else if (message?.type === "changes") {
+            message.events.forEach(applyEvent);
+            lastVersion = message.version;
+          } else if (message?.type === "batch") {
+            if (lastVersion === null || message.version <= lastVersion) return;
+            if (message.from_version > lastVersion + 1) {
+              ws.send(JSON.stringify({ type: "resync", version: lastVersion }));
+              return;
+            }
+            message.events
+              .filter((e) => e.version > lastVersion)
+              .forEach(applyEvent);
+            lastVersion = message.version;
           }
         } catch (err) {
           console.error("WebSocket parse error:", err);
@@ -74,12 +126,32 @@ export default function RecordsTable({ forceRefreshKey = 0 }) {
       if (reconnectTimer.current) clearTimeout(reconnectTimer.current);
       if (ws && ws.readyState === WebSocket.OPEN) ws.close();
     };
-  }, [wsUrl, fetchLatest]);
+  }, [wsUrl]);
 
   useEffect(() => {
     fetchLatest();
   }, [fetchLatest, forceRefreshKey]);
 
+  // Daha eski kayıtları cursor ile getir
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const data = await fetchJSON(
+        `${API.base}${API.getRecords}?limit=${pageSize}&cursor=${encodeURIComponent(nextCursor)}`
+      );
+      setRows((prev) => {
+        const seen = new Set(prev.map((r) => r.id));
+        return [...prev, ...data.items.filter((r) => !seen.has(r.id))];
+      });
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleComplete = async (recordId) => {
     setCompleting((prev) => new Set(prev).add(recordId));
     try {
@@ -374,6 +446,19 @@ export default function RecordsTable({ forceRefreshKey = 0 }) {
               </span>
             </div>
           )}
+
+          {nextCursor && (
+            <div style={{ display: "flex", justifyContent: "center", marginTop: "16px" }}>
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="btn-small"
+                style={{ background: "var(--color-primary)" }}
+              >
+                {loadingMore ? "Yükleniyor..." : "Daha eski kayıtları yükle"}
+              </button>
+            </div>
+          )}
         </>
       )}
       {error && <div className="error-message" style={{ marginTop: "20px" }}>{error}</div>}
@@ -128,7 +128,7 @@ export default function UserPage() {
       const data = await fetchJSON(
         API.base + API.getRecordsByPlate(plate)
       );
-      setHistory(data || []);
+      setHistory(data?.items || []);
     } catch (err) {
       console.error(err);
     }
@@ -0,0 +1,71 @@
+"""add gate lookup indexes to parking_records
+
+Revision ID: add_gate_lookup_indexes
+Revises: add_user_sessions
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_gate_lookup_indexes"
+down_revision: Union[str, Sequence[str], None] = "add_user_sessions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_invalid_index(name: str) -> None:
+    """
+    Yarıda kalmış bir CONCURRENTLY kurulumu INVALID bir index bırakır;
+    if_not_exists onu var sayıp atlayacağı için önce silinir.
+    """
+    invalid = op.get_bind().execute(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.drop_index(name, table_name="parking_records", postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY transaction içinde çalışamaz; tablo yazmaya açık kalır
+    with op.get_context().autocommit_block():
+        _drop_invalid_index("ix_parking_records_plate_entry_time")
+        _drop_invalid_index("ix_parking_records_active_plate")
+        op.create_index(
+            "ix_parking_records_plate_entry_time",
+            "parking_records",
+            ["plate_number", sa.text("entry_time DESC")],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_parking_records_active_plate",
+            "parking_records",
+            ["plate_number", sa.text("entry_time DESC")],
+            unique=False,
+            postgresql_where=sa.text("exit_time IS NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_parking_records_active_plate",
+            table_name="parking_records",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_parking_records_plate_entry_time",
+            table_name="parking_records",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
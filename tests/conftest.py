@@ -0,0 +1,88 @@
+"""
+Test ayarları
+
+Veritabanı testleri TEST_DATABASE_URL ile verilen (migrasyonları çalıştırılmış)
+ayrı bir PostgreSQL veritabanına karşı çalışır; tanımlı değilse atlanır.
+Uygulamanın veritabanına yanlışlıkla yazılmaması için DATABASE_URL
+kullanılmaz.
+"""
+import os
+import random
+import uuid
+
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # backend.database import edilmeden önce ayarlanmalı
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+
+@pytest.fixture(scope="session")
+def session_factory():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL tanımlı değil")
+    from backend.database import SessionLocal
+
+    return SessionLocal
+
+
+# Test oturumu içinde her plaka bir kez kullanılır (debounce guard'ı process geneli)
+_plate_numbers = iter(random.sample(range(1000, 10000), 9000))
+
+
+@pytest.fixture
+def plate(session_factory):
+    from backend import models
+    from backend.services.gate_service import debounce_guard
+
+    plate_number = f"34TST{next(_plate_numbers)}"
+    yield plate_number
+
+    debounce_guard._cache.drop(plate_number)
+
+    db = session_factory()
+    try:
+        record_ids = [
+            r.id for r in db.query(models.ParkingRecord.id).filter_by(plate_number=plate_number)
+        ]
+        if record_ids:
+            db.query(models.ParkingRecord).filter(models.ParkingRecord.id.in_(record_ids)).update(
+                {"payment_id": None}, synchronize_session=False
+            )
+            db.query(models.Payment).filter(models.Payment.parking_record_id.in_(record_ids)).delete(
+                synchronize_session=False
+            )
+            db.query(models.ParkingRecord).filter(models.ParkingRecord.id.in_(record_ids)).delete(
+                synchronize_session=False
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+    from backend.services import gate_service
+
+    monkeypatch.setattr(gate_service, "LOCAL_LOCKS", True)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def idempotency_keys(session_factory):
+    from backend.utils import idempotency
+
+    prefix = f"test-{uuid.uuid4().hex}"
+    yield lambda name: f"{prefix}-{name}"
+
+    db = session_factory()
+    try:
+        db.execute(idempotency.table.delete().where(idempotency.table.c.key.like(f"{prefix}-%")))
+        db.commit()
+    finally:
+        db.close()
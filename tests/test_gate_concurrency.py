@@ -0,0 +1,77 @@
+"""Aynı plakanın eş zamanlı okumaları tek giriş / tek çıkış üretmeli"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+READERS = 12
+
+
+@pytest.fixture(params=["local", "postgres", "both"])
+def lock_mode(request, monkeypatch, session_factory):
+    from backend.services import gate_service
+
+    monkeypatch.setattr(gate_service, "LOCAL_LOCKS", request.param in ("local", "both"))
+    monkeypatch.setattr(gate_service, "ADVISORY_LOCKS", request.param in ("postgres", "both"))
+    return request.param
+
+
+def read_concurrently(session_factory, plate_number, now):
+    from backend.services.gate_service import process_gate_event
+
+    barrier = threading.Barrier(READERS)
+
+    def read(_):
+        db = session_factory()
+        try:
+            barrier.wait()
+            return process_gate_event(db, plate_number, now=now).action
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(READERS) as pool:
+        return list(pool.map(read, range(READERS)))
+
+
+def test_concurrent_reads_create_single_entry(session_factory, lock_mode, plate):
+    from backend import models
+
+    actions = read_concurrently(session_factory, plate, datetime.utcnow())
+
+    assert actions.count("entry") == 1
+    assert actions.count("debounced") == READERS - 1
+    db = session_factory()
+    try:
+        assert db.query(models.ParkingRecord).filter_by(plate_number=plate).count() == 1
+    finally:
+        db.close()
+
+
+def test_concurrent_reads_exit_active_record_once(session_factory, lock_mode, plate):
+    from backend import models
+
+    now = datetime.utcnow()
+    db = session_factory()
+    try:
+        active = models.ParkingRecord(plate_number=plate, entry_time=now - timedelta(hours=1), fee=0.0)
+        db.add(active)
+        db.commit()
+        active_id = active.id
+    finally:
+        db.close()
+
+    actions = read_concurrently(session_factory, plate, now)
+
+    # İlk okuma çıkış yapar, sonraki yeni giriş açar, kalanlar debounce olur
+    assert actions.count("exit") == 1
+    assert actions.count("entry") == 1
+    db = session_factory()
+    try:
+        assert db.query(models.Payment).filter_by(parking_record_id=active_id).count() == 1
+        assert db.get(models.ParkingRecord, active_id).exit_time == now
+        assert (
+            db.query(models.ParkingRecord).filter_by(plate_number=plate, exit_time=None).count() == 1
+        )
+    finally:
+        db.close()
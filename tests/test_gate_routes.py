@@ -0,0 +1,89 @@
+"""Gate endpoint'leri: Idempotency-Key ve plaka lock'u beklerken bağlantı kullanımı"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+
+WAITERS = 6
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("koşul zaman aşımına uğradı")
+        time.sleep(0.01)
+
+
+def test_requests_waiting_for_plate_lock_hold_no_connection(client, plate, idempotency_keys):
+    from backend.database import engine
+    from backend.services.gate_service import hold_plates, plate_locks
+
+    def waiting():
+        entry = plate_locks._entries.get(plate)
+        return entry is not None and entry.users == WAITERS + 1
+
+    def post(index):
+        return client.post(
+            "/api/manual_entry",
+            data={"plate_number": plate},
+            headers={"Idempotency-Key": idempotency_keys(index)},
+        )
+
+    with ThreadPoolExecutor(WAITERS) as pool:
+        with hold_plates([plate]):
+            baseline = engine.pool.checkedout()
+            futures = [pool.submit(post, index) for index in range(WAITERS)]
+            # Anahtarlar veritabanında arandıktan sonra istekler lock'u bekliyor
+            wait_for(waiting)
+            assert engine.pool.checkedout() <= baseline
+        responses = [future.result() for future in futures]
+
+    assert [response.status_code for response in responses] == [200] * WAITERS
+    # Debounce cevabında "action" yoktur
+    actions = [response.json().get("action") for response in responses]
+    assert actions.count("entry") == 1
+    assert len({response.json()["id"] for response in responses}) == 1
+
+
+@pytest.mark.parametrize("guard_hit", [True, False], ids=["guard", "database"])
+def test_debounced_response_replays_after_debounce_window(
+    client, session_factory, plate, idempotency_keys, guard_hit
+):
+    from backend import models
+    from backend.services.gate_service import debounce_guard
+    from backend.utils import idempotency
+
+    entry = client.post("/api/manual_entry", data={"plate_number": plate})
+    assert entry.json()["action"] == "entry"
+    if not guard_hit:
+        debounce_guard._cache.clear()
+
+    key = idempotency_keys("debounced")
+    debounced = client.post("/api/manual_entry", data={"plate_number": plate}, headers={"Idempotency-Key": key})
+    assert "action" not in debounced.json()
+
+    # Debounce süresi geçti, süreç yeniden başladı: retry aynı cevabı almalı, çıkış yapmamalı
+    db = session_factory()
+    try:
+        db.query(models.ParkingRecord).filter_by(plate_number=plate).update(
+            {"entry_time": models.ParkingRecord.entry_time - timedelta(hours=1)}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    debounce_guard._cache.clear()
+    idempotency._cache.clear()
+
+    retry = client.post("/api/manual_entry", data={"plate_number": plate}, headers={"Idempotency-Key": key})
+    assert retry.headers.get(idempotency.REPLAYED_HEADER) == "true"
+    assert retry.json() == debounced.json()
+    db = session_factory()
+    try:
+        assert db.query(models.ParkingRecord).filter_by(plate_number=plate, exit_time=None).count() == 1
+        assert db.query(models.Payment).join(
+            models.ParkingRecord, models.Payment.parking_record_id == models.ParkingRecord.id
+        ).filter(models.ParkingRecord.plate_number == plate).count() == 0
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from backend.utils.keyed_lock import KeyedLockManager, LockTimeout
+
+
+def test_same_key_is_serialized():
+    locks = KeyedLockManager()
+    inside = []
+    overlaps = []
+
+    def work():
+        with locks.hold(["34ABC123"]):
+            inside.append(1)
+            overlaps.append(len(inside))
+            time.sleep(0.01)
+            inside.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == [1] * 8
+    assert len(locks) == 0
+
+
+def test_batch_does_not_block_other_keys():
+    locks = KeyedLockManager()
+    batch = [f"34B{i:04d}" for i in range(1000)]
+    with locks.hold(batch):
+        with locks.hold(["06XYZ999"], timeout=0.1):
+            pass
+        with pytest.raises(LockTimeout):
+            with locks.hold([batch[500]], timeout=0.05):
+                pass
+    assert len(locks) == 0
+
+
+def test_opposite_key_order_does_not_deadlock():
+    locks = KeyedLockManager()
+    errors = []
+
+    def work(keys):
+        try:
+            for _ in range(200):
+                with locks.hold(keys, timeout=5):
+                    pass
+        except LockTimeout as exc:
+            errors.append(exc)
+
+    threads = [
+        threading.Thread(target=work, args=(["A", "B", "C"],)),
+        threading.Thread(target=work, args=(["C", "B", "A"],)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(locks) == 0
+
+
+def test_timeout_releases_partially_acquired_keys():
+    locks = KeyedLockManager()
+    with locks.hold(["B"]):
+        started = time.monotonic()
+        with pytest.raises(LockTimeout):
+            with locks.hold(["A", "B"], timeout=0.1):
+                pass
+        assert time.monotonic() - started < 1
+        # "A" zaman aşımından sonra bırakılmış olmalı
+        with locks.hold(["A"], timeout=0):
+            pass
+    assert len(locks) == 0
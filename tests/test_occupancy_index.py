@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import models
+from backend.services import occupancy_service
+from backend.services.occupancy_service import OccupancyIndex
+
+PAID = models.PaymentStatus.PAID
+PENDING = models.PaymentStatus.PENDING
+
+
+def record(record_id, entry_time, exit_time=None, plate="34ABC123"):
+    return models.ParkingRecord(id=record_id, plate_number=plate, entry_time=entry_time, exit_time=exit_time)
+
+
+def payment(payment_id, status, amount, paid_at=None):
+    return models.Payment(id=payment_id, status=status, amount=amount, paid_at=paid_at)
+
+
+def record_event(item):
+    return {
+        "id": item.id,
+        "plate_number": item.plate_number,
+        "entry_time": item.entry_time.isoformat(),
+        "exit_time": item.exit_time.isoformat() if item.exit_time else None,
+    }
+
+
+@pytest.fixture
+def now():
+    return datetime.utcnow().replace(microsecond=0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """occupancy_service'in utcnow'unu testin verdiği zamana sabitler"""
+
+    class Clock(datetime):
+        current = None
+
+        @classmethod
+        def utcnow(cls):
+            return cls.current
+
+    monkeypatch.setattr(occupancy_service, "datetime", Clock)
+    return Clock
+
+
+def test_entry_and_exit_update_counters(now):
+    index = OccupancyIndex()
+    index.record_changed(record(1, now))
+    assert index.gate_hint("34ABC123").active == (1, now)
+    assert (index.occupancy, index.entries_today) == (1, 1)
+
+    index.record_changed(record(1, now, now + timedelta(minutes=5)))
+    assert index.gate_hint("34ABC123").active is None
+    assert (index.occupancy, index.entries_today, index.exits_today) == (0, 1, 1)
+
+
+def test_same_event_applied_twice_counts_once(now):
+    index = OccupancyIndex()
+    entered = record(1, now)
+    index.record_changed(entered)
+    index.apply_event("record_created", record_event(entered))
+    assert (index.occupancy, index.entries_today) == (1, 1)
+
+
+def test_late_active_event_does_not_reopen_exited_record(now):
+    index = OccupancyIndex()
+    entered = record(1, now)
+    index.record_changed(record(1, now, now + timedelta(minutes=5)))
+    index.apply_event("record_created", record_event(entered))
+    assert index.occupancy == 0
+    assert index.gate_hint("34ABC123").active is None
+
+
+def test_late_pending_event_does_not_revert_paid_payment(now):
+    index = OccupancyIndex()
+    index.payment_changed(payment(7, PAID, 40.0, now))
+    index.apply_event("payment_created", {"id": 7, "status": PENDING.value, "amount": 40.0, "paid_at": None})
+    stats = index.stats()
+    assert stats["pending_amount"] == 0
+    assert stats["paid_amount_today"] == 40.0
+
+
+def test_deleted_record_stays_deleted(now):
+    index = OccupancyIndex()
+    entered = record(1, now)
+    index.record_changed(entered)
+    index.record_deleted(1)
+    index.apply_event("record_updated", record_event(entered))
+    index.record_changed(entered)
+    assert (index.occupancy, index.entries_today) == (0, 0)
+    assert index.gate_hint("34ABC123").active is None
+
+
+def test_day_rollover_resets_daily_counters(clock):
+    day_end = datetime(2026, 3, 1, 23, 50)
+    clock.current = day_end
+    index = OccupancyIndex()
+    index.record_changed(record(1, day_end - timedelta(hours=2), plate="34AAA001"))
+    index.record_changed(record(2, day_end - timedelta(hours=3), day_end - timedelta(hours=1), plate="34AAA002"))
+    index.payment_changed(payment(5, PAID, 25.0, day_end - timedelta(hours=1)))
+    index.payment_changed(payment(6, PENDING, 30.0))
+    assert index.stats()["entries_today"] == 2
+
+    clock.current = day_end + timedelta(minutes=20)
+    stats = index.stats()
+    assert stats["day"] == "2026-03-02"
+    # Aktif araç ve bekleyen ödeme günden bağımsızdır
+    assert stats["occupancy"] == 1
+    assert stats["pending_amount"] == 30.0
+    assert (stats["entries_today"], stats["exits_today"], stats["paid_amount_today"]) == (0, 0, 0)
+    assert index.gate_hint("34AAA001").active is not None
+
+
+def test_rebuild_replays_changes_made_during_load(monkeypatch, now):
+    index = OccupancyIndex(exclusive=True)
+    assert not index.authoritative
+    exited = record(1, now, now + timedelta(minutes=5))
+
+    def load_state(day_start):
+        # Snapshot okunurken kayıt çıkış yaptı; snapshot hâlâ aktif gösteriyor
+        index.record_changed(exited)
+        return [record(1, now), record(2, now, plate="34XYZ99")], []
+
+    monkeypatch.setattr(occupancy_service, "_load_state", load_state)
+    index.rebuild()
+
+    assert index.authoritative
+    assert index.gate_hint("34ABC123").active is None
+    assert index.gate_hint("34XYZ99").active == (2, now)
+    assert (index.occupancy, index.entries_today, index.exits_today) == (1, 2, 1)
+
+
+def test_invalidate_drops_authority_until_rebuild(monkeypatch):
+    monkeypatch.setattr(occupancy_service, "_load_state", lambda day_start: ([], []))
+    index = OccupancyIndex(exclusive=True)
+    index.rebuild()
+    index.invalidate()
+    assert not index.authoritative
+    index.rebuild()
+    assert index.authoritative
+    assert not OccupancyIndex(exclusive=False).authoritative
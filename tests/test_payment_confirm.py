@@ -0,0 +1,97 @@
+"""Idempotency-Key'li ödeme onayı: bariyer hatası ve yarıda kalan onaylar"""
+from datetime import timedelta
+
+import pytest
+
+
+@pytest.fixture
+def pending_payment(client, session_factory, plate):
+    """Plakanın giriş ve çıkışını yapıp çıkışta oluşan PENDING ödemenin ID'sini döner"""
+    from backend import models
+    from backend.services.gate_service import debounce_guard
+
+    assert client.post("/api/manual_entry", data={"plate_number": plate}).json()["action"] == "entry"
+    db = session_factory()
+    try:
+        db.query(models.ParkingRecord).filter_by(plate_number=plate).update(
+            {"entry_time": models.ParkingRecord.entry_time - timedelta(hours=1)}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    debounce_guard._cache.clear()
+
+    body = client.post("/api/manual_entry", data={"plate_number": plate}).json()
+    assert body["action"] == "exit"
+    return body["payment"]["id"]
+
+
+@pytest.fixture
+def barrier(monkeypatch):
+    """BarrierService.open_barrier'ı sırayla verilen hataları fırlatan sahteyle değiştirir"""
+    from backend.services.barrier_service import BarrierService
+
+    class FakeBarrier:
+        calls = 0
+        failures = []
+
+        @classmethod
+        async def open_barrier(cls, payment):
+            cls.calls += 1
+            if cls.failures:
+                raise cls.failures.pop(0)
+            return True
+
+    monkeypatch.setattr(BarrierService, "open_barrier", FakeBarrier.open_barrier)
+    return FakeBarrier
+
+
+def confirm(client, payment_id, key):
+    return client.post(f"/api/payments/{payment_id}/confirm", headers={"Idempotency-Key": key})
+
+
+def test_retry_after_barrier_error_opens_barrier(client, session_factory, pending_payment, barrier, idempotency_keys):
+    from backend import models
+    from backend.utils import idempotency
+
+    key = idempotency_keys("confirm")
+    barrier.failures = [ValueError("bariyer yanıt vermedi")]
+    assert confirm(client, pending_payment, key).status_code == 500
+
+    retry = confirm(client, pending_payment, key)
+    assert retry.status_code == 200
+    assert retry.json()["payment"]["status"] == models.PaymentStatus.PAID.value
+    assert barrier.calls == 2
+    db = session_factory()
+    try:
+        payment = db.get(models.Payment, pending_payment)
+        assert db.get(models.ParkingRecord, payment.parking_record_id).payment_id == pending_payment
+    finally:
+        db.close()
+
+    again = confirm(client, pending_payment, key)
+    assert again.headers.get(idempotency.REPLAYED_HEADER) == "true"
+    assert again.json() == retry.json()
+    assert barrier.calls == 2
+
+
+def test_abandoned_confirmation_is_taken_over_after_lease(
+    client, monkeypatch, pending_payment, barrier, idempotency_keys
+):
+    from backend.routes import payment_routes
+
+    key = idempotency_keys("crash")
+    # Onay commit edildi, bariyer açılırken süreç "çöktü"
+    barrier.failures = [RuntimeError("süreç sonlandı")]
+    with pytest.raises(RuntimeError):
+        confirm(client, pending_payment, key)
+
+    # Sahibi hâlâ çalışıyor olabilir: 400 değil 409
+    assert confirm(client, pending_payment, key).status_code == 409
+    assert barrier.calls == 1
+
+    monkeypatch.setattr(payment_routes, "CONFIRM_LEASE_SECONDS", 0)
+    taken_over = confirm(client, pending_payment, key)
+    assert taken_over.status_code == 200
+    assert taken_over.json()["success"] is True
+    assert barrier.calls == 2
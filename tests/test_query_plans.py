@@ -0,0 +1,93 @@
+"""
+Her gate olayında çalışan sorguların (aktif kayıt, debounce, gate_service
+aday sorgusu) gate index'lerinden birini kullanabildiğini EXPLAIN ile
+doğrular. Planın veritabanındaki veri miktarına bağlı olmaması için test
+transaction'ında örnek plakanın uzun bir geçmişi eklenip ANALYZE edilir
+(sonra geri alınır) ve enable_seqscan=off ile bakılır; amaç index'in bu
+sorgu için kullanılabilir olduğunu (ör. bir migration'ın onu düşürmediğini)
+görmektir.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Iterator, List
+
+import pytest
+from sqlalchemy import text
+
+GATE_INDEXES = ("ix_parking_records_plate_entry_time", "ix_parking_records_active_plate")
+SAMPLE_PLATE = "34ABC1234"
+HISTORY_ROWS = 5000
+
+
+def _plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def used_indexes(db, statement) -> List[str]:
+    compiled = statement.compile(dialect=db.get_bind().dialect)
+    row = db.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    plan = (row if isinstance(row, list) else json.loads(row))[0]["Plan"]
+    return [node["Index Name"] for node in _plan_nodes(plan) if "Index Name" in node]
+
+
+def active_record_query(db, threshold):
+    from backend import models
+
+    record = models.ParkingRecord
+    return (
+        db.query(record)
+        .filter(record.plate_number == SAMPLE_PLATE, record.exit_time.is_(None))
+        .order_by(record.entry_time.desc())
+        .limit(1)
+        .statement
+    )
+
+
+def recent_entry_query(db, threshold):
+    from backend import models
+
+    record = models.ParkingRecord
+    return (
+        db.query(record)
+        .filter(record.plate_number == SAMPLE_PLATE, record.entry_time >= threshold)
+        .order_by(record.entry_time.desc())
+        .limit(1)
+        .statement
+    )
+
+
+def candidates_query(db, threshold):
+    from backend.services.gate_service import gate_candidates_query
+
+    return gate_candidates_query(SAMPLE_PLATE, threshold)
+
+
+@pytest.mark.parametrize("build_query", [active_record_query, recent_entry_query, candidates_query])
+def test_gate_query_uses_gate_index(session_factory, build_query):
+    from backend.services.gate_service import DEBOUNCE_SECONDS
+
+    db = session_factory()
+    try:
+        # Son kayıt hariç hepsi çıkış yapmış, saatlik girişler
+        db.execute(
+            text(
+                "INSERT INTO parking_records (plate_number, entry_time, exit_time, fee) "
+                "SELECT :plate, now() - make_interval(hours => n), "
+                "CASE WHEN n > 1 THEN now() - make_interval(hours => n) + interval '30 minutes' END, 0 "
+                "FROM generate_series(1, :rows) AS n"
+            ),
+            {"plate": SAMPLE_PLATE, "rows": HISTORY_ROWS},
+        )
+        db.execute(text("ANALYZE parking_records"))
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+        threshold = datetime.utcnow() - timedelta(seconds=DEBOUNCE_SECONDS)
+        indexes = used_indexes(db, build_query(db, threshold))
+    finally:
+        db.rollback()
+        db.close()
+
+    assert any(index in GATE_INDEXES for index in indexes), indexes or "index kullanılmıyor"
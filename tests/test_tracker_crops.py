@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ultralytics")
+from backend.services.vehicle_tracker import TrackState, score_crop  # noqa: E402
+
+
+def textured(width, height, contrast, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.random((height, width, 3)) * contrast).astype(np.uint8)
+
+
+def test_wider_crop_of_same_texture_scores_higher():
+    # Coarse blocks so the texture survives downscaling for scoring
+    crop = np.kron(textured(40, 20, 255)[..., 0], np.ones((20, 20), np.uint8))
+    crop = np.dstack([crop] * 3)
+    assert score_crop(crop) > score_crop(crop[:, :400])
+    assert score_crop(crop[:0]) == 0.0
+
+
+def test_ring_keeps_best_crops_and_skips_worse_ones():
+    state = TrackState()
+    for contrast in (40, 80, 120):
+        assert state.offer_crop(textured(200, 100, contrast), ring_size=3)
+
+    blurry = textured(200, 100, 10)
+    assert not state.offer_crop(blurry, ring_size=3)
+    assert state.offer_crop(textured(200, 100, 250), ring_size=3)
+
+    scores = sorted(score for score, _ in state.crops)
+    assert len(scores) == 3
+    assert scores[0] > score_crop(textured(200, 100, 40))
+
+
+def test_ring_stores_copies_not_frame_views():
+    frame = textured(400, 300, 200)
+    state = TrackState()
+    state.offer_crop(frame[50:150, 100:300])
+    frame[:] = 0
+    assert state.crops[0][1].any()
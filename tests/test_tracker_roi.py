@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ultralytics")
+from backend.services.vehicle_tracker import extend_clipped_boxes  # noqa: E402
+
+FRAME = (720, 1280, 3)
+# --roi-band 150 around line y=400
+BAND = (0, 250, 1280, 550)
+
+
+def test_box_cut_at_band_top_extends_upwards():
+    # Vehicle taller than the band, detector box stops at the band's top edge
+    boxes = extend_clipped_boxes(np.array([[100.0, 250.0, 400.0, 500.0]]), BAND, FRAME)
+    x0, y0, x1, y1 = boxes[0]
+    assert (x0, x1, y1) == (100, 400, 500)
+    assert y0 == 0  # 250 - width (300), clamped to the frame
+    # Crop now includes the part of the vehicle above the band
+    assert (y0 + y1) / 2 < 250 + (500 - 250) / 2
+
+
+def test_box_cut_at_band_bottom_extends_downwards():
+    boxes = extend_clipped_boxes(np.array([[600.0, 420.0, 700.0, 549.5]]), BAND, FRAME)
+    assert boxes[0].tolist() == [600, 420, 700, 649.5]
+
+
+def test_box_inside_band_is_unchanged():
+    xyxy = np.array([[100.0, 300.0, 300.0, 500.0]])
+    assert extend_clipped_boxes(xyxy, BAND, FRAME).tolist() == xyxy.tolist()
+
+
+def test_frame_edges_are_not_roi_cuts():
+    full = (0, 0, 1280, 720)
+    xyxy = np.array([[0.0, 0.0, 200.0, 720.0]])
+    assert extend_clipped_boxes(xyxy, full, FRAME).tolist() == xyxy.tolist()
+
+
+def test_box_cut_on_both_band_edges_keeps_centre():
+    # The limitation MIN_ROI_BAND guards against: the centre stays on the line
+    boxes = extend_clipped_boxes(np.array([[100.0, 250.0, 200.0, 550.0]]), BAND, FRAME)
+    assert (boxes[0][1] + boxes[0][3]) / 2 == 400